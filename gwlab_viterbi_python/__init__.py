@@ -1,6 +1,9 @@
 from .gwlab_viterbi import GWLabViterbi
+from .async_gwlab_viterbi import AsyncGWLabViterbi
 from .viterbi_job import ViterbiJob
-from .inputs import DataInput, DataParametersInput, SearchParametersInput
+from .job_index import JobIndex
+from .job_watcher import JobWatcher, JobEvent
+from .inputs import DataInput, DataParametersInput, SearchParametersInput, SearchSweep, SweepAxis
 
 from gwdc_python.files import FileReference, FileReferenceList
 from gwdc_python.helpers import TimeRange, JobStatus
@@ -0,0 +1,408 @@
+import asyncio
+import itertools
+
+from humps import camelize, decamelize
+from tqdm import tqdm
+
+from gwdc_python.exceptions import GWDCAuthenticationError, GWDCUnknownException
+from gwdc_python.files import FileReferenceList
+from gwdc_python.helpers import TimeRange
+from gwdc_python.logger import create_logger
+
+from .gwlab_viterbi import GWLabViterbi
+from .job_watcher import JobWatcher
+from .exceptions import GWLabAuthenticationError
+from .utils.file_download import _async_get_file, _async_iter_file_chunks, _check_file_size
+from .settings import GWLAB_VITERBI_ENDPOINT, GWLAB_VITERBI_AUTH_ENDPOINT
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = create_logger(__name__)
+
+
+class AsyncGWLabViterbi:
+    """
+    AsyncGWLabViterbi class provides the same API as :class:`~gwlab_viterbi_python.gwlab_viterbi.GWLabViterbi`,
+    but with methods that are coroutines, so that many requests can be in flight at once from a single thread.
+    It requires the optional `httpx` dependency, which can be installed with `pip install gwlab-viterbi-python[async]`.
+
+    Authentication happens when the class is instantiated, which blocks until complete.
+    The :class:`~gwlab_viterbi_python.viterbi_job.ViterbiJob` instances that are returned use a blocking
+    GWLabViterbi client, available as the `sync_client` attribute, for their own methods.
+
+    The HTTP connections should be closed with :meth:`aclose` when finished, or the class can be used as an
+    asynchronous context manager.
+
+    Parameters
+    ----------
+    token : str
+        API token used to authenticate with the GWLab server
+    auth_endpoint : str, optional
+        URL of the GWLab authentication endpoint
+    endpoint : str, optional
+        URL of the GWLab Viterbi GraphQL endpoint
+    max_workers : int, optional
+        Maximum number of files downloaded at once, by default 20
+    """
+
+    def __init__(self, token, auth_endpoint=GWLAB_VITERBI_AUTH_ENDPOINT, endpoint=GWLAB_VITERBI_ENDPOINT,
+                 max_workers=20):
+        if httpx is None:
+            raise ImportError(
+                "AsyncGWLabViterbi requires httpx, which can be installed with "
+                "'pip install gwlab-viterbi-python[async]'"
+            )
+
+        self.sync_client = GWLabViterbi(
+            token=token,
+            auth_endpoint=auth_endpoint,
+            endpoint=endpoint,
+            max_workers=max_workers
+        )
+        self.endpoint = endpoint
+        self.max_workers = max_workers
+        self.http_client = httpx.AsyncClient(timeout=None)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close all HTTP connections held by the client"""
+        await self.http_client.aclose()
+
+    def _get_headers(self):
+        gwdc = self.sync_client.client
+        if gwdc.api_token:
+            return {'Authorization': 'JWT ' + gwdc.jwt_token}
+        return {'X-Correlation-ID': f"{gwdc.public_id} {gwdc.session_id}"}
+
+    async def _request(self, query, variables):
+        response = await self.http_client.post(
+            self.endpoint,
+            json={
+                "query": query,
+                "variables": camelize(variables)
+            },
+            headers=self._get_headers()
+        )
+        content = response.json()
+        return decamelize(content.get('data', None)), content.get('errors', None)
+
+    async def request(self, query, variables=None):
+        """Send a query to the GWLab Viterbi GraphQL endpoint
+
+        Parameters
+        ----------
+        query : str
+            GraphQL query or mutation
+        variables : dict, optional
+            Variables for the query, by default None
+
+        Returns
+        -------
+        dict
+            Data returned by the query, with keys converted to snake case
+        """
+        # The token is read just before the request is sent, so that it is the one the request was made with
+        sent_token = getattr(self.sync_client.client, 'jwt_token', None)
+        data, errors = await self._request(query, variables)
+
+        if errors and errors[0].get('message') == 'Signature has expired':
+            await asyncio.get_running_loop().run_in_executor(None, self.sync_client._refresh_access_token, sent_token)
+            data, errors = await self._request(query, variables)
+
+        if errors:
+            message = errors[0].get('message')
+            if message == GWDCAuthenticationError.raise_msg:
+                raise GWLabAuthenticationError
+            raise GWDCUnknownException(message)
+
+        return data
+
+    async def start_viterbi_job(
+        self, job_name, job_description, private, data_input=None, data_params=None, search_params=None
+    ):
+        """Start a viterbi job from inputs
+
+        Parameters
+        ----------
+        job_name : str
+            Name of the job to be created
+        job_description : str
+            Description of the job to be created
+        private : bool
+            True if the job should be private, False if it should be public
+        data_input : DataInput
+            Data inputs for the job, by default None.
+            If None, then default inputs will be used for these fields.
+        data_params : DataParametersInput
+            Data parameters inputs for the job, by default None.
+            If None, then default inputs will be used for these fields.
+        search_params : SearchParametersInput
+            Search parameters inputs for the job, by default None.
+            If None, then default inputs will be used for these fields.
+
+        Returns
+        -------
+        ViterbiJob
+            Created job
+        """
+        query, variables = self.sync_client._new_viterbi_job_query(
+            job_name, job_description, private, data_input, data_params, search_params
+        )
+
+        data = await self.request(query=query, variables=variables)
+
+        job_id = data['new_viterbi_job']['result']['job_id']
+        return await self.get_job_by_id(job_id)
+
+    async def get_public_job_list(self, search="", time_range=TimeRange.ANY, number=100):
+        """Obtains a list of public Viterbi jobs, filtering based on the search terms
+        and the time range within which the job was created.
+
+        Parameters
+        ----------
+        search : str, optional
+            Search terms by which to filter public job list, by default ""
+        time_range : .TimeRange or str, optional
+            Time range by which to filter job list, by default TimeRange.ANY
+        number : int, optional
+            Number of job results to return in one request, by default 100
+
+        Returns
+        -------
+        list
+            List of ViterbiJob instances for the jobs corresponding to the search terms and in the specified time range
+        """
+        query, variables = self.sync_client._public_job_list_query(search, time_range, number)
+
+        data = await self.request(query=query, variables=variables)
+
+        return self.sync_client._get_job_list_from_query(data['public_viterbi_jobs'], log_empty=True)
+
+    async def get_job_by_id(self, job_id):
+        """Get a Viterbi job instance corresponding to a specific job ID
+
+        Parameters
+        ----------
+        job_id : str
+            ID of job to obtain
+
+        Returns
+        -------
+        ViterbiJob
+            ViterbiJob instance corresponding to the input ID
+        """
+        query, variables = self.sync_client._job_by_id_query(job_id)
+
+        data = await self.request(query=query, variables=variables)
+
+        return self.sync_client._get_job_by_id_from_query(data['viterbi_job'])
+
+    async def get_jobs_by_ids(self, job_ids, chunk_size=100):
+        """Get the Viterbi job instances corresponding to many job IDs.
+        Up to `chunk_size` jobs are requested in each query, and all of the queries are sent at once.
+
+        Parameters
+        ----------
+        job_ids : list
+            IDs of jobs to obtain
+        chunk_size : int, optional
+            Maximum number of jobs to request in a single query, by default 100
+
+        Returns
+        -------
+        list
+            ViterbiJob instances corresponding to the input IDs, in the same order, or None for any ID that
+            does not match a job
+        """
+        job_ids = list(job_ids)
+
+        async def get_jobs(chunk):
+            query, variables = self.sync_client._jobs_by_ids_query(chunk)
+            data = await self.request(query=query, variables=variables)
+            return self.sync_client._get_jobs_by_ids_from_query(data)
+
+        jobs = await asyncio.gather(*[
+            get_jobs(job_ids[i:i + chunk_size]) for i in range(0, len(job_ids), chunk_size)
+        ])
+
+        return list(itertools.chain.from_iterable(jobs))
+
+    def watch_jobs(self, jobs, min_interval=5, max_interval=120, backoff=1.5):
+        """Create a watcher that polls the statuses of many jobs together, producing an event whenever the status of
+        one of them changes. The watcher should be used with its asynchronous methods, such as
+        :meth:`~gwlab_viterbi_python.job_watcher.JobWatcher.awatch`.
+
+        Parameters
+        ----------
+        jobs : list
+            ViterbiJob instances or IDs of the jobs to watch
+        min_interval : float, optional
+            Minimum number of seconds between polls, by default 5
+        max_interval : float, optional
+            Maximum number of seconds between polls, by default 120
+        backoff : float, optional
+            Factor by which the interval grows after each poll in which no job changed status, by default 1.5
+
+        Returns
+        -------
+        ~gwlab_viterbi_python.job_watcher.JobWatcher
+            Watcher for the jobs
+        """
+        return JobWatcher(self, jobs, min_interval=min_interval, max_interval=max_interval, backoff=backoff)
+
+    async def get_user_jobs(self, number=100):
+        """Obtains a list of Viterbi jobs created by the user
+
+        Parameters
+        ----------
+        number : int, optional
+            Number of job results to return in one request, by default 100
+
+        Returns
+        -------
+        list
+            List of ViterbiJob instances for the jobs created by the user
+        """
+        query, variables = self.sync_client._user_jobs_query(number)
+
+        data = await self.request(query=query, variables=variables)
+
+        return self.sync_client._get_job_list_from_query(data['viterbi_jobs'])
+
+    async def get_job_file_list(self, job_id):
+        """Get information for all files associated with a job
+
+        Parameters
+        ----------
+        job_id : str
+            ID of the job
+
+        Returns
+        -------
+        ~gwdc_python.files.file_reference.FileReferenceList
+            Contains FileReference instances for each of the files associated with the job
+        """
+        query, variables = self.sync_client._files_by_job_id_query(job_id)
+
+        data = await self.request(query=query, variables=variables)
+
+        return self.sync_client._get_file_list_from_query(job_id, data['viterbi_result_files'])
+
+    async def get_file_list_by_job_ids(self, job_ids, chunk_size=50):
+        """Get information for all result files associated with many jobs.
+        The file lists for up to `chunk_size` jobs are requested in each query, and all of the queries are sent at once.
+
+        Parameters
+        ----------
+        job_ids : list
+            IDs of the jobs for which to list files
+        chunk_size : int, optional
+            Maximum number of jobs to request in a single query, by default 50
+
+        Returns
+        -------
+        ~gwdc_python.files.file_reference.FileReferenceList
+            Contains FileReference instances for each of the files associated with the jobs, in the order of the jobs
+        """
+        job_ids = list(job_ids)
+
+        async def get_file_lists(chunk):
+            query, variables = self.sync_client._files_by_job_ids_query(chunk)
+            data = await self.request(query=query, variables=variables)
+            return self.sync_client._get_file_lists_from_query(chunk, data)
+
+        file_lists = await asyncio.gather(*[
+            get_file_lists(job_ids[i:i + chunk_size]) for i in range(0, len(job_ids), chunk_size)
+        ])
+
+        file_lists = itertools.chain.from_iterable(file_lists)
+        return FileReferenceList(list(itertools.chain.from_iterable(file_lists)))
+
+    async def _get_download_ids_from_tokens(self, job_id, file_tokens):
+        query, variables = self.sync_client._download_ids_query(job_id, file_tokens)
+
+        data = await self.request(query=query, variables=variables)
+
+        return data['generate_file_download_ids']['result']
+
+    async def get_files_by_reference(self, file_references):
+        """Obtains file data when provided a FileReferenceList.
+        Download ids are requested for all jobs at once, and the files for each job begin downloading as soon as
+        their ids are available.
+
+        Parameters
+        ----------
+        file_references : FileReferenceList
+            Contains the :class:`FileReference` objects for which to download the contents
+
+        Returns
+        -------
+        list
+            List of tuples containing the file path and file contents as a bytearray
+        """
+        semaphore = asyncio.Semaphore(self.max_workers)
+        progress = tqdm(total=file_references.get_total_bytes(), leave=True, unit='B', unit_scale=True)
+
+        async def get_file(file_id, ref):
+            async with semaphore:
+                return await _async_get_file(self.http_client, file_id, ref.path, ref.file_size, progress)
+
+        async def get_job_files(job_id, job_files):
+            file_ids = await self._get_download_ids_from_tokens(job_id, job_files.get_tokens())
+            return await asyncio.gather(*[get_file(file_id, ref) for file_id, ref in zip(file_ids, job_files)])
+
+        try:
+            files = await asyncio.gather(*[
+                get_job_files(job_id, job_files) for job_id, job_files in file_references.batched.items()
+            ])
+        finally:
+            progress.close()
+
+        files = list(itertools.chain.from_iterable(files))
+
+        logger.info(f'All {len(files)} files downloaded!')
+
+        return files
+
+    async def iter_files_by_reference(self, file_references):
+        """Streams file data when provided a FileReferenceList, without holding whole files in memory.
+        Files are downloaded one after another, and their contents are yielded in chunks as they arrive.
+
+        Parameters
+        ----------
+        file_references : FileReferenceList
+            Contains the :class:`FileReference` objects for which to download the contents
+
+        Yields
+        ------
+        tuple
+            The file path and the next chunk of that file's contents as a byte string
+        """
+        batched = file_references.batched
+
+        file_ids = await asyncio.gather(*[
+            self._get_download_ids_from_tokens(job_id, job_files.get_tokens())
+            for job_id, job_files in batched.items()
+        ])
+
+        file_ids = list(itertools.chain.from_iterable(file_ids))
+        batched_files = FileReferenceList(list(itertools.chain.from_iterable(batched.values())))
+
+        progress = tqdm(total=batched_files.get_total_bytes(), leave=True, unit='B', unit_scale=True)
+        try:
+            for file_id, ref in zip(file_ids, batched_files):
+                received_size = 0
+                async for chunk in _async_iter_file_chunks(self.http_client, file_id, progress):
+                    received_size += len(chunk)
+                    yield (ref.path, chunk)
+                _check_file_size(ref.path, ref.file_size, received_size)
+        finally:
+            progress.close()
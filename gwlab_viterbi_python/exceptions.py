@@ -16,6 +16,36 @@ Alternatively, head straight to https://gwlab.org.au/auth/api-token to create on
         )
 
 
+class GWLabFileIntegrityError(Exception):
+    def __init__(self, file_path, expected_size, received_size):
+        self.file_path = file_path
+        self.expected_size = expected_size
+        self.received_size = received_size
+        super().__init__(
+            f"Received {received_size} bytes for '{file_path}', but expected {expected_size} bytes"
+        )
+
+
+class GWLabDownloadError(Exception):
+    def __init__(self, report):
+        self.report = report
+        file_path, error = report.failed[0]
+        super().__init__(
+            f"{len(report.failed)} of {len(report)} files failed to download. "
+            f"The first failure was for '{file_path}': {error!r}"
+        )
+
+
+class GWLabSubmissionError(Exception):
+    def __init__(self, report):
+        self.report = report
+        job_name, error = report.failed[0]
+        super().__init__(
+            f"{len(report.failed)} of {len(report)} jobs failed to submit. "
+            f"The first failure was for '{job_name}': {error!r}"
+        )
+
+
 def custom_error_handler(f):
     @functools.wraps(f)
     def wrapper(*args, **kwargs):
@@ -1,23 +1,74 @@
+import concurrent.futures
 import itertools
-from dataclasses import asdict
+import tempfile
+import threading
+import time
+from functools import partial
+from pathlib import Path
 
 from gwdc_python import GWDC
 from gwdc_python.files import FileReference, FileReferenceList
 from gwdc_python.helpers import TimeRange
 from gwdc_python.utils import rename_dict_keys
 from gwdc_python.logger import create_logger
+from tqdm import tqdm
 
 from .viterbi_job import ViterbiJob
-from .inputs import DataInput, DataParametersInput, SearchParametersInput
+from .job_watcher import JobWatcher
+from .inputs import DataInput, DataParametersInput, SearchParametersInput, _get_default_values
 from .exceptions import custom_error_handler
-from .utils.file_download import _download_files, _save_file_map_fn, _get_file_map_fn
+from .utils.file_download import (
+    _download_files,
+    _submit_file_batches,
+    _add_id_errors,
+    _save_file_map_fn,
+    _get_file_map_fn,
+    _resume_file_map_fn,
+    _iter_files,
+    _iter_file_streams,
+    _is_file_complete
+)
+from .utils.session_pool import SessionPool
+from .utils.download_scheduler import DownloadScheduler, DownloadReport, _MemoryBudget
+from .utils.cache import TTLCache
+from .utils.file_cache import FileCache
+from .utils.lazy_file import LazyFile
+from .utils.job_submission import SubmissionReport
+from .utils.candidates import CandidatesSelector, iter_candidates, _CandidatesAggregator
+from .utils.candidates_export import export_candidates
+from .utils.file_filters import candidates_filter
 from .settings import GWLAB_VITERBI_ENDPOINT, GWLAB_VITERBI_AUTH_ENDPOINT
 
 logger = create_logger(__name__)
 
 
 class GWLabViterbi:
-    def __init__(self, token, auth_endpoint=GWLAB_VITERBI_AUTH_ENDPOINT, endpoint=GWLAB_VITERBI_ENDPOINT):
+    """
+    GWLabViterbi class provides an API for interacting with the Viterbi jobs on the GWLab server.
+
+    Parameters
+    ----------
+    token : str
+        API token used to authenticate with the GWLab server
+    auth_endpoint : str, optional
+        URL of the GWLab authentication endpoint
+    endpoint : str, optional
+        URL of the GWLab Viterbi GraphQL endpoint
+    max_workers : int, optional
+        Maximum number of files downloaded at once, by default 20
+    bandwidth_limit : int, optional
+        Maximum combined download rate in bytes per second, by default None (unlimited)
+    memory_limit : int, optional
+        Maximum number of bytes of downloaded file contents held in memory by each call to
+        :meth:`get_files_by_reference`, by default None (unlimited). Files that do not fit are written to
+        temporary files and returned as read-only memory maps.
+    timeout : float or tuple, optional
+        Seconds to wait for the file download server to accept a connection and to send more data, either as a
+        single number or as a (connect, read) tuple, by default (10, 60). Downloads that time out are retried.
+    """
+
+    def __init__(self, token, auth_endpoint=GWLAB_VITERBI_AUTH_ENDPOINT, endpoint=GWLAB_VITERBI_ENDPOINT,
+                 max_workers=20, bandwidth_limit=None, memory_limit=None, timeout=(10, 60)):
         self.client = GWDC(
             token=token,
             auth_endpoint=auth_endpoint,
@@ -25,6 +76,121 @@ class GWLabViterbi:
             custom_error_handler=custom_error_handler
         )
         self.request = self.client.request
+        # Requests are sent from many threads at once, so only one of them may refresh the access token at a time.
+        # The access token sent with the latest request of each thread is recorded, so that a thread whose request
+        # failed can tell whether another thread has already replaced the expired token.
+        self._token_lock = threading.Lock()
+        self._sent_tokens = threading.local()
+        self._refresh_client_token = self.client._refresh_access_token
+        self._send_client_request = self.client._request
+        self.client._refresh_access_token = self._refresh_access_token
+        self.client._request = self._send_request
+        self.max_workers = max_workers
+        self.bandwidth_limit = bandwidth_limit
+        self.memory_limit = memory_limit
+        self.timeout = timeout
+        self.session_pool = SessionPool(pool_size=max_workers, timeout=timeout)
+        self.cache = None
+        self.file_cache = None
+
+    def _send_request(self, *args, **kwargs):
+        authorization = (kwargs.get('headers') or {}).get('Authorization')
+        if authorization is not None:
+            self._sent_tokens.jwt_token = authorization[len('JWT '):]
+        return self._send_client_request(*args, **kwargs)
+
+    def _refresh_access_token(self, expired_token=None):
+        # The expired token is the one sent with the request that failed, which is the latest request of this thread
+        # unless it is given. The current token is only refreshed if it is still the expired one, as otherwise another
+        # thread has already refreshed it, and the new access token can be used straight away.
+        if expired_token is None:
+            expired_token = getattr(self._sent_tokens, 'jwt_token', getattr(self.client, 'jwt_token', None))
+        with self._token_lock:
+            if getattr(self.client, 'jwt_token', None) != expired_token:
+                return
+            self._refresh_client_token()
+
+    def enable_cache(self, max_size=1024, ttl=60):
+        """Cache job information and result file lists, so that repeated requests for the same jobs are not sent
+        to the server. Job information expires after `ttl` seconds. File lists also expire after `ttl` seconds,
+        unless the job has finished, in which case its files can no longer change and its file list is kept until
+        it is invalidated or evicted.
+
+        Parameters
+        ----------
+        max_size : int, optional
+            Maximum number of entries in the cache, after which the least recently used are evicted, by default 1024
+        ttl : float, optional
+            Number of seconds after which job information expires, by default 60
+        """
+        self.cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    def disable_cache(self):
+        """Stop caching job information and result file lists, and discard anything already cached"""
+        self.cache = None
+
+    def invalidate_cache(self, job_id=None):
+        """Discard cached information for a job, so that it will be requested from the server next time it is needed
+
+        Parameters
+        ----------
+        job_id : str, optional
+            ID of the job for which to discard the cached information, by default None, which discards everything
+        """
+        if self.cache is None:
+            return
+
+        if job_id is None:
+            self.cache.clear()
+        else:
+            for key in [('job', job_id), ('finished', job_id), ('files', job_id)]:
+                self.cache.invalidate(key)
+
+    def enable_file_cache(self, directory, max_bytes=10 * 1024 ** 3):
+        """Keep downloaded result files in a directory on disk, so that files which have already been downloaded
+        are read from there instead of being downloaded again. The directory can be shared with other processes
+        on the same machine. Once the cached files exceed `max_bytes`, the least recently used are removed.
+
+        Parameters
+        ----------
+        directory : str or ~pathlib.Path
+            Directory in which to store the cached files
+        max_bytes : int, optional
+            Maximum total size of the cached files, by default 10 GB
+        """
+        self.file_cache = FileCache(directory, max_bytes=max_bytes)
+
+    def disable_file_cache(self):
+        """Stop reading and storing downloaded files in the file cache. Files already cached are left on disk."""
+        self.file_cache = None
+
+    def _cache_job(self, query_data):
+        if self.cache is None or not query_data:
+            return
+
+        self.cache.set(('job', query_data['id']), query_data)
+        if query_data['job_status']['name'] in ViterbiJob.FINISHED_STATUSES:
+            self.cache.set(('finished', query_data['id']), True, ttl=None)
+
+    def _get_cached_job(self, job_id):
+        if self.cache is None:
+            return None
+
+        return self._get_job_model_from_query(self.cache.get(('job', job_id)))
+
+    def _cache_file_list(self, job_id, file_list):
+        if self.cache is None:
+            return
+
+        ttl = None if ('finished', job_id) in self.cache else self.cache.ttl
+        self.cache.set(('files', job_id), file_list, ttl=ttl)
+
+    def _get_cached_file_list(self, job_id):
+        if self.cache is None:
+            return None
+
+        file_list = self.cache.get(('files', job_id))
+        return None if file_list is None else FileReferenceList(list(file_list))
 
     def start_viterbi_job(
         self, job_name, job_description, private, data_input=None, data_params=None, search_params=None
@@ -54,6 +220,84 @@ class GWLabViterbi:
         ViterbiJob
             Created job
         """
+        query, variables = self._new_viterbi_job_query(
+            job_name, job_description, private, data_input, data_params, search_params
+        )
+
+        data = self.request(query=query, variables=variables)
+
+        job_id = data['new_viterbi_job']['result']['job_id']
+        return self.get_job_by_id(job_id)
+
+    def start_viterbi_jobs(self, job_specs, job_description="", private=False, max_workers=8, fetch_jobs=True):
+        """Start many viterbi jobs, such as the points of a parameter sweep. Several jobs are submitted at once,
+        and a job that fails to submit does not stop the others. Specs are read from `job_specs` as jobs are
+        submitted, so it can be a generator that produces more specs than would fit in memory.
+
+        Parameters
+        ----------
+        job_specs : iterable
+            Tuples of the job name, DataInput, DataParametersInput and SearchParametersInput for each job.
+            Any of the inputs may be None, in which case default inputs will be used for those fields.
+        job_description : str, optional
+            Description of the jobs to be created, by default ""
+        private : bool, optional
+            True if the jobs should be private, False if they should be public, by default False
+        max_workers : int, optional
+            Maximum number of jobs to submit at once, by default 8
+        fetch_jobs : bool, optional
+            Request the created jobs once they have all been submitted, up to 100 jobs per request, so that
+            ViterbiJob instances are available from the `jobs` attribute of the report, by default True.
+            If False, only the IDs of the jobs are returned.
+
+        Returns
+        -------
+        ~gwlab_viterbi_python.utils.job_submission.SubmissionReport
+            Report holding the IDs of the created jobs, and the error for each job that could not be created
+        """
+        report = SubmissionReport()
+
+        def submit(job_spec):
+            job_name, data_input, data_params, search_params = job_spec
+            query, variables = self._new_viterbi_job_query(
+                job_name, job_description, private, data_input, data_params, search_params
+            )
+
+            data = self.request(query=query, variables=variables)
+
+            return data['new_viterbi_job']['result']['job_id']
+
+        def record(future, index, job_name):
+            try:
+                report._add_success(index, job_name, future.result())
+            except Exception as e:
+                report._add_failure(index, job_name, e)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for index, job_spec in enumerate(job_specs):
+                # Only a few specs are queued beyond those being submitted, so that the specs are read lazily
+                if len(futures) >= 2 * max_workers:
+                    done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        record(future, *futures.pop(future))
+                futures[executor.submit(submit, job_spec)] = (index, job_spec[0])
+
+            for future in concurrent.futures.as_completed(futures):
+                record(future, *futures[future])
+
+        logger.info(f'Submitted {len(report.job_ids)} of {len(report)} jobs')
+
+        if fetch_jobs and report.job_ids:
+            try:
+                report._set_jobs(self.get_jobs_by_ids(report.job_ids))
+            except Exception as e:
+                # The jobs have already been created, so their IDs are still returned
+                logger.warning(f'Submitted jobs could not be fetched: {e!r}')
+
+        return report
+
+    def _new_viterbi_job_query(self, job_name, job_description, private, data_input, data_params, search_params):
         query = """
             mutation NewViterbiJob($input: ViterbiJobMutationInput!){
                 newViterbiJob (input: $input) {
@@ -64,10 +308,6 @@ class GWLabViterbi:
             }
         """
 
-        data_inputs = DataInput() if data_input is None else data_input
-        data_parameters_inputs = DataParametersInput() if data_params is None else data_params
-        search_parameters_inputs = SearchParametersInput() if search_params is None else search_params
-
         variables = {
             "input": {
                 "start": {
@@ -75,16 +315,16 @@ class GWLabViterbi:
                     "description": job_description,
                     "private": private,
                 },
-                "data": asdict(data_inputs),
-                "data_parameters": asdict(data_parameters_inputs),
-                "search_parameters": asdict(search_parameters_inputs),
+                "data": self._get_input_values(DataInput, data_input),
+                "data_parameters": self._get_input_values(DataParametersInput, data_params),
+                "search_parameters": self._get_input_values(SearchParametersInput, search_params),
             }
         }
 
-        data = self.request(query=query, variables=variables)
+        return query, variables
 
-        job_id = data['new_viterbi_job']['result']['job_id']
-        return self.get_job_by_id(job_id)
+    def _get_input_values(self, input_class, inputs):
+        return dict(_get_default_values(input_class)) if inputs is None else inputs.to_dict()
 
     def _get_job_model_from_query(self, query_data):
         if not query_data:
@@ -116,6 +356,13 @@ class GWLabViterbi:
         list
             List of ViterbiJob instances for the jobs corresponding to the search terms and in the specified time range
         """
+        query, variables = self._public_job_list_query(search, time_range, number)
+
+        data = self.request(query=query, variables=variables)
+
+        return self._get_job_list_from_query(data['public_viterbi_jobs'], log_empty=True)
+
+    def _public_job_list_query(self, search, time_range, number):
         query = """
             query ($search: String, $timeRange: String, $first: Int){
                 publicViterbiJobs (search: $search, timeRange: $timeRange, first: $first) {
@@ -141,13 +388,16 @@ class GWLabViterbi:
             "first": number
         }
 
-        data = self.request(query=query, variables=variables)
+        return query, variables
 
-        if not data['public_viterbi_jobs']['edges']:
+    def _get_job_list_from_query(self, query_data, log_empty=False):
+        if not query_data['edges'] and log_empty:
             logger.info('Job search returned no results.')
-            return []
 
-        return [self._get_job_model_from_query(job['node']) for job in data['public_viterbi_jobs']['edges']]
+        for job in query_data['edges']:
+            self._cache_job(job['node'])
+
+        return [self._get_job_model_from_query(job['node']) for job in query_data['edges']]
 
     def get_job_by_id(self, job_id):
         """Get a Viterbi job instance corresponding to a specific job ID
@@ -162,6 +412,17 @@ class GWLabViterbi:
         ViterbiJob
             ViterbiJob instance corresponding to the input ID
         """
+        cached_job = self._get_cached_job(job_id)
+        if cached_job is not None:
+            return cached_job
+
+        query, variables = self._job_by_id_query(job_id)
+
+        data = self.request(query=query, variables=variables)
+
+        return self._get_job_by_id_from_query(data['viterbi_job'])
+
+    def _job_by_id_query(self, job_id):
         query = """
             query ($id: ID!){
                 viterbiJob (id: $id) {
@@ -181,13 +442,107 @@ class GWLabViterbi:
             "id": job_id
         }
 
-        data = self.request(query=query, variables=variables)
+        return query, variables
 
-        if not data['viterbi_job']:
+    def _get_job_by_id_from_query(self, query_data):
+        if not query_data:
             logger.info('No job matching input ID was returned.')
             return None
 
-        return self._get_job_model_from_query(data['viterbi_job'])
+        self._cache_job(query_data)
+        return self._get_job_model_from_query(query_data)
+
+    def get_jobs_by_ids(self, job_ids, chunk_size=100, use_cache=True):
+        """Get the Viterbi job instances corresponding to many job IDs, requesting up to `chunk_size` jobs at once
+
+        Parameters
+        ----------
+        job_ids : list
+            IDs of jobs to obtain
+        chunk_size : int, optional
+            Maximum number of jobs to request in a single query, by default 100
+        use_cache : bool, optional
+            Use job information from the cache, if it is enabled, by default True. If False, every job is requested
+            from the server, and the cache is updated with the results.
+
+        Returns
+        -------
+        list
+            ViterbiJob instances corresponding to the input IDs, in the same order, or None for any ID that
+            does not match a job
+        """
+        job_ids = list(job_ids)
+
+        jobs = [self._get_cached_job(job_id) if use_cache else None for job_id in job_ids]
+        missing_ids = [job_id for job_id, job in zip(job_ids, jobs) if job is None]
+
+        missing_jobs = []
+        for i in range(0, len(missing_ids), chunk_size):
+            query, variables = self._jobs_by_ids_query(missing_ids[i:i + chunk_size])
+
+            data = self.request(query=query, variables=variables)
+
+            missing_jobs.extend(self._get_jobs_by_ids_from_query(data))
+
+        missing_jobs = iter(missing_jobs)
+        return [next(missing_jobs) if job is None else job for job in jobs]
+
+    def _jobs_by_ids_query(self, job_ids):
+        # Each job is requested under its own alias, so that they can all be obtained in a single query
+        variable_definitions = ", ".join(f"$id{i}: ID!" for i in range(len(job_ids)))
+        fields = "".join(
+            f"""
+                job{i}: viterbiJob (id: $id{i}) {{
+                    id
+                    name
+                    user
+                    description
+                    jobStatus {{
+                        name
+                        date
+                    }}
+                }}"""
+            for i in range(len(job_ids))
+        )
+
+        query = f"""
+            query ({variable_definitions}){{{fields}
+            }}
+        """
+
+        variables = {
+            f"id{i}": job_id for i, job_id in enumerate(job_ids)
+        }
+
+        return query, variables
+
+    def _get_jobs_by_ids_from_query(self, query_data):
+        for job in query_data.values():
+            self._cache_job(job)
+
+        return [self._get_job_model_from_query(query_data[f'job{i}']) for i in range(len(query_data))]
+
+    def watch_jobs(self, jobs, min_interval=5, max_interval=120, backoff=1.5):
+        """Create a watcher that polls the statuses of many jobs together, producing an event whenever the status of
+        one of them changes
+
+        Parameters
+        ----------
+        jobs : list
+            ViterbiJob instances or IDs of the jobs to watch
+        min_interval : float, optional
+            Minimum number of seconds between polls, by default 5
+        max_interval : float, optional
+            Maximum number of seconds between polls, by default 120
+        backoff : float, optional
+            Factor by which the interval grows after each poll in which no job changed status, by default 1.5
+
+        Returns
+        -------
+        ~gwlab_viterbi_python.job_watcher.JobWatcher
+            Watcher for the jobs
+        """
+        return JobWatcher(self, jobs, min_interval=min_interval, max_interval=max_interval, backoff=backoff)
 
     def get_user_jobs(self, number=100):
         """Obtains a list of Viterbi jobs created by the user, filtering based on the search terms
@@ -203,6 +558,13 @@ class GWLabViterbi:
         list
             List of ViterbiJob instances for the jobs corresponding to the search terms and in the specified time range
         """
+        query, variables = self._user_jobs_query(number)
+
+        data = self.request(query=query, variables=variables)
+
+        return self._get_job_list_from_query(data['viterbi_jobs'])
+
+    def _user_jobs_query(self, number):
         query = """
             query ($first: Int){
                 viterbiJobs (first: $first){
@@ -226,11 +588,136 @@ class GWLabViterbi:
             "first": number
         }
 
-        data = self.request(query=query, variables=variables)
+        return query, variables
+
+    def iter_user_jobs(self, page_size=100, prefetch=False):
+        """Lazily iterates over all Viterbi jobs created by the user, requesting them one page at a time
+
+        Parameters
+        ----------
+        page_size : int, optional
+            Number of jobs to request at once, by default 100
+        prefetch : bool, optional
+            Request the next page in the background while the current page is being consumed, by default False
+
+        Yields
+        ------
+        ViterbiJob
+            ViterbiJob instances for the jobs created by the user
+        """
+        query = """
+            query ($first: Int, $after: String){
+                viterbiJobs (first: $first, after: $after){
+                    pageInfo {
+                        hasNextPage
+                        endCursor
+                    }
+                    edges {
+                        node {
+                            id
+                            name
+                            user
+                            description
+                            jobStatus {
+                                name
+                                date
+                            }
+                        }
+                    }
+                }
+            }
+        """
+
+        variables = {
+            "first": page_size
+        }
+
+        yield from self._iter_job_pages(query, variables, 'viterbi_jobs', prefetch)
 
-        return [self._get_job_model_from_query(job['node']) for job in data['viterbi_jobs']['edges']]
+    def iter_public_jobs(self, search="", time_range=TimeRange.ANY, page_size=100, prefetch=False):
+        """Lazily iterates over all public Viterbi jobs matching the search terms and time range,
+        requesting them one page at a time
+
+        Parameters
+        ----------
+        search : str, optional
+            Search terms by which to filter public job list, by default ""
+        time_range : .TimeRange or str, optional
+            Time range by which to filter job list, by default TimeRange.ANY
+        page_size : int, optional
+            Number of jobs to request at once, by default 100
+        prefetch : bool, optional
+            Request the next page in the background while the current page is being consumed, by default False
+
+        Yields
+        ------
+        ViterbiJob
+            ViterbiJob instances for the jobs corresponding to the search terms and in the specified time range
+        """
+        query = """
+            query ($search: String, $timeRange: String, $first: Int, $after: String){
+                publicViterbiJobs (search: $search, timeRange: $timeRange, first: $first, after: $after) {
+                    pageInfo {
+                        hasNextPage
+                        endCursor
+                    }
+                    edges {
+                        node {
+                            id
+                            user
+                            name
+                            description
+                            jobStatus {
+                                name
+                                date
+                            }
+                        }
+                    }
+                }
+            }
+        """
+
+        variables = {
+            "search": search,
+            "time_range": time_range.value if isinstance(time_range, TimeRange) else time_range,
+            "first": page_size
+        }
+
+        yield from self._iter_job_pages(query, variables, 'public_viterbi_jobs', prefetch)
+
+    def _iter_job_pages(self, query, variables, connection_name, prefetch):
+        def get_page(cursor):
+            data = self.request(query=query, variables={**variables, "after": cursor})
+            return data[connection_name]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            page = get_page(None)
+            while True:
+                page_info = page['page_info']
+                has_next_page = page_info['has_next_page'] and page['edges']
+
+                if has_next_page and prefetch:
+                    next_page = executor.submit(get_page, page_info['end_cursor'])
+
+                yield from self._get_job_list_from_query(page)
+
+                if not has_next_page:
+                    return
+
+                page = next_page.result() if prefetch else get_page(page_info['end_cursor'])
 
     def _get_files_by_job_id(self, job_id):
+        cached_file_list = self._get_cached_file_list(job_id)
+        if cached_file_list is not None:
+            return cached_file_list, False
+
+        query, variables = self._files_by_job_id_query(job_id)
+
+        data = self.request(query=query, variables=variables)
+
+        return self._get_file_list_from_query(job_id, data['viterbi_result_files']), False
+
+    def _files_by_job_id_query(self, job_id):
         query = """
             query ($jobId: ID!) {
                 viterbiResultFiles (jobId: $jobId) {
@@ -248,10 +735,11 @@ class GWLabViterbi:
             "job_id": job_id
         }
 
-        data = self.request(query=query, variables=variables)
+        return query, variables
 
+    def _get_file_list_from_query(self, job_id, query_data):
         file_list = FileReferenceList()
-        for file_data in data['viterbi_result_files']['files']:
+        for file_data in query_data['files']:
             if file_data['is_dir']:
                 continue
             file_data.pop('is_dir')
@@ -262,20 +750,113 @@ class GWLabViterbi:
                 )
             )
 
-        return file_list, False
+        self._cache_file_list(job_id, file_list)
+        return file_list
+
+    def get_file_list_by_job_ids(self, job_ids, chunk_size=50, max_workers=4):
+        """Get information for all result files associated with many jobs.
+        The file lists for up to `chunk_size` jobs are requested in each query, and several queries are sent at once.
+
+        Parameters
+        ----------
+        job_ids : list
+            IDs of the jobs for which to list files
+        chunk_size : int, optional
+            Maximum number of jobs to request in a single query, by default 50
+        max_workers : int, optional
+            Maximum number of queries to send at once, by default 4
+
+        Returns
+        -------
+        ~gwdc_python.files.file_reference.FileReferenceList
+            Contains FileReference instances for each of the files associated with the jobs, in the order of the jobs
+        """
+        job_ids = list(job_ids)
+
+        file_lists = [self._get_cached_file_list(job_id) for job_id in job_ids]
+        missing_ids = [job_id for job_id, file_list in zip(job_ids, file_lists) if file_list is None]
+
+        def get_file_lists(chunk):
+            query, variables = self._files_by_job_ids_query(chunk)
+
+            data = self.request(query=query, variables=variables)
+
+            return self._get_file_lists_from_query(chunk, data)
+
+        chunks = [missing_ids[i:i + chunk_size] for i in range(0, len(missing_ids), chunk_size)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            missing_file_lists = itertools.chain.from_iterable(executor.map(get_file_lists, chunks))
+
+            file_lists = [next(missing_file_lists) if file_list is None else file_list for file_list in file_lists]
+
+        return FileReferenceList(list(itertools.chain.from_iterable(file_lists)))
+
+    def _files_by_job_ids_query(self, job_ids):
+        # Each job's files are requested under their own alias, so that they can all be obtained in a single query
+        variable_definitions = ", ".join(f"$jobId{i}: ID!" for i in range(len(job_ids)))
+        fields = "".join(
+            f"""
+                files{i}: viterbiResultFiles (jobId: $jobId{i}) {{
+                    files {{
+                        path
+                        isDir
+                        fileSize
+                        downloadToken
+                    }}
+                }}"""
+            for i in range(len(job_ids))
+        )
+
+        query = f"""
+            query ({variable_definitions}) {{{fields}
+            }}
+        """
+
+        variables = {
+            f"job_id{i}": job_id for i, job_id in enumerate(job_ids)
+        }
+
+        return query, variables
 
-    def get_files_by_reference(self, file_references):
-        """Obtains file data when provided a FileReferenceList
+    def _get_file_lists_from_query(self, job_ids, query_data):
+        return [
+            self._get_file_list_from_query(job_id, query_data[f'files{i}'])
+            for i, job_id in enumerate(job_ids)
+        ]
+
+    @property
+    def _download_options(self):
+        return {
+            'session_pool': self.session_pool,
+            'max_workers': self.max_workers,
+            'bandwidth_limit': self.bandwidth_limit,
+        }
+
+    def _get_memory_budget(self):
+        if self.memory_limit is None:
+            return None
+        # The files returned by each call are held in memory together, so each call is given its own budget
+        return _MemoryBudget(self.memory_limit, self.max_workers)
+
+    def _get_file_map_fn(self, memory_budget=None):
+        if memory_budget is None:
+            return _get_file_map_fn
+        return partial(_get_file_map_fn, memory_budget=memory_budget)
+
+    def _get_download_ids(self, file_references):
+        """Generate download ids for every file in a FileReferenceList, one request per job
 
         Parameters
         ----------
         file_references : FileReferenceList
-            Contains the :class:`FileReference` objects for which to download the contents
+            Contains the :class:`FileReference` objects for which to generate download ids
 
         Returns
         -------
         list
-            List of tuples containing the file path and file contents as a byte string
+            Download ids for the files
+        FileReferenceList
+            The input files, reordered to match the download ids
         """
         batched = file_references.batched
 
@@ -287,17 +868,265 @@ class GWLabViterbi:
         file_ids = list(itertools.chain.from_iterable(file_ids))
         batched_files = FileReferenceList(list(itertools.chain.from_iterable(batched.values())))
 
-        file_paths = batched_files.get_paths()
-        total_size = batched_files.get_total_bytes()
+        return file_ids, batched_files
+
+    def _get_download_batches(self, file_references, get_file_paths):
+        """Group files by job, pairing each group with a function that generates their download ids
+
+        Parameters
+        ----------
+        file_references : FileReferenceList
+            Contains the :class:`FileReference` objects to group
+        get_file_paths : function
+            Takes the FileReferenceList for a job and returns the paths to pass to the download functions
+
+        Returns
+        -------
+        list
+            Tuples containing the download id function, file paths and file sizes for each job
+        """
+        return [
+            (
+                partial(self._get_download_ids_for_batch, job_id, job_files.get_tokens()),
+                get_file_paths(job_files),
+                [ref.file_size for ref in job_files]
+            )
+            for job_id, job_files in file_references.batched.items()
+        ]
+
+    def _get_download_ids_for_batch(self, job_id, file_tokens, positions=None):
+        if positions is not None:
+            file_tokens = [file_tokens[position] for position in positions]
+        return self._get_download_ids_from_tokens(job_id, file_tokens)
+
+    def get_files_by_reference(self, file_references, lazy=False, directory=None):
+        """Obtains file data when provided a FileReferenceList.
+        Download ids are requested for each job concurrently, and the files for each job begin downloading as soon as
+        their ids are available.
+
+        Parameters
+        ----------
+        file_references : FileReferenceList
+            Contains the :class:`FileReference` objects for which to download the contents
+        lazy : bool, optional
+            Save the files to disk and return a :class:`~gwlab_viterbi_python.utils.lazy_file.LazyFile` for each,
+            which memory-maps the file when its contents are first accessed, instead of reading the files into
+            memory, by default False
+        directory : str or ~pathlib.Path, optional
+            Directory in which to save the files when `lazy` is True, with a subdirectory for each job. Files that
+            have already been saved there are not downloaded again. By default None, which uses a temporary
+            directory that is removed once all of the returned files have been garbage collected.
+
+        Returns
+        -------
+        list
+            List of tuples containing the file path and file contents as a bytearray, or as a read-only
+            :class:`mmap.mmap` for files that did not fit within the `memory_limit`.
+            If `lazy` is True, the file contents are instead given as LazyFile instances.
+
+        Raises
+        ------
+        ~gwlab_viterbi_python.exceptions.GWLabDownloadError
+            If any of the files could not be downloaded after retrying, once all other files have been downloaded.
+            The contents of the files that were downloaded are available from its `report` attribute.
+        """
+        if lazy:
+            return self._get_lazy_files(file_references, directory)
+
+        memory_budget = self._get_memory_budget()
+
+        if self.file_cache is None:
+            file_batches = self._get_download_batches(file_references, FileReferenceList.get_paths)
 
-        files = _download_files(_get_file_map_fn, file_ids, file_paths, total_size)
+            report = _download_files(self._get_file_map_fn(memory_budget), file_batches, **self._download_options)
+            report.raise_for_failures()
+            files = report.results
 
-        logger.info(f'All {len(file_ids)} files downloaded!')
+            logger.info(f'All {len(files)} files downloaded!')
+
+            return files
+
+        # Files are ordered by job, as they would be if they were all downloaded, so that the downloaded files can
+        # be matched up with their references and merged back in with the cached files. Cached files are read into
+        # memory from the same budget as the downloaded files.
+        file_references = FileReferenceList(list(itertools.chain.from_iterable(file_references.batched.values())))
+        cached_files = [self.file_cache.read(ref, memory_budget) for ref in file_references]
+        missing_files = FileReferenceList([
+            ref for ref, content in zip(file_references, cached_files) if content is None
+        ])
+
+        downloaded_files = []
+        if missing_files:
+            file_batches = self._get_download_batches(missing_files, FileReferenceList.get_paths)
+            report = _download_files(self._get_file_map_fn(memory_budget), file_batches, **self._download_options)
+            report.raise_for_failures()
+            downloaded_files = report.results
+
+        for ref, (_, content) in zip(missing_files, downloaded_files):
+            self.file_cache.store_bytes(ref, content)
+
+        downloaded = iter(downloaded_files)
+        files = [
+            (ref.path, content) if content is not None else next(downloaded)
+            for ref, content in zip(file_references, cached_files)
+        ]
+
+        logger.info(
+            f'All {len(files)} files obtained, {len(files) - len(missing_files)} of them from the file cache!'
+        )
 
         return files
 
-    def save_files_by_reference(self, file_references, root_path, preserve_directory_structure=True):
-        """Save files when provided a FileReferenceList and a root path
+    def _get_lazy_files(self, file_references, directory=None):
+        temporary_directory = None
+        if directory is None:
+            temporary_directory = tempfile.TemporaryDirectory(prefix='gwlab_viterbi_')
+            directory = temporary_directory.name
+        directory = Path(directory)
+
+        def get_output_paths(file_refs):
+            # Each job has its own subdirectory, as different jobs have files with the same paths
+            return [directory / str(ref.job_id) / ref.path for ref in file_refs]
+
+        file_references = FileReferenceList(list(itertools.chain.from_iterable(file_references.batched.values())))
+        self._save_files(file_references, get_output_paths, resume=True)
+
+        return [
+            (ref.path, LazyFile(path, keep_alive=temporary_directory))
+            for ref, path in zip(file_references, get_output_paths(file_references))
+        ]
+
+    def iter_files_by_reference(self, file_references):
+        """Streams file data when provided a FileReferenceList, without holding whole files in memory.
+        Files are downloaded one after another, and their contents are yielded in chunks as they arrive.
+
+        Parameters
+        ----------
+        file_references : FileReferenceList
+            Contains the :class:`FileReference` objects for which to download the contents
+
+        Yields
+        ------
+        tuple
+            The file path and the next chunk of that file's contents as a byte string
+        """
+        file_ids, batched_files = self._get_download_ids(file_references)
+
+        file_paths = batched_files.get_paths()
+        file_sizes = [ref.file_size for ref in batched_files]
+
+        yield from _iter_files(file_ids, file_paths, file_sizes, self.session_pool)
+
+    def filter_candidates(self, file_references, threshold=None, top_k=None, field='log_likelihood'):
+        """Stream candidates files when provided a FileReferenceList, keeping only the candidates that pass a
+        threshold and/or are among the best `top_k`. Requires the optional `numpy` dependency.
+        The files are parsed in batches while they download, so whole files are never held in memory.
+
+        Parameters
+        ----------
+        file_references : FileReferenceList
+            Contains the :class:`FileReference` objects for the candidates files
+        threshold : float or str, optional
+            Only keep candidates whose `field` is greater than or equal to this value, by default None (no threshold)
+        top_k : int, optional
+            Only keep the `top_k` candidates with the largest `field`, by default None (no limit)
+        field : str, optional
+            Name of the field to which the threshold and top k selection are applied, by default 'log_likelihood'
+
+        Returns
+        -------
+        numpy.ndarray
+            Structured array with 'a0', 'phase', 'log_likelihood' and 'score' fields, containing the selected
+            candidates. If `top_k` is given, they are sorted from largest to smallest `field`.
+        """
+        selector = CandidatesSelector(threshold=threshold, top_k=top_k, field=field)
+
+        file_ids, batched_files = self._get_download_ids(file_references)
+        file_paths = [ref.path for ref in batched_files]
+        file_sizes = [ref.file_size for ref in batched_files]
+
+        for chunks in _iter_file_streams(file_ids, file_paths, file_sizes, self.session_pool):
+            for candidates in iter_candidates(chunks):
+                selector.add(candidates)
+
+        return selector.result()
+
+    def aggregate_candidates(self, jobs, threshold=None, top_k=None, field='log_likelihood'):
+        """Combine the candidates from many jobs into a single table, keeping only the candidates that pass a
+        threshold and/or are among the best `top_k` across all of the jobs. Requires the optional `numpy` dependency.
+        Files are downloaded and parsed concurrently, and each file is filtered as it is parsed, so that memory use
+        stays bounded when `top_k` is given.
+
+        Parameters
+        ----------
+        jobs : list or FileReferenceList
+            ViterbiJob instances whose candidates files should be combined, or a FileReferenceList containing
+            the candidates files
+        threshold : float or str, optional
+            Only keep candidates whose `field` is greater than or equal to this value, by default None (no threshold)
+        top_k : int, optional
+            Only keep the `top_k` candidates with the largest `field`, by default None (no limit)
+        field : str, optional
+            Name of the field to which the threshold and top k selection are applied, by default 'log_likelihood'
+
+        Returns
+        -------
+        numpy.ndarray
+            Structured array with 'a0', 'phase', 'log_likelihood', 'score' and 'job_id' fields, containing the
+            selected candidates. If `top_k` is given, they are sorted from largest to smallest `field`, and
+            otherwise they are in the order of their jobs.
+        """
+        if isinstance(jobs, FileReferenceList):
+            file_references = jobs
+        else:
+            file_list = self.get_file_list_by_job_ids([job.job_id for job in jobs])
+            file_references = file_list.filter_list(candidates_filter)
+
+        aggregator = _CandidatesAggregator(
+            file_references.batched.keys(), threshold=threshold, top_k=top_k, field=field
+        )
+
+        # The FileReference of each file is passed to the aggregator in place of its path
+        file_batches = self._get_download_batches(file_references, lambda job_files: list(job_files))
+        _download_files(aggregator.map_fn, file_batches, **self._download_options).raise_for_failures()
+
+        return aggregator.result()
+
+    def export_candidates(self, jobs, file_path, data_params=None, search_params=None, threshold=None, top_k=None,
+                          field='log_likelihood', compress=None):
+        """Combine the candidates from many jobs with :meth:`aggregate_candidates`, and save them to a binary
+        columnar file with :func:`~gwlab_viterbi_python.utils.candidates_export.export_candidates`, so that they
+        can be loaded again with :func:`~gwlab_viterbi_python.utils.candidates_export.load_exported_candidates`.
+
+        Parameters
+        ----------
+        jobs : list or FileReferenceList
+            ViterbiJob instances whose candidates files should be combined, or a FileReferenceList containing
+            the candidates files
+        file_path : str or ~pathlib.Path
+            Path of the file to write, with a '.npz', '.feather', '.arrow' or '.parquet' suffix
+        data_params : DataParametersInput, optional
+            Data parameters used by the jobs, to be saved with the candidates, by default None
+        search_params : SearchParametersInput, optional
+            Search parameters used by the jobs, to be saved with the candidates, by default None
+        threshold : float or str, optional
+            Only keep candidates whose `field` is greater than or equal to this value, by default None (no threshold)
+        top_k : int, optional
+            Only keep the `top_k` candidates with the largest `field`, by default None (no limit)
+        field : str, optional
+            Name of the field to which the threshold and top k selection are applied, by default 'log_likelihood'
+        compress : bool, optional
+            Compress the data, by default None, which compresses '.npz' and '.parquet' files, but not '.feather'
+            or '.arrow' files, so that they can be memory-mapped without copying
+        """
+        candidates = self.aggregate_candidates(jobs, threshold=threshold, top_k=top_k, field=field)
+        export_candidates(file_path, candidates, data_params=data_params, search_params=search_params,
+                          compress=compress)
+
+    def save_files_by_reference(self, file_references, root_path, preserve_directory_structure=True, resume=False):
+        """Save files when provided a FileReferenceList and a root path.
+        Download ids are requested for each job concurrently, and the files for each job begin downloading as soon as
+        their ids are available.
 
         Parameters
         ----------
@@ -307,23 +1136,225 @@ class GWLabViterbi:
             Directory into which to save the files
         preserve_directory_structure : bool, optional
             Remove any directory structure for the downloaded files, by default True
+        resume : bool, optional
+            Skip files that have already been saved with the expected size, and continue any interrupted downloads
+            from where they stopped rather than from the beginning, by default False.
+            Incomplete files are kept with a '.part' suffix until they have been fully downloaded.
+
+        Returns
+        -------
+        ~gwlab_viterbi_python.utils.download_scheduler.DownloadReport
+            Report of the files that were downloaded, which excludes any that were skipped or
+            taken from the file cache
+
+        Raises
+        ------
+        ~gwlab_viterbi_python.exceptions.GWLabDownloadError
+            If any of the files could not be downloaded after retrying, once all other files have been saved.
+            The files that failed are listed in its `report` attribute.
         """
-        batched = file_references.batched
+        return self._save_files(
+            file_references,
+            lambda file_refs: file_refs.get_output_paths(root_path, preserve_directory_structure),
+            resume
+        )
 
-        file_ids = [
-            self._get_download_ids_from_tokens(job_id, job_files.get_tokens())
-            for job_id, job_files in batched.items()
-        ]
+    def _get_files_to_download(self, file_references, get_output_paths, resume=False):
+        """Remove the files that do not need to be downloaded, because they have already been saved to their
+        output paths when resuming, or because they could be copied there from the file cache"""
+        if resume and file_references:
+            output_paths = get_output_paths(file_references)
+            file_references = FileReferenceList([
+                ref for ref, path in zip(file_references, output_paths)
+                if not _is_file_complete(path, ref.file_size)
+            ])
+            skipped = len(output_paths) - len(file_references)
+            if skipped:
+                logger.info(f'Skipping {skipped} files that have already been saved')
+
+        if self.file_cache is not None and file_references:
+            output_paths = get_output_paths(file_references)
+            file_references = FileReferenceList([
+                ref for ref, path in zip(file_references, output_paths)
+                if not self.file_cache.copy_to(ref, path)
+            ])
+            cached = len(output_paths) - len(file_references)
+            if cached:
+                logger.info(f'Saved {cached} files from the file cache')
+
+        return file_references
+
+    def _cache_saved_files(self, file_references, get_output_paths, report):
+        if self.file_cache is None:
+            return
+
+        saved_paths = set(report.succeeded)
+        output_paths = get_output_paths(file_references)
+        for ref, path in zip(file_references, output_paths):
+            if path in saved_paths:
+                self.file_cache.store_file(ref, path)
+
+    def _save_files(self, file_references, get_output_paths, resume=False):
+        """Save files to the paths returned by `get_output_paths`, which takes a FileReferenceList and returns
+        the path at which to save each file. See :meth:`save_files_by_reference`."""
+        file_references = self._get_files_to_download(file_references, get_output_paths, resume)
+        if not file_references:
+            logger.info('All files saved!')
+            return DownloadReport()
+
+        file_batches = self._get_download_batches(file_references, get_output_paths)
+
+        map_fn = _resume_file_map_fn if resume else _save_file_map_fn
+        report = _download_files(map_fn, file_batches, **self._download_options)
+
+        self._cache_saved_files(file_references, get_output_paths, report)
+
+        report.raise_for_failures()
+
+        logger.info(f'All {len(file_references)} files saved!')
+
+        return report
+
+    def harvest_jobs(self, jobs, root_path, file_filter='candidates', min_interval=5, max_interval=120,
+                     max_poll_retries=5):
+        """Watch running jobs, and save the files of each job as soon as it completes, while the other jobs are still
+        being watched. The files of each job are saved into a subdirectory of `root_path` named after its ID, and files
+        that have already been saved there are not downloaded again, so an interrupted harvest can simply be rerun.
+
+        The files of all of the jobs share a single download queue, so no more than `max_workers` files are
+        downloaded at once, and the `bandwidth_limit` of the client applies to the harvest as a whole.
 
-        file_ids = list(itertools.chain.from_iterable(file_ids))
-        batched_files = FileReferenceList(list(itertools.chain.from_iterable(batched.values())))
+        Parameters
+        ----------
+        jobs : list
+            ViterbiJob instances or IDs of the jobs to harvest
+        root_path : str or ~pathlib.Path
+            Directory into which to save the files
+        file_filter : str, optional
+            Name of the filter in :attr:`ViterbiJob.FILE_LIST_FILTERS` used to choose which files to save,
+            by default 'candidates'. If None, all of the files of each job are saved.
+        min_interval : float, optional
+            Minimum number of seconds between polls of the job statuses, by default 5
+        max_interval : float, optional
+            Maximum number of seconds between polls of the job statuses, by default 120
+        max_poll_retries : int, optional
+            Number of times in a row that a failed poll of the job statuses is retried before the harvest is stopped,
+            by default 5. The delay before each retry starts at `min_interval` and doubles with each failure, up to
+            `max_interval`. If the harvest is stopped, the files that are being downloaded are finished, but no more
+            are started.
+
+        Returns
+        -------
+        dict
+            DownloadReport for each job that completed, keyed by job ID. Jobs that finished without completing
+            are not included. If the files of a job could not be listed, its report holds a single failure for
+            the job's subdirectory of `root_path`, with the error that occurred.
+        """
+        root_path = Path(root_path)
+        filter_fn = None if file_filter is None else ViterbiJob.FILE_LIST_FILTERS[file_filter]
+        watcher = JobWatcher(self, jobs, min_interval=min_interval, max_interval=max_interval)
+
+        def get_output_paths(file_refs):
+            return [root_path / str(ref.job_id) / ref.path for ref in file_refs]
+
+        # The size of the download grows as jobs complete, so the progress bar's total is increased as files are queued
+        progress = tqdm(total=0, leave=True, unit='B', unit_scale=True)
+        scheduler = DownloadScheduler(
+            _resume_file_map_fn,
+            max_workers=self.max_workers,
+            bandwidth_limit=self.bandwidth_limit,
+            session_pool=self.session_pool,
+            progress_bar=progress
+        )
 
-        file_paths = batched_files.get_output_paths(root_path, preserve_directory_structure)
-        total_size = batched_files.get_total_bytes()
+        completed_ids = []
+        job_files = {}
+        job_errors = {}
+        id_errors = []
+        start = 0
+        poll_failures = 0
+
+        def queue_job_files(job_id, file_list):
+            nonlocal start
+            if filter_fn is not None:
+                file_list = file_list.filter_list(filter_fn)
+            file_list = self._get_files_to_download(file_list, get_output_paths, resume=True)
+            file_batches = self._get_download_batches(file_list, get_output_paths)
+
+            progress.total += file_list.get_total_bytes()
+            progress.refresh()
+            id_errors.extend(_submit_file_batches(scheduler, file_batches, self.max_workers, start))
+            job_files[job_id] = (range(start, start + len(file_list)), file_list)
+            start += len(file_list)
+
+        try:
+            while True:
+                try:
+                    events = watcher.poll()
+                except Exception as e:
+                    if poll_failures >= max_poll_retries:
+                        raise
+                    delay = min(max_interval, min_interval * 2 ** poll_failures)
+                    poll_failures += 1
+                    logger.warning(f'Failed to poll the statuses of the jobs, retrying in {delay} seconds: {e}')
+                    time.sleep(delay)
+                    continue
+                poll_failures = 0
+
+                new_ids = [event.job_id for event in events if event.status == 'Completed']
+                for event in events:
+                    if event.job is not None and event.job.is_finished and event.status != 'Completed':
+                        logger.warning(f"Job {event.job_id} finished with status '{event.status}', so has no files")
+
+                # The files of the jobs that completed since the last poll are listed together, and then queued for
+                # download in the background while the remaining jobs are watched. A job whose files cannot be
+                # listed or queued is recorded as failed, without stopping the other jobs.
+                if new_ids:
+                    completed_ids += new_ids
+                    try:
+                        file_lists = self.get_file_list_by_job_ids(new_ids).batched
+                    except Exception as e:
+                        file_lists = {}
+                        job_errors.update(dict.fromkeys(new_ids, e))
+
+                    for job_id in new_ids:
+                        if job_id in job_errors:
+                            continue
+                        try:
+                            queue_job_files(job_id, FileReferenceList(file_lists.get(job_id, [])))
+                        except Exception as e:
+                            job_errors[job_id] = e
+
+                if not len(watcher):
+                    break
+                time.sleep(watcher.interval)
+
+            report = scheduler.join()
+        finally:
+            # If the harvest was stopped by an error, the queued files are dropped rather than left downloading in
+            # the background, so the workers stop as soon as the files that they are saving are finished
+            scheduler.cancel()
+            progress.close()
+
+        _add_id_errors(report, id_errors)
+
+        reports = {}
+        for job_id in completed_ids:
+            if job_id in job_errors:
+                reports[job_id] = DownloadReport()
+                reports[job_id]._add_failure(0, root_path / str(job_id), job_errors[job_id])
+                continue
+
+            indices, file_list = job_files[job_id]
+            reports[job_id] = report._subset(indices)
+            self._cache_saved_files(file_list, get_output_paths, reports[job_id])
 
-        _download_files(_save_file_map_fn, file_ids, file_paths, total_size)
+        failed = [job_id for job_id, job_report in reports.items() if not job_report.ok]
+        if failed:
+            logger.warning(f'Some files could not be saved for {len(failed)} jobs: {", ".join(map(str, failed))}')
+        logger.info(f'Harvested the files of {len(reports)} jobs')
 
-        logger.info(f'All {len(file_ids)} files saved!')
+        return reports
 
     def _get_download_id_from_token(self, job_id, file_token):
         """Get a single file download id for a file download token
@@ -359,6 +1390,13 @@ class GWLabViterbi:
         list
             List of download ids for the desired files
         """
+        query, variables = self._download_ids_query(job_id, file_tokens)
+
+        data = self.request(query=query, variables=variables)
+
+        return data['generate_file_download_ids']['result']
+
+    def _download_ids_query(self, job_id, file_tokens):
         query = """
             mutation ResultFileMutation($input: GenerateFileDownloadIdsInput!) {
                 generateFileDownloadIds(input: $input) {
@@ -374,6 +1412,4 @@ class GWLabViterbi:
             }
         }
 
-        data = self.request(query=query, variables=variables)
-
-        return data['generate_file_download_ids']['result']
+        return query, variables
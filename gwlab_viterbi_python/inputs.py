@@ -1,3 +1,7 @@
+import functools
+import itertools
+import operator
+from dataclasses import dataclass as std_dataclass
 from pydantic.dataclasses import dataclass
 from enum import Enum
 
@@ -8,6 +12,74 @@ class _InputConfig:
     use_enum_values = True
 
 
+class _Input:
+    """Methods shared by the input classes, giving a fast path for creating and serialising many similar inputs"""
+
+    def copy(self, **overrides):
+        """Create a copy of these inputs, with some of the fields changed. Only the changed fields are validated,
+        as the others were already validated when these inputs were created, so a validated instance can be used
+        as a template from which many inputs are created cheaply.
+
+        Parameters
+        ----------
+        **overrides
+            New values of the fields to change
+
+        Returns
+        -------
+        Copy of the inputs, of the same class
+
+        Raises
+        ------
+        pydantic.ValidationError
+            If any of the new values are invalid
+        """
+        instance = _construct(type(self), self._get_values())
+        for name, value in overrides.items():
+            if name not in self.__dataclass_fields__:
+                raise TypeError(f"{type(self).__name__} has no field '{name}'")
+            setattr(instance, name, value)
+        return instance
+
+    def to_dict(self):
+        """Get the values of the fields, in the form sent to the GraphQL API.
+        This is equivalent to :func:`dataclasses.asdict`, but much faster, as the fields only hold strings which
+        do not need to be deep copied. The values are cached until a field is changed.
+
+        Returns
+        -------
+        dict
+            Values of the fields, keyed by field name
+        """
+        return dict(self._get_values())
+
+    def _get_values(self):
+        values = self.__dict__.get('_values')
+        if values is None:
+            values = {name: self.__dict__[name] for name in self.__dataclass_fields__}
+            object.__setattr__(self, '_values', values)
+        return values
+
+
+@functools.lru_cache(maxsize=None)
+def _get_default_values(cls):
+    # The default inputs are validated once, rather than every time they are used
+    return cls()._get_values()
+
+
+def _input_dataclass(cls):
+    cls = dataclass(config=_InputConfig)(cls)
+    validate_assignment = cls.__setattr__
+
+    def __setattr__(self, name, value):
+        validate_assignment(self, name, value)
+        # Changing a field invalidates the cached values
+        self.__dict__.pop('_values', None)
+
+    cls.__setattr__ = __setattr__
+    return cls
+
+
 class DataChoice(Enum):
     """Enum to give choices for data_choice"""
     REAL = 'real'
@@ -21,8 +93,8 @@ class SourceDataset(Enum):
     O3 = 'o3'
 
 
-@dataclass(config=_InputConfig)
-class DataInput:
+@_input_dataclass
+class DataInput(_Input):
     """Convenient class to hold the inputs for where the data should come from"""
 
     data_choice: DataChoice = DataChoice.REAL
@@ -32,8 +104,8 @@ class DataInput:
     """Choice of 'o1', 'o2' or 'o3'"""
 
 
-@dataclass(config=_InputConfig)
-class DataParametersInput:
+@_input_dataclass
+class DataParametersInput(_Input):
     """Convenient class to hold the inputs for the data"""
 
     start_frequency_band: str = "188.0"
@@ -70,8 +142,8 @@ class DataParametersInput:
     """Frequency step size (Hz)"""
 
 
-@dataclass(config=_InputConfig)
-class SearchParametersInput:
+@_input_dataclass
+class SearchParametersInput(_Input):
     """Convenient class to hold the inputs for the search"""
 
     search_start_time: str = "1238166483"
@@ -109,3 +181,148 @@ class SearchParametersInput:
 
     search_l_l_threshold: str = "296.27423"
     """Log-likelihood threshold"""
+
+
+def _construct(cls, values):
+    # Builds an input from values that have already been validated, without running the validation again
+    instance = object.__new__(cls)
+    instance.__dict__.update(values, __pydantic_initialised__=True)
+    return instance
+
+
+@std_dataclass(frozen=True)
+class SweepAxis:
+    """Range of one orbital parameter, divided into equal tiles which are each searched by a separate job"""
+
+    start: float
+    """Start of the range"""
+
+    stop: float
+    """End of the range"""
+
+    tiles: int = 1
+    """Number of tiles into which the range is divided"""
+
+    bins: int = None
+    """Number of bins in each tile, by default None, which keeps the number of bins of the base search parameters"""
+
+    def __post_init__(self):
+        if not self.stop > self.start:
+            raise ValueError(f'The end of a sweep axis must be greater than its start, got {self.start}, {self.stop}')
+        if self.tiles < 1:
+            raise ValueError(f'A sweep axis must have at least one tile, got {self.tiles}')
+        if self.bins is not None and self.bins < 1:
+            raise ValueError(f'Each tile must have at least one bin, got {self.bins}')
+
+    def _get_tiles(self, central_field, band_field, bins_field):
+        # Each tile is searched from its centre, with a band covering the width of the tile
+        width = (self.stop - self.start) / self.tiles
+        tiles = []
+        for i in range(self.tiles):
+            tile = {central_field: repr(self.start + (i + 0.5) * width), band_field: repr(width)}
+            if self.bins is not None:
+                tile[bins_field] = str(self.bins)
+            tiles.append(tile)
+        return tiles
+
+
+_SWEEP_FIELDS = {
+    'a0': ('search_central_a0', 'search_a0_band', 'search_a0_bins'),
+    'p': ('search_central_p', 'search_p_band', 'search_p_bins'),
+    'orbit_tp': ('search_central_orbit_tp', 'search_orbit_tp_band', 'search_orbit_tp_bins'),
+}
+
+
+class SearchSweep:
+    """Grid of search parameters tiling a region of orbital parameter space, with one SearchParametersInput for
+    each tile. The search parameters are produced lazily as the sweep is iterated over.
+
+    The base search parameters and the values of each axis are validated once, when the sweep is created,
+    after which the search parameters for each tile are built from the validated values without being
+    validated again, so that large sweeps can be generated quickly.
+
+    Parameters
+    ----------
+    base : SearchParametersInput, optional
+        Search parameters used for every tile, apart from the fields set by the axes, by default the defaults
+    a0 : SweepAxis, optional
+        Range of the orbit projected semi-major axis, setting the `search_central_a0`, `search_a0_band` and
+        `search_a0_bins` fields, by default None, which keeps the values of `base`
+    p : SweepAxis, optional
+        Range of the orbital period, setting the `search_central_p`, `search_p_band` and `search_p_bins` fields,
+        by default None, which keeps the values of `base`
+    orbit_tp : SweepAxis, optional
+        Range of the time of ascension, setting the `search_central_orbit_tp`, `search_orbit_tp_band` and
+        `search_orbit_tp_bins` fields, by default None, which keeps the values of `base`
+    tiling : str, optional
+        'product' to search every combination of the tiles of each axis, or 'zip' to pair the first tiles of
+        every axis, then the second tiles, and so on, in which case every axis must have the same number of
+        tiles, by default 'product'
+
+    Raises
+    ------
+    ValueError
+        If the tiling is not recognised, or the axes have different numbers of tiles with 'zip' tiling
+    """
+
+    def __init__(self, base=None, a0=None, p=None, orbit_tp=None, tiling='product'):
+        if tiling not in ('product', 'zip'):
+            raise ValueError(f"Tiling must be 'product' or 'zip', got '{tiling}'")
+
+        self.base = SearchParametersInput() if base is None else base
+        self.tiling = tiling
+        self.axes = {
+            name: axis for name, axis in [('a0', a0), ('p', p), ('orbit_tp', orbit_tp)] if axis is not None
+        }
+
+        tile_counts = {axis.tiles for axis in self.axes.values()}
+        if tiling == 'zip' and len(tile_counts) > 1:
+            raise ValueError("With 'zip' tiling, every axis must have the same number of tiles")
+
+        self._tiles = [axis._get_tiles(*_SWEEP_FIELDS[name]) for name, axis in self.axes.items()]
+
+        # Every value used by the sweep is validated together, in a single instance per tile of the longest axis
+        self._base_values = self.base.to_dict()
+        for i in range(max(tile_counts, default=0)):
+            values = dict(self._base_values)
+            for tiles in self._tiles:
+                values.update(tiles[i % len(tiles)])
+            SearchParametersInput(**values)
+
+    def __len__(self):
+        if not self._tiles:
+            return 1
+        if self.tiling == 'zip':
+            return len(self._tiles[0])
+        return functools.reduce(operator.mul, (len(tiles) for tiles in self._tiles), 1)
+
+    def __iter__(self):
+        combine = zip if self.tiling == 'zip' else itertools.product
+        for combination in combine(*self._tiles):
+            values = dict(self._base_values)
+            for tile in combination:
+                values.update(tile)
+            yield _construct(SearchParametersInput, values)
+
+    def job_specs(self, name_format='sweep_{index}', data_input=None, data_params=None):
+        """Produce the specs for a job searching each tile of the sweep, which can be passed to
+        :meth:`~gwlab_viterbi_python.gwlab_viterbi.GWLabViterbi.start_viterbi_jobs`
+
+        Parameters
+        ----------
+        name_format : str, optional
+            Format of the job names, filled in with the `index` of the tile in the sweep and the fields of its
+            search parameters, e.g. 'sweep_{index}_{search_central_a0}', by default 'sweep_{index}'
+        data_input : DataInput, optional
+            Data inputs used for every job, by default None, which uses the default inputs
+        data_params : DataParametersInput, optional
+            Data parameters used for every job, by default None, which uses the default inputs
+
+        Yields
+        ------
+        tuple
+            Job name, DataInput, DataParametersInput and SearchParametersInput for each tile
+        """
+        for index, search_params in enumerate(self):
+            job_name = name_format.format(index=index, **search_params.__dict__)
+            yield (job_name, data_input, data_params, search_params)
@@ -0,0 +1,292 @@
+import json
+import sqlite3
+import threading
+import time
+
+from gwdc_python.files import FileReference, FileReferenceList
+from gwdc_python.helpers import TimeRange
+from gwdc_python.logger import create_logger
+
+from .viterbi_job import ViterbiJob
+
+logger = create_logger(__name__)
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        user TEXT,
+        description TEXT,
+        status TEXT,
+        status_date TEXT,
+        other TEXT,
+        synced_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS jobs_name ON jobs (name);
+    CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user);
+    CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+    CREATE INDEX IF NOT EXISTS jobs_status_date ON jobs (status_date);
+
+    CREATE TABLE IF NOT EXISTS files (
+        job_id TEXT,
+        path TEXT,
+        file_size INTEGER,
+        download_token TEXT,
+        PRIMARY KEY (job_id, path)
+    );
+
+    CREATE TABLE IF NOT EXISTS sync_state (
+        source TEXT PRIMARY KEY,
+        synced_at REAL
+    );
+"""
+
+
+class JobIndex:
+    """
+    JobIndex class keeps a local SQLite database of Viterbi jobs and their result files, so that jobs can be
+    searched without sending any requests to the GWLab server.
+
+    The database is filled by :meth:`sync_user_jobs` and :meth:`sync_public_jobs`. Each sync lists the jobs on
+    the server, but only writes the jobs that are new or whose status has changed since they were last synced,
+    and only requests the file lists of those jobs.
+
+    Parameters
+    ----------
+    client : ~gwlab_viterbi_python.gwlab_viterbi.GWLabViterbi
+        Client used to sync the index, and given to the ViterbiJob instances that are returned
+    path : str or ~pathlib.Path, optional
+        Path of the SQLite database file, which is created if it does not exist, by default ':memory:',
+        which keeps the index in memory
+    """
+
+    def __init__(self, client, path=':memory:'):
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+
+    def close(self):
+        """Close the connection to the database"""
+        self._connection.close()
+
+    def sync_user_jobs(self, include_files=True, page_size=100):
+        """Update the index with the jobs created by the user
+
+        Parameters
+        ----------
+        include_files : bool, optional
+            Also store the file lists of jobs that have finished, by default True
+        page_size : int, optional
+            Number of jobs to request at once, by default 100
+
+        Returns
+        -------
+        list
+            ViterbiJob instances for the jobs that were new or had changed since the last sync
+        """
+        jobs = self.client.iter_user_jobs(page_size=page_size)
+        return self._sync(jobs, 'user', include_files)
+
+    def sync_public_jobs(self, search="", time_range=TimeRange.ANY, include_files=True, page_size=100):
+        """Update the index with the public jobs matching the search terms and time range
+
+        Parameters
+        ----------
+        search : str, optional
+            Search terms by which to filter public job list, by default ""
+        time_range : .TimeRange or str, optional
+            Time range by which to filter job list, by default TimeRange.ANY
+        include_files : bool, optional
+            Also store the file lists of jobs that have finished, by default True
+        page_size : int, optional
+            Number of jobs to request at once, by default 100
+
+        Returns
+        -------
+        list
+            ViterbiJob instances for the jobs that were new or had changed since the last sync
+        """
+        jobs = self.client.iter_public_jobs(search=search, time_range=time_range, page_size=page_size)
+        return self._sync(jobs, 'public', include_files)
+
+    def _sync(self, jobs, source, include_files):
+        with self._lock:
+            indexed = {
+                row['id']: (row['status'], row['status_date'])
+                for row in self._connection.execute('SELECT id, status, status_date FROM jobs')
+            }
+
+        changed_jobs = [
+            job for job in jobs
+            if indexed.get(job.job_id) != (job.status.status, job.status.date)
+        ]
+
+        # The files of a job can only be relied upon once it has finished
+        file_list = FileReferenceList()
+        if include_files:
+            finished_ids = [job.job_id for job in changed_jobs if job.is_finished]
+            if finished_ids:
+                file_list = self.client.get_file_list_by_job_ids(finished_ids)
+
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (
+                        job.job_id, job.name, job.user, job.description,
+                        job.status.status, job.status.date, json.dumps(job.other), now
+                    )
+                    for job in changed_jobs
+                ]
+            )
+            self._connection.executemany(
+                'DELETE FROM files WHERE job_id = ?',
+                [(job_id,) for job_id in file_list.batched]
+            )
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+                [(ref.job_id, str(ref.path), ref.file_size, ref.download_token) for ref in file_list]
+            )
+            self._connection.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?)', (source, now))
+
+        logger.info(f'Synced {len(changed_jobs)} new or changed jobs')
+
+        return changed_jobs
+
+    def last_synced(self, source='user'):
+        """Get the time of the last sync
+
+        Parameters
+        ----------
+        source : str, optional
+            'user' for :meth:`sync_user_jobs` or 'public' for :meth:`sync_public_jobs`, by default 'user'
+
+        Returns
+        -------
+        float or None
+            Time of the last sync in seconds since the epoch, or None if the index has not been synced
+        """
+        with self._lock:
+            row = self._connection.execute('SELECT synced_at FROM sync_state WHERE source = ?', (source,)).fetchone()
+        return None if row is None else row['synced_at']
+
+    def _get_job(self, row):
+        return ViterbiJob(
+            client=self.client,
+            job_id=row['id'],
+            name=row['name'],
+            description=row['description'],
+            user=row['user'],
+            job_status={'name': row['status'], 'date': row['status_date']},
+            **json.loads(row['other'])
+        )
+
+    def query(self, name=None, user=None, status=None, since=None, until=None, file_path=None):
+        """Find jobs in the index, without sending any requests to the server.
+        Only the jobs that match all of the given arguments are returned.
+
+        Parameters
+        ----------
+        name : str, optional
+            SQL LIKE pattern matched against the job name, e.g. 'sweep_%', by default None
+        user : str, optional
+            User that ran the job, by default None
+        status : str or list, optional
+            Status name, or list of status names, of the job, by default None
+        since : str, optional
+            Earliest date of the latest job status, in ISO format, by default None
+        until : str, optional
+            Latest date of the latest job status, in ISO format, by default None
+        file_path : str, optional
+            SQL LIKE pattern matched against the paths of the job's files, by default None
+
+        Returns
+        -------
+        list
+            ViterbiJob instances for the matching jobs, ordered by the date of their latest status
+        """
+        conditions, parameters = [], []
+
+        if name is not None:
+            conditions.append('name LIKE ?')
+            parameters.append(name)
+        if user is not None:
+            conditions.append('user = ?')
+            parameters.append(user)
+        if status is not None:
+            statuses = [status] if isinstance(status, str) else list(status)
+            conditions.append(f'status IN ({", ".join("?" * len(statuses))})')
+            parameters += statuses
+        if since is not None:
+            conditions.append('status_date >= ?')
+            parameters.append(since)
+        if until is not None:
+            conditions.append('status_date <= ?')
+            parameters.append(until)
+        if file_path is not None:
+            conditions.append('id IN (SELECT job_id FROM files WHERE path LIKE ?)')
+            parameters.append(file_path)
+
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        with self._lock:
+            rows = self._connection.execute(
+                f'SELECT * FROM jobs {where} ORDER BY status_date, id', parameters
+            ).fetchall()
+
+        return [self._get_job(row) for row in rows]
+
+    def get_job(self, job_id):
+        """Get a job from the index
+
+        Parameters
+        ----------
+        job_id : str
+            ID of the job
+
+        Returns
+        -------
+        ViterbiJob or None
+            ViterbiJob instance for the job, or None if it is not in the index
+        """
+        with self._lock:
+            row = self._connection.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return None if row is None else self._get_job(row)
+
+    def get_file_list(self, job_id):
+        """Get the files of a job from the index. File lists are only stored for jobs that had finished when
+        they were synced. Download tokens expire, so the file list should be requested from the server again
+        if the files cannot be downloaded.
+
+        Parameters
+        ----------
+        job_id : str
+            ID of the job
+
+        Returns
+        -------
+        ~gwdc_python.files.file_reference.FileReferenceList
+            Contains FileReference instances for each of the files of the job stored in the index
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT * FROM files WHERE job_id = ? ORDER BY rowid', (job_id,)
+            ).fetchall()
+
+        return FileReferenceList([
+            FileReference(
+                path=row['path'],
+                file_size=row['file_size'],
+                download_token=row['download_token'],
+                job_id=row['job_id'],
+            )
+            for row in rows
+        ])
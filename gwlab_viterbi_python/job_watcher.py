@@ -0,0 +1,229 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+from gwdc_python.logger import create_logger
+
+logger = create_logger(__name__)
+
+
+@dataclass(frozen=True)
+class JobEvent:
+    """Change in the status of a job that is being watched"""
+
+    job_id: str
+    """ID of the job"""
+
+    job: object
+    """ViterbiJob instance holding the latest information about the job, or None if the job could not be found"""
+
+    previous_status: str
+    """Name of the status of the job when it was last polled, or None if this is the first time it was polled"""
+
+    status: str
+    """Name of the current status of the job, or None if the job could not be found"""
+
+
+class JobWatcher:
+    """
+    JobWatcher class tracks the statuses of a set of jobs, producing a :class:`JobEvent` whenever the status of
+    one of them changes. The statuses of all of the watched jobs are polled together, up to `chunk_size` jobs
+    per query. The interval between polls starts at `min_interval`, and grows by a factor of `backoff` after
+    each poll in which no job changed status, up to `max_interval`, so that long running jobs are polled less
+    and less often. A job stops being watched once it has finished, or if it cannot be found.
+
+    The watcher can be used synchronously with :meth:`poll` and :meth:`watch`, or asynchronously with
+    :meth:`apoll` and :meth:`awatch`. Asynchronous polling sends its queries with an
+    :class:`~gwlab_viterbi_python.async_gwlab_viterbi.AsyncGWLabViterbi` client, or runs the queries of a
+    :class:`~gwlab_viterbi_python.gwlab_viterbi.GWLabViterbi` client in a separate thread.
+
+    Parameters
+    ----------
+    client : ~gwlab_viterbi_python.GWLabViterbi or ~gwlab_viterbi_python.AsyncGWLabViterbi
+        Client used to poll the jobs
+    jobs : list, optional
+        ViterbiJob instances or IDs of the jobs to watch, by default None
+    min_interval : float, optional
+        Minimum number of seconds between polls, by default 5
+    max_interval : float, optional
+        Maximum number of seconds between polls, by default 120
+    backoff : float, optional
+        Factor by which the interval grows after each poll in which no job changed status, by default 1.5
+    chunk_size : int, optional
+        Maximum number of jobs to poll in a single query, by default 100
+    """
+
+    def __init__(self, client, jobs=None, min_interval=5, max_interval=120, backoff=1.5, chunk_size=100):
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+
+        self.interval = min_interval
+        self.jobs = {}
+        self._statuses = {}
+        self._watched = []
+        self._callbacks = []
+
+        self.add(jobs or [])
+
+    def __len__(self):
+        return len(self._watched)
+
+    @property
+    def job_ids(self):
+        """list: IDs of the jobs that are still being watched"""
+        return list(self._watched)
+
+    def add(self, jobs):
+        """Start watching more jobs
+
+        Parameters
+        ----------
+        jobs : list
+            ViterbiJob instances or IDs of the jobs to watch
+        """
+        for job in jobs:
+            job_id = getattr(job, 'job_id', job)
+            if job_id not in self._watched:
+                self._watched.append(job_id)
+        self.interval = self.min_interval
+
+    def remove(self, job_id):
+        """Stop watching a job
+
+        Parameters
+        ----------
+        job_id : str
+            ID of the job
+        """
+        if job_id in self._watched:
+            self._watched.remove(job_id)
+
+    def on_change(self, callback):
+        """Register a function to be called with each :class:`JobEvent`, as soon as it is produced.
+        Can be used as a decorator.
+
+        Parameters
+        ----------
+        callback : function
+            Function taking a single JobEvent argument
+
+        Returns
+        -------
+        function
+            The callback
+        """
+        self._callbacks.append(callback)
+        return callback
+
+    def _update(self, job_ids, jobs):
+        events = []
+        for job_id, job in zip(job_ids, jobs):
+            previous_status = self._statuses.get(job_id)
+            status = None if job is None else job.status.status
+
+            if job is None:
+                logger.warning(f'Job {job_id} could not be found, so is no longer being watched')
+            else:
+                self.jobs[job_id] = job
+
+            if job is None or job.is_finished:
+                self.remove(job_id)
+
+            if status != previous_status or job is None:
+                self._statuses[job_id] = status
+                events.append(JobEvent(job_id=job_id, job=job, previous_status=previous_status, status=status))
+
+        # Jobs are polled less often while none of them are changing
+        self.interval = self.min_interval if events else min(self.max_interval, self.interval * self.backoff)
+
+        for event in events:
+            for callback in self._callbacks:
+                callback(event)
+
+        return events
+
+    def _is_async_client(self):
+        return asyncio.iscoroutinefunction(self.client.get_jobs_by_ids)
+
+    def _get_jobs(self, job_ids):
+        # Cached job information would hide changes in status, so the jobs are always requested from the server
+        return self.client.get_jobs_by_ids(job_ids, chunk_size=self.chunk_size, use_cache=False)
+
+    def poll(self):
+        """Request the statuses of all of the watched jobs once, and produce an event for each job whose status has
+        changed since it was last polled. All jobs produce an event the first time that they are polled.
+
+        Returns
+        -------
+        list
+            JobEvent instances for the jobs whose status changed
+        """
+        if self._is_async_client():
+            raise TypeError('JobWatcher.poll requires a GWLabViterbi client, use apoll with an async client')
+
+        job_ids = self.job_ids
+        return self._update(job_ids, self._get_jobs(job_ids) if job_ids else [])
+
+    async def apoll(self):
+        """Asynchronous version of :meth:`poll`
+
+        Returns
+        -------
+        list
+            JobEvent instances for the jobs whose status changed
+        """
+        job_ids = self.job_ids
+        if not job_ids:
+            jobs = []
+        elif self._is_async_client():
+            jobs = await self.client.get_jobs_by_ids(job_ids, chunk_size=self.chunk_size)
+        else:
+            jobs = await asyncio.get_running_loop().run_in_executor(None, self._get_jobs, job_ids)
+        return self._update(job_ids, jobs)
+
+    def _is_timed_out(self, deadline):
+        return deadline is not None and time.monotonic() + self.interval > deadline
+
+    def watch(self, timeout=None):
+        """Poll the watched jobs until they have all finished, yielding each :class:`JobEvent` as it is produced
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum number of seconds to watch for, by default None (no limit)
+
+        Yields
+        ------
+        JobEvent
+            Change in the status of a job
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            yield from self.poll()
+            if not self._watched or self._is_timed_out(deadline):
+                return
+            time.sleep(self.interval)
+
+    async def awatch(self, timeout=None):
+        """Asynchronous version of :meth:`watch`, for use with `async for`
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum number of seconds to watch for, by default None (no limit)
+
+        Yields
+        ------
+        JobEvent
+            Change in the status of a job
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            for event in await self.apoll():
+                yield event
+            if not self._watched or self._is_timed_out(deadline):
+                return
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,17 @@
+import pytest
+from gwlab_viterbi_python import ViterbiJob
+
+
+@pytest.fixture
+def make_job():
+    def _make_job(client, job_id, status='Completed', date='2021-01-01', name=None, user='Test User'):
+        return ViterbiJob(
+            client=client,
+            job_id=job_id,
+            name=f'test_name_{job_id}' if name is None else name,
+            description='test description',
+            user=user,
+            job_status={'name': status, 'date': date},
+        )
+
+    return _make_job
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import pytest
+from gwdc_python.exceptions import GWDCUnknownException
+from gwdc_python.files import FileReference, FileReferenceList
+
+from gwlab_viterbi_python import AsyncGWLabViterbi, ViterbiJob
+from gwlab_viterbi_python.exceptions import GWLabAuthenticationError
+from gwlab_viterbi_python.settings import GWLAB_FILE_DOWNLOAD_ENDPOINT, GWLAB_VITERBI_ENDPOINT
+
+httpx = pytest.importorskip('httpx')
+
+
+@pytest.fixture
+def setup_async_gwl(mocker):
+    def mock_init(self, token, auth_endpoint, endpoint, custom_error_handler=None):
+        self.api_token = token
+        self.jwt_token = 'my_jwt_token'
+
+    mocker.patch('gwlab_viterbi_python.gwlab_viterbi.GWDC.__init__', mock_init)
+
+    def _setup_async_gwl(handler):
+        gwl = AsyncGWLabViterbi(token='my_token')
+        gwl.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return gwl
+
+    return _setup_async_gwl
+
+
+@pytest.fixture
+def graphql_handler():
+    requests = []
+
+    def _graphql_handler(*responses):
+        responses = list(responses)
+
+        def handler(request):
+            if str(request.url).startswith(GWLAB_FILE_DOWNLOAD_ENDPOINT):
+                file_id = str(request.url)[len(GWLAB_FILE_DOWNLOAD_ENDPOINT):]
+                return httpx.Response(200, content=f'content of {file_id}'.encode())
+
+            assert str(request.url) == GWLAB_VITERBI_ENDPOINT
+            assert request.headers['Authorization'] == 'JWT my_jwt_token'
+            body = json.loads(request.content)
+            requests.append(body)
+            response = responses.pop(0)
+            if callable(response):
+                response = response(body)
+            return httpx.Response(200, json=response)
+
+        return handler, requests
+
+    return _graphql_handler
+
+
+@pytest.fixture
+def job_data():
+    return {
+        "id": "job_id",
+        "name": "test_name",
+        "description": "test description",
+        "user": "Test User",
+        "jobStatus": {
+            "name": "Completed",
+            "date": "2021-01-01"
+        }
+    }
+
+
+def test_async_get_job_by_id(setup_async_gwl, graphql_handler, job_data):
+    handler, requests = graphql_handler({"data": {"viterbiJob": job_data}}, {"data": {"viterbiJob": None}})
+    gwl = setup_async_gwl(handler)
+
+    job = asyncio.run(gwl.get_job_by_id('job_id'))
+
+    query, variables = gwl.sync_client._job_by_id_query('job_id')
+    assert requests[0] == {"query": query, "variables": variables}
+
+    assert job == ViterbiJob(
+        client=gwl.sync_client,
+        job_id="job_id",
+        name="test_name",
+        description="test description",
+        user="Test User",
+        job_status={"name": "Completed", "date": "2021-01-01"},
+    )
+    assert job.client is gwl.sync_client
+
+    assert asyncio.run(gwl.get_job_by_id('job_id')) is None
+
+
+def test_async_get_jobs_by_ids(setup_async_gwl, graphql_handler, job_data):
+    def jobs_by_ids_response(body):
+        variables = body["variables"]
+        return {"data": {
+            f"job{i}": job_data if variables[f"id{i}"] == "job_id" else None for i in range(len(variables))
+        }}
+
+    handler, requests = graphql_handler(jobs_by_ids_response, jobs_by_ids_response)
+    gwl = setup_async_gwl(handler)
+
+    jobs = asyncio.run(gwl.get_jobs_by_ids(['job_id', 'missing_id', 'job_id'], chunk_size=2))
+
+    assert [job.job_id if job else None for job in jobs] == ['job_id', None, 'job_id']
+    assert len(requests) == 2
+
+
+def test_async_job_lists(setup_async_gwl, graphql_handler, job_data):
+    edges = {"edges": [{"node": job_data}]}
+    handler, requests = graphql_handler({"data": {"viterbiJobs": edges}}, {"data": {"publicViterbiJobs": edges}})
+    gwl = setup_async_gwl(handler)
+
+    async def get_job_lists():
+        return await asyncio.gather(gwl.get_user_jobs(number=10), gwl.get_public_job_list(search='Test'))
+
+    user_jobs, public_jobs = asyncio.run(get_job_lists())
+
+    assert [job.job_id for job in user_jobs] == ["job_id"]
+    assert [job.job_id for job in public_jobs] == ["job_id"]
+    assert requests[0]["variables"] == {"first": 10}
+    assert requests[1]["variables"] == {"search": "Test", "timeRange": "Any time", "first": 100}
+
+
+def test_async_start_viterbi_job(setup_async_gwl, graphql_handler, job_data):
+    handler, requests = graphql_handler(
+        {"data": {"newViterbiJob": {"result": {"jobId": "job_id"}}}},
+        {"data": {"viterbiJob": job_data}}
+    )
+    gwl = setup_async_gwl(handler)
+
+    job = asyncio.run(gwl.start_viterbi_job('test_name', 'test description', False))
+
+    assert job.job_id == "job_id"
+    assert requests[0]["variables"]["input"]["start"] == {
+        "name": "test_name",
+        "description": "test description",
+        "private": False
+    }
+    assert requests[1]["variables"] == {"id": "job_id"}
+
+
+def test_async_get_job_file_list(setup_async_gwl, graphql_handler):
+    files = [
+        {"path": "path/to/test.png", "fileSize": "1", "downloadToken": "test_token_1", "isDir": False},
+        {"path": "path/to", "fileSize": "0", "downloadToken": "test_token_2", "isDir": True},
+    ]
+    handler, requests = graphql_handler({"data": {"viterbiResultFiles": {"files": files}}})
+    gwl = setup_async_gwl(handler)
+
+    file_list = asyncio.run(gwl.get_job_file_list('job_id'))
+
+    assert file_list == FileReferenceList([
+        FileReference(path="path/to/test.png", file_size=1, download_token="test_token_1", job_id="job_id")
+    ])
+
+
+def test_async_get_file_list_by_job_ids(setup_async_gwl, graphql_handler):
+    def files_by_job_ids_response(body):
+        variables = body["variables"]
+        return {"data": {
+            f"files{i}": {"files": [
+                {"path": f"{variables[f'jobId{i}']}.png", "fileSize": "1", "downloadToken": "token", "isDir": False}
+            ]}
+            for i in range(len(variables))
+        }}
+
+    handler, requests = graphql_handler(files_by_job_ids_response, files_by_job_ids_response)
+    gwl = setup_async_gwl(handler)
+
+    file_list = asyncio.run(gwl.get_file_list_by_job_ids(['id1', 'id2', 'id3'], chunk_size=2))
+
+    assert file_list == FileReferenceList([
+        FileReference(path=f"{job_id}.png", file_size=1, download_token="token", job_id=job_id)
+        for job_id in ['id1', 'id2', 'id3']
+    ])
+    assert len(requests) == 2
+
+
+@pytest.fixture
+def test_files():
+    return FileReferenceList([
+        FileReference(path=f'test/path_{i}.png', file_size=27, download_token=f'test_token_{i}', job_id=job_id)
+        for i, job_id in enumerate(['id1', 'id2', 'id1'])
+    ])
+
+
+def download_ids_response(body):
+    job_id = body["variables"]["input"]["jobId"]
+    tokens = body["variables"]["input"]["downloadTokens"]
+    return {"data": {"generateFileDownloadIds": {"result": [f'{job_id}_{token}' for token in tokens]}}}
+
+
+def test_async_get_files_by_reference(setup_async_gwl, graphql_handler, test_files):
+    handler, requests = graphql_handler(download_ids_response, download_ids_response)
+    gwl = setup_async_gwl(handler)
+
+    files = asyncio.run(gwl.get_files_by_reference(test_files))
+
+    assert files == [
+        (test_files[0].path, b'content of id1_test_token_0'),
+        (test_files[2].path, b'content of id1_test_token_2'),
+        (test_files[1].path, b'content of id2_test_token_1'),
+    ]
+    assert len(requests) == 2
+
+
+def test_async_iter_files_by_reference(setup_async_gwl, graphql_handler, test_files):
+    handler, _ = graphql_handler(download_ids_response, download_ids_response)
+    gwl = setup_async_gwl(handler)
+
+    async def iter_files():
+        return [chunk async for chunk in gwl.iter_files_by_reference(test_files)]
+
+    chunks = asyncio.run(iter_files())
+
+    assert chunks == [
+        (test_files[0].path, b'content of id1_test_token_0'),
+        (test_files[2].path, b'content of id1_test_token_2'),
+        (test_files[1].path, b'content of id2_test_token_1'),
+    ]
+
+
+def test_async_request_errors(setup_async_gwl, graphql_handler, mocker):
+    handler, requests = graphql_handler(
+        {"errors": [{"message": "Signature has expired"}]},
+        {"data": {"viterbiJob": None}},
+        {"errors": [{"message": "APIToken matching query does not exist."}]},
+        {"errors": [{"message": "Something else"}]},
+    )
+    gwl = setup_async_gwl(handler)
+    gwl.sync_client._refresh_client_token = mocker.Mock()
+
+    assert asyncio.run(gwl.request('query')) == {"viterbi_job": None}
+    gwl.sync_client._refresh_client_token.assert_called_once()
+    assert len(requests) == 2
+
+    with pytest.raises(GWLabAuthenticationError):
+        asyncio.run(gwl.request('query'))
+
+    with pytest.raises(GWDCUnknownException):
+        asyncio.run(gwl.request('query'))
+
+
+def test_async_request_token_already_refreshed(setup_async_gwl, mocker):
+    tokens = []
+
+    def handler(request):
+        tokens.append(request.headers['Authorization'])
+        if len(tokens) == 1:
+            # Another request refreshes the token while this one is waiting for its response
+            gwl.sync_client.client.jwt_token = 'new_jwt_token'
+            return httpx.Response(200, json={"errors": [{"message": "Signature has expired"}]})
+        return httpx.Response(200, json={"data": {"viterbiJob": None}})
+
+    gwl = setup_async_gwl(handler)
+    gwl.sync_client._refresh_client_token = mocker.Mock()
+
+    assert asyncio.run(gwl.request('query')) == {"viterbi_job": None}
+    gwl.sync_client._refresh_client_token.assert_not_called()
+    assert tokens == ['JWT my_jwt_token', 'JWT new_jwt_token']
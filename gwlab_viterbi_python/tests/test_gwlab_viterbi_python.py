@@ -1,11 +1,22 @@
+import mmap
+import threading
+import time
 import pytest
 from dataclasses import asdict
-from tempfile import TemporaryFile
+from pathlib import Path
+from tempfile import TemporaryFile, TemporaryDirectory
 from gwdc_python.files import FileReference, FileReferenceList
 from gwdc_python.helpers import JobStatus, TimeRange
 
 from gwlab_viterbi_python import GWLabViterbi, ViterbiJob, DataInput, DataParametersInput, SearchParametersInput
-from gwlab_viterbi_python.utils.file_download import _get_file_map_fn, _save_file_map_fn
+from gwlab_viterbi_python.utils.file_download import (
+    _download_files,
+    _get_file_map_fn,
+    _save_file_map_fn,
+    _resume_file_map_fn
+)
+from gwlab_viterbi_python.utils.download_scheduler import DownloadScheduler, DownloadReport
+from gwlab_viterbi_python.exceptions import GWLabDownloadError
 
 
 @pytest.fixture
@@ -32,6 +43,40 @@ def setup_mock_download_fns(mocker):
     )
 
 
+def unbatch_download_call(mock_download_files):
+    mock_download_files.assert_called_once()
+    map_fn, file_batches = mock_download_files.call_args.args
+
+    file_ids, file_paths, file_sizes = [], [], []
+    for get_file_ids, batch_paths, batch_sizes in file_batches:
+        file_ids += get_file_ids()
+        file_paths += batch_paths
+        file_sizes += batch_sizes
+
+    return map_fn, file_ids, file_paths, file_sizes, mock_download_files.call_args.kwargs
+
+
+def make_report(file_paths, results=None, errors=None):
+    report = DownloadReport()
+    for index, file_path in enumerate(file_paths):
+        if errors and errors[index] is not None:
+            report._add_failure(index, file_path, errors[index])
+        else:
+            report._add_success(index, file_path, file_path if results is None else results[index])
+    return report
+
+
+def mock_save_files(map_fn, file_batches, **kwargs):
+    # Stands in for _download_files, writing each file to its path rather than downloading it
+    saved_paths = []
+    for _, file_paths, _ in file_batches:
+        for file_path in file_paths:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_bytes(b'2')
+            saved_paths.append(file_path)
+    return make_report(saved_paths)
+
+
 @pytest.fixture
 def job_data():
     return [
@@ -199,6 +244,33 @@ def test_get_job_by_id(setup_gwl_request, job_data):
     assert job.user == single_job_data["user"]
 
 
+def test_get_jobs_by_ids(setup_gwl_request, job_data):
+    gwl, mock_request = setup_gwl_request
+
+    def mock_jobs_by_ids(query, variables):
+        jobs = {job["id"]: job for job in job_data}
+        return {f"job{i}": jobs.get(variables[f"id{i}"]) for i in range(len(variables))}
+
+    mock_request.side_effect = mock_jobs_by_ids
+
+    jobs = gwl.get_jobs_by_ids([3, 1, 4, 2], chunk_size=3)
+
+    assert [job.job_id if job else None for job in jobs] == [3, 1, None, 2]
+    assert [call.kwargs["variables"] for call in mock_request.call_args_list] == [
+        {"id0": 3, "id1": 1, "id2": 4},
+        {"id0": 2},
+    ]
+
+    query = mock_request.call_args_list[0].kwargs["query"]
+    assert "query ($id0: ID!, $id1: ID!, $id2: ID!)" in query
+    for i in range(3):
+        assert f"job{i}: viterbiJob (id: $id{i})" in query
+
+    mock_request.reset_mock()
+    assert gwl.get_jobs_by_ids([]) == []
+    mock_request.assert_not_called()
+
+
 def test_get_user_jobs(setup_gwl_request, job_data):
     gwl, mock_request = setup_gwl_request
     mock_request.return_value = multi_job_request('viterbi_jobs', [])
@@ -320,6 +392,67 @@ def test_get_public_job_list(setup_gwl_request, job_data):
     assert jobs[2].user == job_data[2]["user"]
 
 
+def paged_job_request(query_name, return_job_data, page_size):
+    pages = []
+    for i in range(0, len(return_job_data), page_size):
+        has_next_page = i + page_size < len(return_job_data)
+        pages.append({
+            query_name: {
+                "page_info": {
+                    "has_next_page": has_next_page,
+                    "end_cursor": f"cursor_{i + page_size}" if has_next_page else None,
+                },
+                "edges": [{"node": job_datum} for job_datum in return_job_data[i:i + page_size]],
+            }
+        })
+    return pages
+
+
+@pytest.mark.parametrize('prefetch', [False, True])
+def test_iter_user_jobs(setup_gwl_request, job_data, prefetch):
+    gwl, mock_request = setup_gwl_request
+    mock_request.side_effect = paged_job_request('viterbi_jobs', job_data, page_size=2)
+
+    jobs = gwl.iter_user_jobs(page_size=2, prefetch=prefetch)
+    mock_request.assert_not_called()
+
+    first_job = next(jobs)
+    assert first_job.job_id == job_data[0]["id"]
+    assert mock_request.call_count == (2 if prefetch else 1)
+
+    assert [job.job_id for job in jobs] == [job["id"] for job in job_data[1:]]
+    assert [call.kwargs["variables"] for call in mock_request.call_args_list] == [
+        {"first": 2, "after": None},
+        {"first": 2, "after": "cursor_2"},
+    ]
+    assert "viterbiJobs (first: $first, after: $after)" in mock_request.call_args.kwargs["query"]
+
+
+@pytest.mark.parametrize('prefetch', [False, True])
+def test_iter_public_jobs(setup_gwl_request, job_data, prefetch):
+    gwl, mock_request = setup_gwl_request
+    mock_request.side_effect = paged_job_request('public_viterbi_jobs', job_data, page_size=1)
+
+    jobs = list(gwl.iter_public_jobs(search="Test", time_range=TimeRange.DAY, page_size=1, prefetch=prefetch))
+
+    assert [job.job_id for job in jobs] == [job["id"] for job in job_data]
+    assert [call.kwargs["variables"] for call in mock_request.call_args_list] == [
+        {"search": "Test", "time_range": TimeRange.DAY.value, "first": 1, "after": None},
+        {"search": "Test", "time_range": TimeRange.DAY.value, "first": 1, "after": "cursor_1"},
+        {"search": "Test", "time_range": TimeRange.DAY.value, "first": 1, "after": "cursor_2"},
+    ]
+
+
+def test_iter_jobs_empty(setup_gwl_request):
+    gwl, mock_request = setup_gwl_request
+    mock_request.return_value = {
+        "viterbi_jobs": {"page_info": {"has_next_page": False, "end_cursor": None}, "edges": []}
+    }
+
+    assert list(gwl.iter_user_jobs()) == []
+    mock_request.assert_called_once()
+
+
 def test_gwlab_files_by_job_id(setup_gwl_request, job_file_data):
     gwl, mock_request = setup_gwl_request
     mock_request.return_value = {
@@ -356,14 +489,150 @@ def test_gwlab_files_by_job_id(setup_gwl_request, job_file_data):
         )
 
 
+def test_gwlab_file_list_by_job_ids(setup_gwl_request, job_file_data):
+    gwl, mock_request = setup_gwl_request
+
+    def mock_files_by_job_ids(query, variables):
+        return {
+            f"files{i}": {
+                "files": [{**file_data, "path": f'{variables[f"job_id{i}"]}/{file_data["path"]}'}
+                          for file_data in job_file_data]
+            }
+            for i in range(len(variables))
+        }
+
+    mock_request.side_effect = mock_files_by_job_ids
+
+    file_list = gwl.get_file_list_by_job_ids(['id1', 'id2', 'id3'], chunk_size=2)
+
+    assert mock_request.call_count == 2
+    variables = [call.kwargs["variables"] for call in mock_request.call_args_list]
+    assert {"job_id0": "id1", "job_id1": "id2"} in variables
+    assert {"job_id0": "id3"} in variables
+
+    query = max((call.kwargs["query"] for call in mock_request.call_args_list), key=len)
+    for i in range(2):
+        assert f"files{i}: viterbiResultFiles (jobId: $jobId{i})" in query
+
+    expected = FileReferenceList()
+    for job_id in ['id1', 'id2', 'id3']:
+        for file_data in job_file_data:
+            if file_data["is_dir"]:
+                continue
+            expected.append(FileReference(
+                path=f'{job_id}/{file_data["path"]}',
+                file_size=file_data["file_size"],
+                download_token=file_data["download_token"],
+                job_id=job_id,
+            ))
+
+    assert isinstance(file_list, FileReferenceList)
+    assert file_list == expected
+
+
+def test_gwlab_cache_jobs(setup_gwl_request, job_data, mocker):
+    mock_time = mocker.patch('gwlab_viterbi_python.utils.cache.time.monotonic', return_value=0)
+    gwl, mock_request = setup_gwl_request
+    gwl.enable_cache(ttl=10)
+
+    mock_request.return_value = {"viterbi_job": job_data[0]}
+    job = gwl.get_job_by_id(1)
+    assert gwl.get_job_by_id(1) == job
+    mock_request.assert_called_once()
+
+    # Jobs obtained from lists are also cached
+    mock_request.return_value = multi_job_request('viterbi_jobs', job_data[1:])
+    gwl.get_user_jobs()
+    assert mock_request.call_count == 2
+
+    assert [job.job_id for job in gwl.get_jobs_by_ids([3, 1, 2])] == [3, 1, 2]
+    assert mock_request.call_count == 2
+
+    # Expired entries are requested again
+    mock_time.return_value = 11
+    mock_request.return_value = {"job0": job_data[1]}
+    assert [job.job_id for job in gwl.get_jobs_by_ids([2])] == [2]
+    assert mock_request.call_count == 3
+    mock_request.assert_called_with(query=mocker.ANY, variables={"id0": 2})
+
+    # Cached jobs can be bypassed
+    assert [job.job_id for job in gwl.get_jobs_by_ids([2], use_cache=False)] == [2]
+    assert mock_request.call_count == 4
+
+    gwl.invalidate_cache(2)
+    mock_request.return_value = {"viterbi_job": job_data[1]}
+    gwl.get_job_by_id(2)
+    assert mock_request.call_count == 5
+
+    gwl.disable_cache()
+    gwl.get_job_by_id(2)
+    assert mock_request.call_count == 6
+
+
+def test_gwlab_cache_file_lists(setup_gwl_request, job_data, job_file_data, mocker):
+    mock_time = mocker.patch('gwlab_viterbi_python.utils.cache.time.monotonic', return_value=0)
+    gwl, mock_request = setup_gwl_request
+    gwl.enable_cache(ttl=10)
+
+    # Job 1 has completed, while the status of job 2 is unknown
+    mock_request.return_value = {"viterbi_job": job_data[0]}
+    gwl.get_job_by_id(1)
+
+    def mock_files(query, variables):
+        return {"viterbi_result_files": {"files": [dict(file_data) for file_data in job_file_data]}}
+
+    mock_request.side_effect = mock_files
+    file_list_1, _ = gwl._get_files_by_job_id(1)
+    file_list_2, _ = gwl._get_files_by_job_id(2)
+    assert mock_request.call_count == 3
+
+    assert gwl._get_files_by_job_id(1)[0] == file_list_1
+    assert gwl._get_files_by_job_id(2)[0] == file_list_2
+    assert mock_request.call_count == 3
+
+    # Only the file list of the finished job is kept after the ttl
+    mock_time.return_value = 1e6
+    assert gwl._get_files_by_job_id(1)[0] == file_list_1
+    assert mock_request.call_count == 3
+    assert gwl._get_files_by_job_id(2)[0] == file_list_2
+    assert mock_request.call_count == 4
+
+    gwl.invalidate_cache()
+    gwl._get_files_by_job_id(1)
+    assert mock_request.call_count == 5
+
+    # Cached file lists are used by get_file_list_by_job_ids
+    mock_request.side_effect = None
+    mock_request.return_value = {"files0": {"files": [dict(file_data) for file_data in job_file_data]}}
+    file_list = gwl.get_file_list_by_job_ids([1, 3])
+    assert file_list.get_paths() == file_list_1.get_paths() * 2
+    assert [ref.job_id for ref in file_list] == [1] * len(file_list_1) + [3] * len(file_list_1)
+    mock_request.assert_called_with(query=mocker.ANY, variables={"job_id0": 3})
+
+
 def test_gwlab_get_files_by_reference(setup_mock_download_fns, setup_gwl_request, mocker, test_files):
     mock_get_ids, mock_download_files = setup_mock_download_fns
     gwl, _ = setup_gwl_request
 
-    mock_download_files.return_value = [(f.path, TemporaryFile()) for f in test_files]
+    mock_download_files.return_value = make_report(
+        test_files.get_paths(), [(f.path, TemporaryFile()) for f in test_files]
+    )
 
     files = gwl.get_files_by_reference(test_files)
 
+    assert [f[0] for f in files] == test_files.get_paths()
+    assert unbatch_download_call(mock_download_files) == (
+        _get_file_map_fn,
+        ['id10', 'id11', 'id20', 'id21', 'id30', 'id31'],
+        test_files.get_paths(),
+        [f.file_size for f in test_files],
+        {
+            'session_pool': gwl.session_pool,
+            'max_workers': 20,
+            'bandwidth_limit': None,
+        }
+    )
+
     mock_calls = [
         mocker.call(job_id, job_files.get_tokens())
         for job_id, job_files in test_files.batched.items()
@@ -371,14 +640,160 @@ def test_gwlab_get_files_by_reference(setup_mock_download_fns, setup_gwl_request
 
     mock_get_ids.assert_has_calls(mock_calls)
 
-    assert [f[0] for f in files] == test_files.get_paths()
-    mock_download_files.assert_called_once_with(
-        _get_file_map_fn,
+
+def test_gwlab_iter_files_by_reference(setup_mock_download_fns, setup_gwl_request, mocker, test_files):
+    mock_get_ids, _ = setup_mock_download_fns
+    gwl, _ = setup_gwl_request
+
+    mock_iter_files = mocker.patch(
+        'gwlab_viterbi_python.gwlab_viterbi._iter_files',
+        return_value=iter([(f.path, b'chunk') for f in test_files])
+    )
+
+    chunks = list(gwl.iter_files_by_reference(test_files))
+
+    mock_calls = [
+        mocker.call(job_id, job_files.get_tokens())
+        for job_id, job_files in test_files.batched.items()
+    ]
+
+    mock_get_ids.assert_has_calls(mock_calls)
+
+    assert chunks == [(f.path, b'chunk') for f in test_files]
+    mock_iter_files.assert_called_once_with(
         ['id10', 'id11', 'id20', 'id21', 'id30', 'id31'],
         test_files.get_paths(),
-        test_files.get_total_bytes()
+        [f.file_size for f in test_files],
+        gwl.session_pool
+    )
+
+
+def test_gwlab_filter_candidates(setup_mock_download_fns, setup_gwl_request, mocker, test_files):
+    np = pytest.importorskip('numpy')
+    gwl, _ = setup_gwl_request
+
+    file_streams = [
+        [b'1 0 10 1\n2 0 ', b'20 2\n'],
+        [b'3 0 30 3\n4 0 40 4\n'],
+    ]
+    mock_iter_file_streams = mocker.patch(
+        'gwlab_viterbi_python.gwlab_viterbi._iter_file_streams',
+        side_effect=lambda *args: iter(file_streams)
     )
 
+    candidates = gwl.filter_candidates(test_files[:2], threshold=20)
+    np.testing.assert_array_equal(candidates['a0'], [2, 3, 4])
+
+    mock_iter_file_streams.assert_called_once_with(
+        ['id10', 'id11'], [ref.path for ref in test_files[:2]], [1, 1], gwl.session_pool
+    )
+
+    candidates = gwl.filter_candidates(test_files[:2], top_k=2, field='score')
+    np.testing.assert_array_equal(candidates['a0'], [4, 3])
+
+
+def test_gwlab_aggregate_candidates(setup_mock_download_fns, setup_gwl_request, mocker):
+    np = pytest.importorskip('numpy')
+    gwl, _ = setup_gwl_request
+
+    # The download functions are run for real, apart from the requests for the file contents
+    mocker.patch('gwlab_viterbi_python.gwlab_viterbi._download_files', wraps=_download_files)
+    mocker.patch('gwlab_viterbi_python.utils.file_download.tqdm')
+    file_contents = {
+        'id10': b'1 0 10 0\n',
+        'id20': b'2 0 20 0\n',
+        'id30': b'3 0 30 0\n',
+    }
+    mocker.patch(
+        'gwlab_viterbi_python.utils.candidates._iter_file_chunks',
+        side_effect=lambda file_id, file_path, file_size, progress_bar, session: iter([file_contents[file_id]])
+    )
+
+    candidates_files = FileReferenceList([
+        FileReference(
+            path='results_a0_phase_loglikes_scores.dat',
+            file_size=1,
+            download_token=f'test_token_{i}',
+            job_id=f'id{i}',
+        )
+        for i in [1, 2, 3]
+    ])
+
+    candidates = gwl.aggregate_candidates(candidates_files, top_k=2)
+    np.testing.assert_array_equal(candidates['a0'], [3, 2])
+    np.testing.assert_array_equal(candidates['job_id'], ['id3', 'id2'])
+
+    ini_file = FileReference(path='test.ini', file_size=1, download_token='test_token_ini', job_id='id1')
+    mock_file_list = mocker.patch.object(
+        gwl, 'get_file_list_by_job_ids', return_value=candidates_files + FileReferenceList([ini_file])
+    )
+    jobs = [mocker.Mock(job_id=f'id{i}') for i in [1, 2, 3]]
+
+    candidates = gwl.aggregate_candidates(jobs, threshold=20)
+    np.testing.assert_array_equal(candidates['a0'], [2, 3])
+    np.testing.assert_array_equal(candidates['job_id'], ['id2', 'id3'])
+    mock_file_list.assert_called_once_with(['id1', 'id2', 'id3'])
+
+
+def test_gwlab_export_candidates(setup_gwl_request, mocker, test_files):
+    gwl, _ = setup_gwl_request
+    mock_aggregate = mocker.patch.object(gwl, 'aggregate_candidates', return_value='candidates')
+    mock_export = mocker.patch('gwlab_viterbi_python.gwlab_viterbi.export_candidates')
+
+    gwl.export_candidates(test_files, 'candidates.feather', search_params='search_params', threshold=5,
+                          compress=False)
+
+    mock_aggregate.assert_called_once_with(test_files, threshold=5, top_k=None, field='log_likelihood')
+    mock_export.assert_called_once_with(
+        'candidates.feather', 'candidates', data_params=None, search_params='search_params', compress=False
+    )
+
+
+def test_gwlab_download_timeout(mocker):
+    mocker.patch('gwlab_viterbi_python.gwlab_viterbi.GWDC.__init__', return_value=None)
+
+    assert GWLabViterbi(token='my_token').session_pool.timeout == (10, 60)
+    assert GWLabViterbi(token='my_token', timeout=5).session_pool.timeout == 5
+
+
+def test_gwlab_get_files_memory_limit(setup_mock_download_fns, mocker, test_files):
+    mocker.patch('gwlab_viterbi_python.gwlab_viterbi.GWDC.__init__', return_value=None)
+    mock_get_ids, mock_download_files = setup_mock_download_fns
+    gwl = GWLabViterbi(token='my_token', max_workers=4, memory_limit=1000)
+    mock_download_files.return_value = make_report(test_files.get_paths())
+
+    gwl.get_files_by_reference(test_files)
+    gwl.get_files_by_reference(test_files)
+
+    map_fns = [call.args[0] for call in mock_download_files.call_args_list]
+    assert [map_fn.func for map_fn in map_fns] == [_get_file_map_fn] * 2
+    memory_budgets = [map_fn.keywords['memory_budget'] for map_fn in map_fns]
+    assert [(budget.limit, budget.max_file_size) for budget in memory_budgets] == [(1000, 250)] * 2
+    # Each call has its own budget
+    assert memory_budgets[0] is not memory_budgets[1]
+
+
+def test_gwlab_get_files_memory_limit_file_cache(setup_mock_download_fns, mocker, test_files):
+    mocker.patch('gwlab_viterbi_python.gwlab_viterbi.GWDC.__init__', return_value=None)
+    mock_get_ids, mock_download_files = setup_mock_download_fns
+    gwl = GWLabViterbi(token='my_token', max_workers=1, memory_limit=1)
+    file_paths = test_files.get_paths()[2:]
+    mock_download_files.return_value = make_report(file_paths, results=[(path, b'1') for path in file_paths])
+
+    with TemporaryDirectory() as tmp_dir:
+        gwl.enable_file_cache(tmp_dir)
+        gwl.file_cache.store_bytes(test_files[0], b'1')
+        gwl.file_cache.store_bytes(test_files[1], b'2')
+
+        files = gwl.get_files_by_reference(test_files)
+
+        # Cached files are read from the same budget as the downloads, and are memory-mapped once it is used up
+        assert files[0] == (test_files[0].path, bytearray(b'1'))
+        assert isinstance(files[1][1], mmap.mmap)
+        assert files[1][1][:] == b'2'
+        memory_budget = mock_download_files.call_args.args[0].keywords['memory_budget']
+        assert memory_budget.in_use == 1
+
 
 def test_gwlab_save_batched_files(setup_mock_download_fns, setup_gwl_request, mocker, test_files):
     mock_get_ids, mock_download_files = setup_mock_download_fns
@@ -386,6 +801,18 @@ def test_gwlab_save_batched_files(setup_mock_download_fns, setup_gwl_request, mo
 
     gwl.save_files_by_reference(test_files, 'test_dir', preserve_directory_structure=True)
 
+    assert unbatch_download_call(mock_download_files) == (
+        _save_file_map_fn,
+        ['id10', 'id11', 'id20', 'id21', 'id30', 'id31'],
+        test_files.get_output_paths('test_dir', preserve_directory_structure=True),
+        [f.file_size for f in test_files],
+        {
+            'session_pool': gwl.session_pool,
+            'max_workers': 20,
+            'bandwidth_limit': None,
+        }
+    )
+
     mock_calls = [
         mocker.call(job_id, job_files.get_tokens())
         for job_id, job_files in test_files.batched.items()
@@ -393,12 +820,245 @@ def test_gwlab_save_batched_files(setup_mock_download_fns, setup_gwl_request, mo
 
     mock_get_ids.assert_has_calls(mock_calls)
 
-    mock_download_files.assert_called_once_with(
-        _save_file_map_fn,
-        ['id10', 'id11', 'id20', 'id21', 'id30', 'id31'],
-        test_files.get_output_paths('test_dir', preserve_directory_structure=True),
-        test_files.get_total_bytes()
-    )
+
+def test_gwlab_save_batched_files_resume(setup_mock_download_fns, setup_gwl_request, mocker, test_files):
+    mock_get_ids, mock_download_files = setup_mock_download_fns
+    gwl, _ = setup_gwl_request
+
+    with TemporaryDirectory() as tmp_dir:
+        output_paths = test_files.get_output_paths(Path(tmp_dir))
+
+        # Complete file, which should be skipped
+        output_paths[0].parent.mkdir(parents=True)
+        output_paths[0].write_bytes(b'1')
+        # Files of the wrong size, which should be downloaded again
+        output_paths[2].write_bytes(b'')
+        output_paths[3].write_bytes(b'12')
+
+        gwl.save_files_by_reference(test_files, Path(tmp_dir), resume=True)
+
+        assert unbatch_download_call(mock_download_files) == (
+            _resume_file_map_fn,
+            ['id10', 'id20', 'id21', 'id30', 'id31'],
+            output_paths[1:],
+            [f.file_size for f in test_files[1:]],
+            {
+                'session_pool': gwl.session_pool,
+                'max_workers': 20,
+                'bandwidth_limit': None,
+            }
+        )
+
+        mock_calls = [
+            mocker.call('id1', ['test_token_2']),
+            mocker.call('id2', ['test_token_3', 'test_token_4']),
+            mocker.call('id3', ['test_token_5', 'test_token_6']),
+        ]
+
+        mock_get_ids.assert_has_calls(mock_calls)
+
+        # Every file is complete, so nothing is downloaded
+        mock_get_ids.reset_mock()
+        mock_download_files.reset_mock()
+        for path in output_paths:
+            path.write_bytes(b'1')
+
+        gwl.save_files_by_reference(test_files, Path(tmp_dir), resume=True)
+        mock_get_ids.assert_not_called()
+        mock_download_files.assert_not_called()
+
+
+def test_gwlab_save_files_failure(setup_mock_download_fns, setup_gwl_request, test_files):
+    mock_get_ids, mock_download_files = setup_mock_download_fns
+    gwl, _ = setup_gwl_request
+
+    with TemporaryDirectory() as cache_dir, TemporaryDirectory() as tmp_dir:
+        gwl.enable_file_cache(cache_dir)
+        output_paths = test_files.get_output_paths(Path(tmp_dir))
+        output_paths[0].parent.mkdir(parents=True)
+        output_paths[0].write_bytes(b'1')
+
+        error = ValueError('Download failed')
+        mock_download_files.return_value = make_report(output_paths, errors=[None] + [error] * 5)
+
+        with pytest.raises(GWLabDownloadError, match='5 of 6 files failed to download') as excinfo:
+            gwl.save_files_by_reference(test_files, Path(tmp_dir))
+
+        assert excinfo.value.report.succeeded == output_paths[:1]
+        assert excinfo.value.report.failed == [(path, error) for path in output_paths[1:]]
+        # Only the file that was saved is added to the cache
+        assert gwl.file_cache.get(test_files[0]) is not None
+        assert gwl.file_cache.get(test_files[1]) is None
+
+
+def test_gwlab_refresh_access_token(setup_gwl_request, mocker):
+    gwl, _ = setup_gwl_request
+    gwl.client.jwt_token = 'expired_token'
+
+    def refresh():
+        gwl.client.jwt_token = f'new_token_{mock_refresh.call_count}'
+
+    mock_refresh = mocker.Mock(side_effect=refresh)
+    gwl._refresh_client_token = mock_refresh
+
+    # Threads whose requests failed with the same expired token wait for a single refresh
+    with gwl._token_lock:
+        threads = [threading.Thread(target=gwl.client._refresh_access_token) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+
+    for thread in threads:
+        thread.join()
+
+    mock_refresh.assert_called_once()
+    assert gwl.client.jwt_token == 'new_token_1'
+
+    # A later expiry is refreshed again
+    gwl.client._refresh_access_token()
+    assert mock_refresh.call_count == 2
+
+
+def test_gwlab_refresh_access_token_after_refresh(setup_gwl_request, mocker):
+    gwl, _ = setup_gwl_request
+    gwl.client.jwt_token = 'expired_token'
+    gwl._send_client_request = mocker.Mock()
+    gwl._refresh_client_token = mocker.Mock(side_effect=lambda: setattr(gwl.client, 'jwt_token', 'new_token'))
+    sent = threading.Event()
+    refreshed = threading.Event()
+
+    def late_thread():
+        gwl.client._request(endpoint='endpoint', query='query', headers={'Authorization': 'JWT expired_token'})
+        sent.set()
+        refreshed.wait()
+        gwl.client._refresh_access_token()
+
+    thread = threading.Thread(target=late_thread)
+    thread.start()
+    sent.wait()
+
+    # The first thread to find that its token has expired refreshes it
+    gwl.client._request(endpoint='endpoint', query='query', headers={'Authorization': 'JWT expired_token'})
+    gwl.client._refresh_access_token()
+    refreshed.set()
+    thread.join()
+
+    # A thread whose request was sent with the expired token, but which only tries to refresh it after the refresh
+    # has finished, uses the new token instead of refreshing it again
+    gwl._refresh_client_token.assert_called_once()
+    assert gwl.client.jwt_token == 'new_token'
+
+    # A request sent with the new token is refreshed again if it expires
+    gwl.client._request(endpoint='endpoint', query='query', headers={'Authorization': 'JWT new_token'})
+    gwl.client._refresh_access_token()
+    assert gwl._refresh_client_token.call_count == 2
+
+
+def test_gwlab_refresh_download_id(setup_mock_download_fns, setup_gwl_request, test_files):
+    mock_get_ids, mock_download_files = setup_mock_download_fns
+    gwl, _ = setup_gwl_request
+
+    gwl.save_files_by_reference(test_files, 'test_dir')
+    _, file_batches = mock_download_files.call_args.args
+    get_file_ids, _, _ = file_batches[1]
+
+    # A single id is requested using the token of the file at the given position in its batch
+    mock_get_ids.reset_mock()
+    assert get_file_ids([1]) == ['id20']
+    mock_get_ids.assert_called_once_with('id2', ['test_token_4'])
+
+
+def test_gwlab_get_files_lazy(setup_mock_download_fns, setup_gwl_request, test_files):
+    mock_get_ids, mock_download_files = setup_mock_download_fns
+    gwl, _ = setup_gwl_request
+
+    mock_download_files.side_effect = mock_save_files
+
+    with TemporaryDirectory() as tmp_dir:
+        files = gwl.get_files_by_reference(test_files, lazy=True, directory=tmp_dir)
+
+        assert [path for path, _ in files] == test_files.get_paths()
+        assert [lazy_file.path for _, lazy_file in files] == [
+            Path(tmp_dir) / ref.job_id / ref.path for ref in test_files
+        ]
+        assert not any(lazy_file.is_open for _, lazy_file in files)
+        assert [lazy_file.read() for _, lazy_file in files] == [b'2'] * 6
+        assert mock_download_files.call_args.args[0] is _resume_file_map_fn
+
+        # The files have already been saved, so are not downloaded again
+        mock_download_files.reset_mock()
+        gwl.get_files_by_reference(test_files, lazy=True, directory=tmp_dir)
+        mock_download_files.assert_not_called()
+
+    # Without a directory, the files are saved to a temporary directory that is removed once they are deleted
+    files = gwl.get_files_by_reference(test_files, lazy=True)
+    directory = files[0][1].path.parents[2]
+    assert directory.is_dir()
+    del files
+    assert not directory.exists()
+
+
+def test_gwlab_file_cache_get_files(setup_mock_download_fns, setup_gwl_request, test_files):
+    mock_get_ids, mock_download_files = setup_mock_download_fns
+    gwl, _ = setup_gwl_request
+
+    with TemporaryDirectory() as tmp_dir:
+        gwl.enable_file_cache(tmp_dir)
+        gwl.file_cache.store_bytes(test_files[0], b'1')
+        gwl.file_cache.store_bytes(test_files[3], b'1')
+
+        missing_files = FileReferenceList([test_files[i] for i in [1, 2, 4, 5]])
+        mock_download_files.return_value = make_report(
+            missing_files.get_paths(), [(f.path, bytearray(b'2')) for f in missing_files]
+        )
+
+        files = gwl.get_files_by_reference(test_files)
+
+        assert files == [(f.path, b'1' if i in [0, 3] else b'2') for i, f in enumerate(test_files)]
+        assert unbatch_download_call(mock_download_files)[1:4] == (
+            ['id10', 'id20', 'id30', 'id31'],
+            missing_files.get_paths(),
+            [f.file_size for f in missing_files],
+        )
+
+        # The downloaded files have been added to the cache, so nothing is downloaded
+        mock_get_ids.reset_mock()
+        mock_download_files.reset_mock()
+
+        assert gwl.get_files_by_reference(test_files) == files
+        mock_get_ids.assert_not_called()
+        mock_download_files.assert_not_called()
+
+
+def test_gwlab_file_cache_save_files(setup_mock_download_fns, setup_gwl_request, test_files):
+    mock_get_ids, mock_download_files = setup_mock_download_fns
+    gwl, _ = setup_gwl_request
+
+    mock_download_files.side_effect = mock_save_files
+
+    with TemporaryDirectory() as cache_dir, TemporaryDirectory() as tmp_dir:
+        gwl.enable_file_cache(cache_dir)
+        gwl.file_cache.store_bytes(test_files[0], b'1')
+
+        output_paths = test_files.get_output_paths(Path(tmp_dir))
+        gwl.save_files_by_reference(test_files, Path(tmp_dir))
+
+        assert [path.read_bytes() for path in output_paths] == [b'1'] + [b'2'] * 5
+        assert unbatch_download_call(mock_download_files)[1:3] == (
+            ['id10', 'id20', 'id21', 'id30', 'id31'],
+            output_paths[1:],
+        )
+
+        # Every file is now cached, so nothing is downloaded when saving them elsewhere
+        mock_get_ids.reset_mock()
+        mock_download_files.reset_mock()
+
+        gwl.save_files_by_reference(test_files, Path(tmp_dir) / 'copy', preserve_directory_structure=False)
+
+        output_paths = test_files.get_output_paths(Path(tmp_dir) / 'copy', preserve_directory_structure=False)
+        assert [path.read_bytes() for path in output_paths] == [b'1'] + [b'2'] * 5
+        mock_get_ids.assert_not_called()
+        mock_download_files.assert_not_called()
 
 
 def test_gwlab_start_job(setup_gwl_request, mocker):
@@ -456,3 +1116,223 @@ def test_gwlab_start_job(setup_gwl_request, mocker):
     gwl.get_job_by_id.assert_called_once_with("test_id")
 
     assert mock_return == gwl.get_job_by_id.return_value
+
+
+@pytest.mark.parametrize('fetch_jobs', [True, False])
+def test_gwlab_start_jobs(setup_gwl_request, mocker, fetch_jobs):
+    gwl, mock_request = setup_gwl_request
+
+    def mock_new_job(query, variables):
+        job_name = variables['input']['start']['name']
+        if job_name == 'bad_job':
+            raise ValueError('Invalid job')
+        return {"new_viterbi_job": {"result": {"job_id": f"{job_name}_id"}}}
+
+    mock_request.side_effect = mock_new_job
+    gwl.get_jobs_by_ids = mocker.Mock(side_effect=lambda job_ids: [f'job_{job_id}' for job_id in job_ids])
+
+    search_params = SearchParametersInput(search_central_a0="0.02")
+    job_specs = (
+        (f'job_{i}' if i != 3 else 'bad_job', None, None, search_params)
+        for i in range(40)
+    )
+
+    report = gwl.start_viterbi_jobs(
+        job_specs, job_description='sweep', private=True, max_workers=4, fetch_jobs=fetch_jobs
+    )
+
+    job_names = [f'job_{i}' for i in range(40) if i != 3]
+    assert len(report) == 40
+    assert report.succeeded == job_names
+    assert report.job_ids == [f'{job_name}_id' for job_name in job_names]
+    assert [(job_name, str(error)) for job_name, error in report.failed] == [('bad_job', 'Invalid job')]
+    assert mock_request.call_count == 40
+
+    variables = mock_request.call_args.kwargs['variables']['input']
+    assert variables['start']['description'] == 'sweep'
+    assert variables['start']['private']
+    assert variables['data'] == asdict(DataInput())
+    assert variables['search_parameters'] == asdict(search_params)
+
+    if fetch_jobs:
+        gwl.get_jobs_by_ids.assert_called_once_with(report.job_ids)
+        assert report.jobs == [f'job_{job_id}' for job_id in report.job_ids]
+    else:
+        gwl.get_jobs_by_ids.assert_not_called()
+        assert report.jobs is None
+
+
+def test_gwlab_start_jobs_fetch_error(setup_gwl_request, mocker):
+    gwl, mock_request = setup_gwl_request
+    mock_request.return_value = {"new_viterbi_job": {"result": {"job_id": "test_id"}}}
+    gwl.get_jobs_by_ids = mocker.Mock(side_effect=ValueError('Request failed'))
+
+    report = gwl.start_viterbi_jobs([('test_name', None, None, None)])
+
+    assert report.ok
+    assert report.job_ids == ['test_id']
+    assert report.jobs is None
+
+
+@pytest.fixture
+def setup_harvest(setup_mock_download_fns, setup_gwl_request, mocker, make_job):
+    gwl, _ = setup_gwl_request
+    mocker.patch('gwlab_viterbi_python.gwlab_viterbi.time.sleep')
+    mocker.patch('gwlab_viterbi_python.gwlab_viterbi.tqdm', return_value=mocker.Mock(total=0))
+    calls = []
+
+    def setup(polls, list_errors=None):
+        polls = iter(polls)
+
+        def get_jobs_by_ids(job_ids, chunk_size, use_cache):
+            statuses = next(polls)
+            calls.append(('poll', job_ids))
+            if isinstance(statuses, Exception):
+                raise statuses
+            return [make_job(gwl, job_id, statuses[job_id]) for job_id in job_ids]
+
+        def get_file_list_by_job_ids(job_ids):
+            calls.append(('files', job_ids))
+            if list_errors and job_ids[0] in list_errors:
+                raise list_errors[job_ids[0]]
+            return FileReferenceList([
+                FileReference(path=path, file_size=1, download_token=f'{job_id}_{path}', job_id=job_id)
+                for job_id in job_ids
+                for path in ['results_a0_phase_loglikes_scores.dat', 'config.ini']
+            ])
+
+        gwl.get_jobs_by_ids = mocker.Mock(side_effect=get_jobs_by_ids)
+        gwl.get_file_list_by_job_ids = mocker.Mock(side_effect=get_file_list_by_job_ids)
+        return gwl, calls
+
+    return setup
+
+
+def mock_resume_file_map_fn(mocker, errors=None):
+    def map_fn(file_id, file_path, file_size=None, progress_bar=None, session=None):
+        if errors and file_path.name in errors:
+            raise errors[file_path.name]
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(b'1')
+        return file_path
+
+    return mocker.patch('gwlab_viterbi_python.gwlab_viterbi._resume_file_map_fn', side_effect=map_fn)
+
+
+def test_gwlab_harvest_jobs(setup_harvest, mocker):
+    gwl, calls = setup_harvest([
+        {'id1': 'Completed', 'id2': 'Running', 'id3': 'Running'},
+        {'id2': 'Error', 'id3': 'Running'},
+        {'id3': 'Completed'},
+    ])
+    mock_map_fn = mock_resume_file_map_fn(mocker)
+    mock_scheduler = mocker.patch('gwlab_viterbi_python.gwlab_viterbi.DownloadScheduler', wraps=DownloadScheduler)
+
+    with TemporaryDirectory() as tmp_dir:
+        root_path = Path(tmp_dir)
+        # Files that have already been saved are not downloaded again
+        (root_path / 'id3').mkdir()
+        (root_path / 'id3' / 'results_a0_phase_loglikes_scores.dat').write_bytes(b'1')
+
+        reports = gwl.harvest_jobs(['id1', 'id2', 'id3'], tmp_dir)
+
+        # Each job's files are listed as soon as it completes, and only its candidates files are saved
+        assert calls == [
+            ('poll', ['id1', 'id2', 'id3']), ('files', ['id1']),
+            ('poll', ['id2', 'id3']),
+            ('poll', ['id3']), ('files', ['id3']),
+        ]
+        assert [call.args[1] for call in mock_map_fn.call_args_list] == [
+            root_path / 'id1' / 'results_a0_phase_loglikes_scores.dat'
+        ]
+
+        assert list(reports) == ['id1', 'id3']
+        assert reports['id1'].succeeded == [root_path / 'id1' / 'results_a0_phase_loglikes_scores.dat']
+        assert len(reports['id3']) == 0
+
+    # All of the jobs share a single download queue, limited by the client's settings
+    mock_scheduler.assert_called_once()
+    assert mock_scheduler.call_args.kwargs['max_workers'] == gwl.max_workers
+    assert mock_scheduler.call_args.kwargs['bandwidth_limit'] == gwl.bandwidth_limit
+
+
+def test_gwlab_harvest_jobs_failures(setup_harvest, setup_mock_download_fns, mocker):
+    mock_get_ids, _ = setup_mock_download_fns
+    gwl, calls = setup_harvest(
+        [
+            {'id1': 'Completed', 'id2': 'Running', 'id3': 'Running'},
+            {'id2': 'Completed', 'id3': 'Running'},
+            {'id3': 'Completed'},
+        ],
+        list_errors={'id2': RuntimeError('Listing failed')}
+    )
+    download_error = ValueError('Download failed')
+    mock_resume_file_map_fn(mocker, errors={'config.ini': download_error})
+
+    id_error = RuntimeError('Download ids failed')
+
+    def get_ids(job_id, tokens):
+        if job_id == 'id3':
+            raise id_error
+        return [f'{job_id}{i}' for i, _ in enumerate(tokens)]
+
+    mock_get_ids.side_effect = get_ids
+
+    with TemporaryDirectory() as tmp_dir:
+        root_path = Path(tmp_dir)
+        reports = gwl.harvest_jobs(['id1', 'id2', 'id3'], tmp_dir, file_filter=None)
+
+    # A failure for one job does not stop the files of the other jobs from being saved
+    assert list(reports) == ['id1', 'id2', 'id3']
+    assert reports['id1'].succeeded == [root_path / 'id1' / 'results_a0_phase_loglikes_scores.dat']
+    assert reports['id1'].failed == [(root_path / 'id1' / 'config.ini', download_error)]
+
+    assert [path for path, _ in reports['id2'].failed] == [root_path / 'id2']
+    assert str(reports['id2'].failed[0][1]) == 'Listing failed'
+
+    assert reports['id3'].failed == [
+        (root_path / 'id3' / 'results_a0_phase_loglikes_scores.dat', id_error),
+        (root_path / 'id3' / 'config.ini', id_error),
+    ]
+
+
+def test_gwlab_harvest_jobs_poll_retry(setup_harvest, mocker):
+    poll_error = RuntimeError('Poll failed')
+    gwl, calls = setup_harvest([
+        {'id1': 'Completed', 'id2': 'Running'},
+        poll_error,
+        poll_error,
+        {'id2': 'Completed'},
+    ])
+    mock_resume_file_map_fn(mocker)
+    mock_sleep = mocker.patch('gwlab_viterbi_python.gwlab_viterbi.time.sleep')
+
+    with TemporaryDirectory() as tmp_dir:
+        reports = gwl.harvest_jobs(['id1', 'id2'], tmp_dir, min_interval=5, max_interval=8)
+
+    # Failed polls are retried after a growing delay, without losing the jobs that are being watched
+    assert [call for call in calls if call[0] == 'poll'] == [('poll', ['id1', 'id2'])] + [('poll', ['id2'])] * 3
+    assert [call.args[0] for call in mock_sleep.call_args_list][1:3] == [5, 8]
+    assert list(reports) == ['id1', 'id2']
+    assert all(report.ok for report in reports.values())
+
+
+def test_gwlab_harvest_jobs_poll_failure(setup_harvest, mocker):
+    poll_error = RuntimeError('Poll failed')
+    gwl, calls = setup_harvest([{'id1': 'Completed', 'id2': 'Running'}] + [poll_error] * 3)
+    mock_resume_file_map_fn(mocker)
+    schedulers = []
+
+    def make_scheduler(*args, **kwargs):
+        schedulers.append(DownloadScheduler(*args, **kwargs))
+        return schedulers[-1]
+
+    mocker.patch('gwlab_viterbi_python.gwlab_viterbi.DownloadScheduler', side_effect=make_scheduler)
+
+    with TemporaryDirectory() as tmp_dir:
+        with pytest.raises(RuntimeError, match='Poll failed'):
+            gwl.harvest_jobs(['id1', 'id2'], tmp_dir, max_poll_retries=2)
+
+    # The download workers are stopped, rather than left running in the background
+    assert len([call for call in calls if call[0] == 'poll']) == 4
+    assert not any(thread.is_alive() for thread in schedulers[0]._threads)
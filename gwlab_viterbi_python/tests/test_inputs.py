@@ -0,0 +1,137 @@
+from dataclasses import asdict
+
+import pydantic
+import pydantic.dataclasses
+import pytest
+
+from gwlab_viterbi_python import DataInput, DataParametersInput, SearchParametersInput, SearchSweep, SweepAxis
+
+
+@pytest.mark.parametrize('input_class', [DataInput, DataParametersInput, SearchParametersInput])
+def test_input_to_dict(input_class):
+    inputs = input_class()
+    assert inputs.to_dict() == asdict(inputs)
+
+    # The returned dict can be modified without affecting the inputs
+    inputs.to_dict().clear()
+    assert inputs.to_dict() == asdict(inputs)
+
+
+def test_input_to_dict_after_change():
+    search_params = SearchParametersInput()
+    assert search_params.to_dict()['search_central_a0'] == '0.01844'
+
+    search_params.search_central_a0 = 0.02
+    assert search_params.to_dict()['search_central_a0'] == '0.02'
+    assert search_params.to_dict() == asdict(search_params)
+
+
+def test_input_copy():
+    template = SearchParametersInput(search_l_l_threshold="300")
+    search_params = template.copy(search_central_a0=0.02, search_a0_bins=5)
+
+    assert search_params == SearchParametersInput(
+        search_l_l_threshold="300", search_central_a0="0.02", search_a0_bins="5"
+    )
+    assert template == SearchParametersInput(search_l_l_threshold="300")
+
+    # Changing the copy does not change the template
+    search_params.search_p_bins = "2"
+    assert template.search_p_bins == "1"
+
+    data_input = DataInput().copy(data_choice='simulated', source_dataset='o1')
+    assert data_input.to_dict() == {'data_choice': 'simulated', 'source_dataset': 'o1'}
+
+
+def test_input_copy_validation(mocker):
+    template = SearchParametersInput()
+
+    with pytest.raises(pydantic.ValidationError):
+        template.copy(search_central_a0=object())
+    with pytest.raises(pydantic.ValidationError):
+        DataInput().copy(data_choice='imaginary')
+    with pytest.raises(TypeError):
+        template.copy(search_central_b0="1")
+
+    # Only the changed fields are validated
+    mock_validate = mocker.patch('pydantic.dataclasses.validate_model', wraps=pydantic.dataclasses.validate_model)
+    template.copy(search_central_a0="0.02")
+    mock_validate.assert_not_called()
+
+
+def test_sweep_axis_validation():
+    with pytest.raises(ValueError):
+        SweepAxis(1, 1)
+    with pytest.raises(ValueError):
+        SweepAxis(0, 1, tiles=0)
+    with pytest.raises(ValueError):
+        SweepAxis(0, 1, bins=0)
+
+
+def test_search_sweep_product():
+    base = SearchParametersInput(search_l_l_threshold="300")
+    sweep = SearchSweep(base=base, a0=SweepAxis(0.0, 0.4, tiles=2, bins=5), p=SweepAxis(10.0, 13.0, tiles=3))
+
+    search_params = list(sweep)
+    assert len(sweep) == len(search_params) == 6
+    assert [(s.search_central_a0, s.search_central_p) for s in search_params] == [
+        ('0.1', '10.5'), ('0.1', '11.5'), ('0.1', '12.5'),
+        ('0.30000000000000004', '10.5'), ('0.30000000000000004', '11.5'), ('0.30000000000000004', '12.5'),
+    ]
+
+    expected = SearchParametersInput(
+        search_l_l_threshold="300",
+        search_central_a0='0.1',
+        search_a0_band='0.2',
+        search_a0_bins='5',
+        search_central_p='10.5',
+        search_p_band='1.0',
+    )
+    assert search_params[0] == expected
+    assert asdict(search_params[0]) == asdict(expected)
+    assert all(isinstance(s, SearchParametersInput) for s in search_params)
+
+    # Instances built by the sweep are still validated when they are modified
+    with pytest.raises(pydantic.ValidationError):
+        search_params[0].search_central_a0 = object()
+
+
+def test_search_sweep_zip():
+    sweep = SearchSweep(a0=SweepAxis(0, 2, tiles=2), orbit_tp=SweepAxis(100, 300, tiles=2), tiling='zip')
+
+    assert len(sweep) == 2
+    assert [(s.search_central_a0, s.search_central_orbit_tp) for s in sweep] == [('0.5', '150.0'), ('1.5', '250.0')]
+
+    with pytest.raises(ValueError):
+        SearchSweep(a0=SweepAxis(0, 1, tiles=2), p=SweepAxis(0, 1, tiles=3), tiling='zip')
+    with pytest.raises(ValueError):
+        SearchSweep(tiling='spiral')
+
+
+def test_search_sweep_no_axes():
+    base = SearchParametersInput(search_central_a0="0.5")
+    assert list(SearchSweep(base=base)) == [base]
+
+
+def test_search_sweep_validates_once(mocker):
+    base = SearchParametersInput()
+    mock_validate = mocker.patch('pydantic.dataclasses.validate_model', wraps=pydantic.dataclasses.validate_model)
+    sweep = SearchSweep(
+        base=base, a0=SweepAxis(0, 1, tiles=10), p=SweepAxis(0, 1, tiles=20), orbit_tp=SweepAxis(0, 1, tiles=5)
+    )
+
+    # One instance is validated for each tile of the longest axis
+    assert mock_validate.call_count == 20
+    assert len(list(sweep)) == 1000
+    assert mock_validate.call_count == 20
+
+
+def test_search_sweep_job_specs():
+    data_params = DataParametersInput(start_frequency_band="200")
+    sweep = SearchSweep(a0=SweepAxis(0, 2, tiles=2))
+
+    job_specs = list(sweep.job_specs(name_format='a0_{index}_{search_central_a0}', data_params=data_params))
+    assert job_specs == [
+        ('a0_0_0.5', None, data_params, list(sweep)[0]),
+        ('a0_1_1.5', None, data_params, list(sweep)[1]),
+    ]
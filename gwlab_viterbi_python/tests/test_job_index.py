@@ -0,0 +1,119 @@
+import pytest
+from gwlab_viterbi_python import JobIndex, FileReference, FileReferenceList
+
+
+def make_files(job_id):
+    return FileReferenceList([
+        FileReference(
+            path=f'{job_id}/results_a0_phase_loglikes_scores.dat',
+            file_size=10,
+            download_token=f'{job_id}_token_1',
+            job_id=job_id,
+        ),
+        FileReference(
+            path=f'{job_id}/config.ini',
+            file_size=5,
+            download_token=f'{job_id}_token_2',
+            job_id=job_id,
+        ),
+    ])
+
+
+@pytest.fixture
+def client(mocker):
+    client = mocker.Mock()
+    client.get_file_list_by_job_ids.side_effect = lambda job_ids: sum(
+        [make_files(job_id) for job_id in job_ids], FileReferenceList()
+    )
+    return client
+
+
+@pytest.fixture
+def jobs(client, make_job):
+    return [
+        make_job(client, 'id1', date='2021-01-01', name='sweep_1'),
+        make_job(client, 'id2', date='2021-02-02', name='sweep_2', user='Other User'),
+        make_job(client, 'id3', status='Running', date='2021-03-03'),
+    ]
+
+
+def test_job_index_sync(client, jobs):
+    index = JobIndex(client)
+    client.iter_user_jobs.return_value = iter(jobs)
+
+    assert index.last_synced() is None
+    assert index.sync_user_jobs() == jobs
+    assert len(index) == 3
+    assert index.last_synced() is not None
+
+    # Only the finished jobs have their files stored
+    client.get_file_list_by_job_ids.assert_called_once_with(['id1', 'id2'])
+    assert index.get_file_list('id1') == make_files('id1')
+    assert index.get_file_list('id3') == FileReferenceList()
+
+    assert index.get_job('id2') == jobs[1]
+    assert index.get_job('id2').client is client
+    assert index.get_job('missing') is None
+
+
+def test_job_index_incremental_sync(client, jobs, make_job):
+    index = JobIndex(client)
+    client.iter_user_jobs.return_value = iter(jobs)
+    index.sync_user_jobs()
+    client.get_file_list_by_job_ids.reset_mock()
+
+    finished_job = make_job(client, 'id3', status='Completed', date='2021-04-04')
+    new_job = make_job(client, 'id4', status='Queued', date='2021-05-05')
+    client.iter_user_jobs.return_value = iter(jobs[:2] + [finished_job, new_job])
+
+    assert index.sync_user_jobs() == [finished_job, new_job]
+    assert len(index) == 4
+    assert index.get_job('id3').status.status == 'Completed'
+
+    client.get_file_list_by_job_ids.assert_called_once_with(['id3'])
+    assert index.get_file_list('id3') == make_files('id3')
+
+    # Nothing has changed, so nothing is requested
+    client.get_file_list_by_job_ids.reset_mock()
+    client.iter_user_jobs.return_value = iter(jobs[:2] + [finished_job, new_job])
+    assert index.sync_user_jobs() == []
+    client.get_file_list_by_job_ids.assert_not_called()
+
+
+def test_job_index_sync_public(client, jobs):
+    index = JobIndex(client)
+    client.iter_public_jobs.return_value = iter(jobs)
+
+    index.sync_public_jobs(search='sweep', include_files=False)
+
+    client.iter_public_jobs.assert_called_once()
+    assert client.iter_public_jobs.call_args.kwargs['search'] == 'sweep'
+    client.get_file_list_by_job_ids.assert_not_called()
+    assert index.last_synced('public') is not None
+    assert index.last_synced('user') is None
+
+
+def test_job_index_query(client, jobs):
+    index = JobIndex(client)
+    client.iter_user_jobs.return_value = iter(jobs)
+    index.sync_user_jobs()
+
+    assert index.query() == jobs
+    assert index.query(name='sweep_%') == jobs[:2]
+    assert index.query(user='Other User') == [jobs[1]]
+    assert index.query(status='Running') == [jobs[2]]
+    assert index.query(status=['Completed', 'Running'], since='2021-02-01') == jobs[1:]
+    assert index.query(until='2021-02-02') == jobs[:2]
+    assert index.query(file_path='id2/%.ini') == [jobs[1]]
+    assert index.query(name='sweep_%', status='Running') == []
+
+
+def test_job_index_file(client, jobs, tmp_path):
+    index = JobIndex(client, tmp_path / 'jobs.sqlite')
+    client.iter_user_jobs.return_value = iter(jobs)
+    index.sync_user_jobs()
+    index.close()
+
+    index = JobIndex(client, tmp_path / 'jobs.sqlite')
+    assert index.query() == jobs
+    assert index.get_file_list('id2') == make_files('id2')
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+from gwlab_viterbi_python import JobWatcher, JobEvent
+
+
+@pytest.fixture
+def statuses():
+    return {'id1': 'Pending', 'id2': 'Running', 'id3': 'Running'}
+
+
+@pytest.fixture
+def client(mocker, statuses, make_job):
+    client = mocker.Mock()
+    client.get_jobs_by_ids.side_effect = lambda job_ids, chunk_size, use_cache: [
+        make_job(client, job_id, statuses[job_id]) if job_id in statuses else None for job_id in job_ids
+    ]
+    return client
+
+
+@pytest.fixture
+def mock_sleep(mocker):
+    return mocker.patch('gwlab_viterbi_python.job_watcher.time.sleep')
+
+
+def get_changes(events):
+    return [(event.job_id, event.previous_status, event.status) for event in events]
+
+
+def test_job_watcher_poll(client, statuses):
+    watcher = JobWatcher(client, ['id1', 'id2', 'id3'], min_interval=1, max_interval=3, backoff=2)
+
+    # Every job produces an event when it is first polled
+    assert get_changes(watcher.poll()) == [('id1', None, 'Pending'), ('id2', None, 'Running'), ('id3', None, 'Running')]
+    client.get_jobs_by_ids.assert_called_once_with(['id1', 'id2', 'id3'], chunk_size=100, use_cache=False)
+    assert watcher.interval == 1
+
+    # The interval grows while nothing changes
+    assert watcher.poll() == []
+    assert watcher.interval == 2
+    assert watcher.poll() == []
+    assert watcher.interval == 3
+    assert watcher.poll() == []
+    assert watcher.interval == 3
+
+    statuses['id1'] = 'Running'
+    statuses['id2'] = 'Completed'
+    events = watcher.poll()
+    assert get_changes(events) == [('id1', 'Pending', 'Running'), ('id2', 'Running', 'Completed')]
+    assert events[1].job.is_finished
+    assert watcher.interval == 1
+
+    # Finished jobs are no longer polled
+    assert watcher.job_ids == ['id1', 'id3']
+    assert watcher.jobs['id2'] is events[1].job
+    watcher.poll()
+    assert client.get_jobs_by_ids.call_args.args[0] == ['id1', 'id3']
+
+
+def test_job_watcher_missing_job(client):
+    watcher = JobWatcher(client, ['id1', 'missing_id'])
+
+    events = watcher.poll()
+    assert events[1] == JobEvent(job_id='missing_id', job=None, previous_status=None, status=None)
+    assert watcher.job_ids == ['id1']
+
+
+def test_job_watcher_callbacks(client, statuses, mocker, make_job):
+    watcher = JobWatcher(client, [make_job(client, 'id1', 'Pending')])
+    callback = mocker.Mock()
+    assert watcher.on_change(callback) is callback
+
+    watcher.poll()
+    watcher.poll()
+    statuses['id1'] = 'Error'
+    watcher.poll()
+
+    assert [get_changes(call.args) for call in callback.call_args_list] == [
+        [('id1', None, 'Pending')],
+        [('id1', 'Pending', 'Error')],
+    ]
+    assert len(watcher) == 0
+
+
+def test_job_watcher_watch(client, statuses, mock_sleep, mocker):
+    watcher = JobWatcher(client, ['id1', 'id2'], min_interval=1, backoff=2)
+
+    changes = []
+    for event in watcher.watch():
+        changes.append((event.job_id, event.status))
+        statuses[event.job_id] = {'Pending': 'Running', 'Running': 'Completed'}.get(event.status, event.status)
+
+    assert changes == [
+        ('id1', 'Pending'), ('id2', 'Running'),
+        ('id1', 'Running'), ('id2', 'Completed'),
+        ('id1', 'Completed'),
+    ]
+    assert mock_sleep.call_args_list == [mocker.call(1), mocker.call(1)]
+
+
+def test_job_watcher_watch_timeout(client, mock_sleep, mocker):
+    mocker.patch('gwlab_viterbi_python.job_watcher.time.monotonic', side_effect=[0, 0, 5, 10])
+    watcher = JobWatcher(client, ['id1'], min_interval=5, backoff=1)
+
+    assert len(list(watcher.watch(timeout=12))) == 1
+    assert mock_sleep.call_count == 2
+
+
+def test_job_watcher_awatch(client, statuses, mocker, make_job):
+    mock_sleep = mocker.patch('gwlab_viterbi_python.job_watcher.asyncio.sleep', mocker.AsyncMock())
+
+    async def get_jobs_by_ids(job_ids, chunk_size):
+        return [make_job(client, job_id, statuses[job_id]) for job_id in job_ids]
+
+    async_client = mocker.Mock()
+    async_client.get_jobs_by_ids = get_jobs_by_ids
+
+    async def watch(watcher):
+        changes = []
+        async for event in watcher.awatch():
+            changes.append((event.job_id, event.status))
+            statuses[event.job_id] = 'Completed'
+        return changes
+
+    # Works with both async clients and sync clients, whose queries are run in a separate thread
+    for watcher_client in [async_client, client]:
+        statuses['id1'] = 'Running'
+        watcher = JobWatcher(watcher_client, ['id1'])
+        assert asyncio.run(watch(watcher)) == [('id1', 'Running'), ('id1', 'Completed')]
+
+    assert mock_sleep.await_count == 2
+
+    with pytest.raises(TypeError):
+        JobWatcher(async_client, ['id1']).poll()
@@ -151,6 +151,41 @@ def test_viterbi_job_file_filters_args(mocker, mock_viterbi_job):
         pytest.fail(f"Test failed with exception: {e}")
 
 
+def test_viterbi_job_get_candidates(mock_viterbi_job):
+    np = pytest.importorskip('numpy')
+
+    viterbi_job = mock_viterbi_job({
+        'get_files_by_reference': [
+            ('results_a0_phase_loglikes_scores.dat', bytearray(b'1 2 3 4\n5 6 7 8\n')),
+            ('other/results_a0_phase_loglikes_scores.dat', bytearray(b'9 10 11 12\n')),
+        ]
+    })
+    viterbi_job.get_full_file_list = lambda: FileReferenceList([])
+
+    candidates = viterbi_job.get_candidates()
+    np.testing.assert_array_equal(candidates['a0'], [1, 5, 9])
+    np.testing.assert_array_equal(candidates['score'], [4, 8, 12])
+
+    viterbi_job = mock_viterbi_job({'get_files_by_reference': []})
+    viterbi_job.get_full_file_list = lambda: FileReferenceList([])
+    assert viterbi_job.get_candidates().shape == (0,)
+
+
+def test_viterbi_job_export_candidates(mocker, mock_viterbi_job):
+    mock_export = mocker.patch('gwlab_viterbi_python.viterbi_job.export_candidates')
+    viterbi_job = mock_viterbi_job({'filter_candidates': 'candidates'})
+    viterbi_job.get_full_file_list = lambda: FileReferenceList([])
+
+    viterbi_job.export_candidates('candidates.npz', 'data_params', 'search_params', top_k=10)
+
+    viterbi_job.client.filter_candidates.assert_called_once_with(
+        FileReferenceList([]), threshold=None, top_k=10, field='log_likelihood'
+    )
+    mock_export.assert_called_once_with(
+        'candidates.npz', 'candidates', data_params='data_params', search_params='search_params', compress=None
+    )
+
+
 def test_register_file_list_filter(mock_viterbi_job_files, txt):
     viterbi_job = mock_viterbi_job_files
 
@@ -168,3 +203,22 @@ def test_register_file_list_filter(mock_viterbi_job_files, txt):
     assert getattr(viterbi_job, 'save_txt_files', None) is not None
 
     assert viterbi_job.get_txt_file_list() == txt
+
+
+@pytest.mark.parametrize('status, finished', [
+    ('Completed', True),
+    ('Error', True),
+    ('Cancelled', True),
+    ('Running', False),
+    ('Queued', False),
+])
+def test_viterbi_job_is_finished(mocker, status, finished):
+    job = ViterbiJob(
+        client=mocker.Mock(),
+        job_id='test_id',
+        name='TestName',
+        description='Test description',
+        user='Test User',
+        job_status={'name': status, 'date': '2021-12-02'},
+    )
+    assert job.is_finished is finished
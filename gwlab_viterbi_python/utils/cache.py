@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+_DEFAULT = object()
+
+
+class TTLCache:
+    """Thread-safe cache holding a bounded number of entries, evicting the least recently used entry when full.
+    Entries can also expire after a time-to-live.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        Maximum number of entries held in the cache, by default 1024
+    ttl : float, optional
+        Default number of seconds after which entries expire, by default 60. If None, entries do not expire.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _DEFAULT) is not _DEFAULT
+
+    def get(self, key, default=None):
+        """Get a value from the cache, marking it as recently used
+
+        Parameters
+        ----------
+        key : hashable
+            Key of the entry
+        default : optional
+            Value returned if there is no unexpired entry for the key, by default None
+
+        Returns
+        -------
+        object
+            Cached value, or default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            value, expiry = entry
+            if expiry is not None and expiry <= time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=_DEFAULT):
+        """Add a value to the cache, evicting the least recently used entry if the cache is full
+
+        Parameters
+        ----------
+        key : hashable
+            Key of the entry
+        value : object
+            Value to store
+        ttl : float, optional
+            Number of seconds after which the entry expires, by default the ttl of the cache.
+            If None, the entry does not expire.
+        """
+        ttl = self.ttl if ttl is _DEFAULT else ttl
+        expiry = None if ttl is None else time.monotonic() + ttl
+
+        with self._lock:
+            self._entries[key] = (value, expiry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Remove an entry from the cache, if present
+
+        Parameters
+        ----------
+        key : hashable
+            Key of the entry
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all entries from the cache"""
+        with self._lock:
+            self._entries.clear()
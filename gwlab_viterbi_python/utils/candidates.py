@@ -0,0 +1,273 @@
+import threading
+import warnings
+
+from .file_download import _iter_file_chunks
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CANDIDATES_FIELDS = ('a0', 'phase', 'log_likelihood', 'score')
+"""Names of the columns in a candidates file, in the order in which they are written"""
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError(
+            "Loading candidates requires numpy, which can be installed with "
+            "'pip install gwlab-viterbi-python[numpy]'"
+        )
+
+
+def get_candidates_dtype():
+    """Get the NumPy dtype of the structured arrays holding candidates
+
+    Returns
+    -------
+    numpy.dtype
+        Structured dtype with a float64 field for each of the columns in :data:`CANDIDATES_FIELDS`
+    """
+    _require_numpy()
+    return np.dtype([(field, np.float64) for field in CANDIDATES_FIELDS])
+
+
+def _to_candidates(values):
+    if values.size % len(CANDIDATES_FIELDS):
+        raise ValueError(
+            f'Candidates data contains {values.size} values, which is not a multiple of {len(CANDIDATES_FIELDS)}'
+        )
+
+    # Each row of the contiguous float64 array is reinterpreted as one structured element, without copying
+    return values.reshape(-1, len(CANDIDATES_FIELDS)).view(get_candidates_dtype()).reshape(-1)
+
+
+def _parse_values(parse, source):
+    # Before NumPy 2, text that cannot be parsed only causes a DeprecationWarning, and the values before it are
+    # returned, so the warning is raised as an error to reject malformed data with every version of NumPy
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            return parse(source, dtype=np.float64, sep=' ')
+        except DeprecationWarning as e:
+            raise ValueError(f'Candidates data could not be parsed: {e}') from e
+
+
+def parse_candidates(content):
+    """Parse the contents of a 'results_a0_phase_loglikes_scores.dat' candidates file.
+    All of the values are parsed in a single call into NumPy, so there is no per-line work in Python.
+
+    Parameters
+    ----------
+    content : bytes, bytearray or str
+        Contents of the candidates file, with whitespace separated a0, phase, log likelihood and score columns
+
+    Returns
+    -------
+    numpy.ndarray
+        Structured array with 'a0', 'phase', 'log_likelihood' and 'score' fields, and one element per candidate
+
+    Raises
+    ------
+    ValueError
+        If the contents cannot be parsed as rows of four numbers
+    """
+    _require_numpy()
+    if isinstance(content, str):
+        content = content.encode()
+    elif not isinstance(content, bytes):
+        content = bytes(content)
+
+    if content.isspace():
+        # NumPy parses whitespace on its own as a single value of -1
+        return _to_candidates(np.empty(0, dtype=np.float64))
+
+    return _to_candidates(_parse_values(np.fromstring, content))
+
+
+def load_candidates(file_path):
+    """Load a 'results_a0_phase_loglikes_scores.dat' candidates file that has been saved to disk.
+    The file is parsed by NumPy as it is read, without first reading its contents into Python.
+
+    Parameters
+    ----------
+    file_path : str or ~pathlib.Path
+        Path of the candidates file
+
+    Returns
+    -------
+    numpy.ndarray
+        Structured array with 'a0', 'phase', 'log_likelihood' and 'score' fields, and one element per candidate
+
+    Raises
+    ------
+    ValueError
+        If the file cannot be parsed as rows of four numbers
+    """
+    _require_numpy()
+    try:
+        values = _parse_values(np.fromfile, file_path)
+    except ValueError:
+        # NumPy fails on a file that contains only whitespace, so it is parsed from memory instead,
+        # which also raises a consistent error if the file is malformed
+        with open(file_path, 'rb') as f:
+            return parse_candidates(f.read())
+    return _to_candidates(values)
+
+
+def iter_candidates(chunks, batch_size=1024 * 1024):
+    """Parse a candidates file incrementally from a stream of chunks of its contents, such as those yielded by
+    :meth:`~gwlab_viterbi_python.gwlab_viterbi.GWLabViterbi.iter_files_by_reference`.
+    Chunks are collected until at least `batch_size` bytes are available, and then all of the complete lines
+    are parsed at once. Any partial line at the end of a batch is carried over to the next.
+
+    Parameters
+    ----------
+    chunks : iterable of bytes
+        Consecutive chunks of the contents of a single candidates file
+    batch_size : int, optional
+        Minimum number of bytes to collect before parsing, by default 1 MiB
+
+    Yields
+    ------
+    numpy.ndarray
+        Structured arrays with 'a0', 'phase', 'log_likelihood' and 'score' fields, holding the candidates
+        parsed from each batch
+    """
+    buffer = []
+    buffered_bytes = 0
+
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered_bytes += len(chunk)
+        if buffered_bytes < batch_size:
+            continue
+
+        content = b''.join(buffer)
+        end = content.rfind(b'\n') + 1
+        buffer = [content[end:]]
+        buffered_bytes = len(buffer[0])
+        if end:
+            yield parse_candidates(content[:end])
+
+    content = b''.join(buffer)
+    if content.strip():
+        yield parse_candidates(content)
+
+
+class CandidatesSelector:
+    """Keeps the candidates that pass a threshold and/or are among the best `top_k`, as candidates are added in
+    batches. At most `top_k` candidates are held between batches, so memory use stays bounded however many
+    candidates are added.
+
+    Parameters
+    ----------
+    threshold : float or str, optional
+        Only keep candidates whose `field` is greater than or equal to this value, by default None (no threshold).
+        Strings such as :attr:`SearchParametersInput.search_l_l_threshold` are converted to floats.
+    top_k : int, optional
+        Only keep the `top_k` candidates with the largest `field`, by default None (no limit)
+    field : str, optional
+        Name of the field to which the threshold and top k selection are applied, by default 'log_likelihood'
+    """
+
+    def __init__(self, threshold=None, top_k=None, field='log_likelihood'):
+        _require_numpy()
+        self.threshold = None if threshold is None else float(threshold)
+        self.top_k = top_k
+        self.field = field
+        self._selected = []
+
+    def add(self, candidates):
+        """Add a batch of candidates, keeping only those that pass the selection
+
+        Parameters
+        ----------
+        candidates : numpy.ndarray
+            Structured array of candidates
+        """
+        if self.threshold is not None:
+            candidates = candidates[candidates[self.field] >= self.threshold]
+
+        self._selected.append(candidates)
+
+        if self.top_k is not None:
+            selected = np.concatenate(self._selected)
+            if len(selected) > self.top_k:
+                # argpartition finds the largest top_k values in linear time, without sorting the rest
+                selected = selected[np.argpartition(-selected[self.field], self.top_k - 1)[:self.top_k]]
+            self._selected = [selected]
+
+    def result(self):
+        """Get the selected candidates
+
+        Returns
+        -------
+        numpy.ndarray
+            Structured array of the selected candidates. If `top_k` was given, they are sorted from largest to
+            smallest `field`, and otherwise they are in the order in which they were added.
+        """
+        selected = _concatenate_candidates(self._selected)
+        if self.top_k is not None:
+            selected = selected[np.argsort(-selected[self.field], kind='stable')]
+        return selected
+
+
+def _concatenate_candidates(candidates_list):
+    _require_numpy()
+    if not candidates_list:
+        return np.empty(0, dtype=get_candidates_dtype())
+    return np.concatenate(candidates_list)
+
+
+class _CandidatesAggregator:
+    """Combines the candidates from many files into a single selection, tagging each candidate with the ID of
+    the job it came from. Its :meth:`map_fn` downloads and parses a single file, so files can be processed
+    concurrently by :func:`~gwlab_viterbi_python.utils.file_download._download_files`."""
+
+    def __init__(self, job_ids, threshold=None, top_k=None, field='log_likelihood'):
+        self.job_ids = list(job_ids)
+        self.threshold = threshold
+        self.top_k = top_k
+        self.field = field
+
+        self._job_indices = {job_id: i for i, job_id in enumerate(self.job_ids)}
+        self._dtype = np.dtype(get_candidates_dtype().descr + [('job_index', np.int64)])
+        self._selector = CandidatesSelector(threshold=threshold, top_k=top_k, field=field)
+        self._lock = threading.Lock()
+
+    def _tag(self, candidates, job_index):
+        tagged = np.empty(len(candidates), dtype=self._dtype)
+        for field in CANDIDATES_FIELDS:
+            tagged[field] = candidates[field]
+        tagged['job_index'] = job_index
+        return tagged
+
+    def map_fn(self, file_id, file_ref, file_size=None, progress_bar=None, session=None):
+        # Called with the FileReference in place of a file path, so that the job ID can be used to tag the candidates.
+        # Each file is selected from separately, and only merged once complete, so that a download that is retried
+        # is not counted twice.
+        job_index = self._job_indices[file_ref.job_id]
+        selector = CandidatesSelector(threshold=self.threshold, top_k=self.top_k, field=self.field)
+
+        chunks = _iter_file_chunks(file_id, file_ref.path, file_size, progress_bar, session)
+        for candidates in iter_candidates(chunks):
+            selector.add(self._tag(candidates, job_index))
+
+        with self._lock:
+            self._selector.add(selector.result())
+
+    def result(self):
+        selected = self._selector.result()
+        if not len(selected):
+            selected = np.empty(0, dtype=self._dtype)
+        elif self.top_k is None:
+            # Files finish in any order, so the candidates are put back in the order of their jobs
+            selected = selected[np.argsort(selected['job_index'], kind='stable')]
+
+        job_id_dtype = f'U{max([len(job_id) for job_id in self.job_ids], default=1)}'
+        result = np.empty(len(selected), dtype=get_candidates_dtype().descr + [('job_id', job_id_dtype)])
+        for field in CANDIDATES_FIELDS:
+            result[field] = selected[field]
+        result['job_id'] = np.array(self.job_ids, dtype=job_id_dtype)[selected['job_index']]
+        return result
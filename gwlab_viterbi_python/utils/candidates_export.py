@@ -0,0 +1,154 @@
+import json
+from pathlib import Path
+
+from .candidates import _require_numpy
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+_METADATA_KEY = 'gwlab_viterbi_metadata'
+_ARROW_SUFFIXES = ('.feather', '.arrow', '.parquet')
+
+
+def _require_pyarrow(file_path):
+    if pyarrow is None:
+        raise ImportError(
+            f"Exporting candidates to '{file_path.suffix}' files requires pyarrow, which can be installed with "
+            "'pip install gwlab-viterbi-python[arrow]'"
+        )
+
+
+def _get_metadata(data_params, search_params):
+    return {
+        'data_parameters': None if data_params is None else data_params.to_dict(),
+        'search_parameters': None if search_params is None else search_params.to_dict(),
+    }
+
+
+def export_candidates(file_path, candidates, data_params=None, search_params=None, compress=None):
+    """Save candidates to a binary columnar file, so that they can be loaded again without parsing any text.
+    The format is chosen from the suffix of the file path:
+
+    - '.npz' stores each field as a separate NumPy array
+    - '.feather' or '.arrow' stores an Apache Arrow table, which is memory-mapped when it is loaded, so that
+      uncompressed files are loaded without copying. Requires the optional `pyarrow` dependency.
+    - '.parquet' stores an Apache Parquet table, which is the most compact. Requires the optional `pyarrow`
+      dependency.
+
+    The data and search parameters of the jobs are embedded in the file, and returned when it is loaded.
+
+    Parameters
+    ----------
+    file_path : str or ~pathlib.Path
+        Path of the file to write, with a '.npz', '.feather', '.arrow' or '.parquet' suffix
+    candidates : numpy.ndarray
+        Structured array of candidates, such as one returned by
+        :meth:`~gwlab_viterbi_python.gwlab_viterbi.GWLabViterbi.aggregate_candidates`
+    data_params : DataParametersInput, optional
+        Data parameters used by the jobs, by default None
+    search_params : SearchParametersInput, optional
+        Search parameters used by the jobs, by default None
+    compress : bool, optional
+        Compress the data, by default None, which compresses '.npz' and '.parquet' files, but not '.feather' or
+        '.arrow' files, as compressed Arrow files cannot be memory-mapped without copying.
+
+    Raises
+    ------
+    ValueError
+        If the file path has an unsupported suffix
+    """
+    _require_numpy()
+    file_path = Path(file_path)
+    metadata = json.dumps(_get_metadata(data_params, search_params))
+    columns = {field: candidates[field] for field in candidates.dtype.names}
+
+    if compress is None:
+        compress = file_path.suffix not in ('.feather', '.arrow')
+
+    if file_path.suffix == '.npz':
+        save = np.savez_compressed if compress else np.savez
+        with file_path.open('wb') as f:
+            save(f, **columns, **{_METADATA_KEY: np.array(metadata)})
+        return
+
+    if file_path.suffix not in _ARROW_SUFFIXES:
+        raise ValueError(f"Cannot export candidates to '{file_path.suffix}' files")
+
+    _require_pyarrow(file_path)
+    table = pyarrow.table(columns).replace_schema_metadata({_METADATA_KEY: metadata})
+    if file_path.suffix == '.parquet':
+        pyarrow.parquet.write_table(table, file_path, compression='zstd' if compress else 'none')
+    else:
+        pyarrow.feather.write_feather(table, file_path, compression='zstd' if compress else 'uncompressed')
+
+
+def _to_structured(columns):
+    columns = {
+        name: column.astype(str) if column.dtype == object else column
+        for name, column in columns.items()
+    }
+    candidates = np.empty(
+        len(next(iter(columns.values()), [])),
+        dtype=[(name, column.dtype) for name, column in columns.items()]
+    )
+    for name, column in columns.items():
+        candidates[name] = column
+    return candidates
+
+
+def load_exported_candidates(file_path, structured=True):
+    """Load candidates saved by :func:`export_candidates`
+
+    Parameters
+    ----------
+    file_path : str or ~pathlib.Path
+        Path of the file, with a '.npz', '.feather', '.arrow' or '.parquet' suffix
+    structured : bool, optional
+        Combine the columns into a single structured array, by default True. Building the structured array
+        copies every column, so if False, a dict of separate column arrays is returned instead. The numeric
+        columns of uncompressed '.feather' and '.arrow' files are then read-only views of the memory-mapped file,
+        and are loaded without copying.
+
+    Returns
+    -------
+    numpy.ndarray or dict
+        Structured array of the saved candidates, or a dict of the arrays for each field if `structured` is False
+    dict
+        Metadata saved with the candidates, with 'data_parameters' and 'search_parameters' keys holding dicts
+        of the parameters used by the jobs, or None if they were not saved
+
+    Raises
+    ------
+    ValueError
+        If the file path has an unsupported suffix
+    """
+    _require_numpy()
+    file_path = Path(file_path)
+
+    if file_path.suffix == '.npz':
+        with np.load(file_path) as data:
+            metadata = json.loads(data[_METADATA_KEY].item())
+            columns = {name: data[name] for name in data.files if name != _METADATA_KEY}
+        return _to_structured(columns) if structured else columns, metadata
+
+    if file_path.suffix not in _ARROW_SUFFIXES:
+        raise ValueError(f"Cannot load candidates from '{file_path.suffix}' files")
+
+    _require_pyarrow(file_path)
+    if file_path.suffix == '.parquet':
+        table = pyarrow.parquet.read_table(file_path)
+    else:
+        table = pyarrow.feather.read_table(file_path, memory_map=True)
+
+    metadata = json.loads(table.schema.metadata[_METADATA_KEY.encode()])
+    columns = {name: table.column(name).to_numpy() for name in table.column_names}
+    return _to_structured(columns) if structured else columns, metadata
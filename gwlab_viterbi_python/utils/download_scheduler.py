@@ -0,0 +1,419 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+import requests
+
+from .session_pool import SessionPool
+from ..exceptions import GWLabDownloadError, GWLabFileIntegrityError
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+EXPIRED_STATUS_CODES = (403, 404, 410)
+RETRY_EXCEPTIONS = (
+    GWLabFileIntegrityError,
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+class _RateLimiter:
+    """Delays callers so that the combined rate of bytes passing through stays below a limit"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next_time = time.monotonic()
+
+    def consume(self, num_bytes):
+        with self._lock:
+            now = time.monotonic()
+            self._next_time = max(self._next_time, now) + num_bytes / self.rate
+            delay = self._next_time - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _MemoryBudget:
+    """Keeps track of the bytes held in memory by downloaded files, so that their total stays below a limit.
+    Each of the concurrent downloads is entitled to an equal share of the limit, so a file larger than that share
+    is never given memory, and a smaller file is only given memory while there is some left."""
+
+    def __init__(self, limit, max_workers=1):
+        self.limit = limit
+        self.max_file_size = limit // max_workers
+        self.in_use = 0
+        self._lock = threading.Lock()
+
+    def try_reserve(self, num_bytes):
+        with self._lock:
+            if num_bytes > self.max_file_size or self.in_use + num_bytes > self.limit:
+                return False
+            self.in_use += num_bytes
+            return True
+
+    def release(self, num_bytes):
+        with self._lock:
+            self.in_use -= num_bytes
+
+
+class _FileProgress:
+    """Passed to the download function in place of the progress bar for each attempt at a file. The progress bar
+    only advances once the attempt passes the furthest point in the file reached by any earlier attempt, so that
+    retried downloads are not counted twice."""
+
+    def __init__(self, scheduler, index):
+        self._scheduler = scheduler
+        self._index = index
+        self._position = 0
+
+    def update(self, num_bytes):
+        self._position += num_bytes
+        self._scheduler._advance(self._index, self._position)
+        self._scheduler._receive(num_bytes)
+
+    def skip(self, num_bytes):
+        self._position += num_bytes
+        self._scheduler._advance(self._index, self._position)
+
+
+class DownloadReport:
+    """Outcome of downloading a batch of files, recording the result or error for each file"""
+
+    def __init__(self):
+        self._outcomes = {}
+
+    def __len__(self):
+        return len(self._outcomes)
+
+    def _add_success(self, index, file_path, result):
+        self._outcomes[index] = (file_path, result, None)
+
+    def _add_failure(self, index, file_path, error):
+        self._outcomes[index] = (file_path, None, error)
+
+    def _sorted_outcomes(self):
+        return [self._outcomes[index] for index in sorted(self._outcomes)]
+
+    def _subset(self, indices):
+        # Report of the outcomes at the given indices, renumbered from zero
+        report = DownloadReport()
+        report._outcomes = {i: self._outcomes[index] for i, index in enumerate(indices) if index in self._outcomes}
+        return report
+
+    @property
+    def results(self):
+        """list: Results of the files that were downloaded successfully, in the order they were submitted"""
+        return [result for _, result, error in self._sorted_outcomes() if error is None]
+
+    @property
+    def succeeded(self):
+        """list: Paths of the files that were downloaded successfully"""
+        return [file_path for file_path, _, error in self._sorted_outcomes() if error is None]
+
+    @property
+    def failed(self):
+        """list: Tuples of the path and final error for each of the files that could not be downloaded"""
+        return [(file_path, error) for file_path, _, error in self._sorted_outcomes() if error is not None]
+
+    @property
+    def ok(self):
+        """bool: True if every file was downloaded successfully, False otherwise"""
+        return not self.failed
+
+    def raise_for_failures(self):
+        """Raise an error if any of the files could not be downloaded
+
+        Raises
+        ------
+        ~gwlab_viterbi_python.exceptions.GWLabDownloadError
+            If any of the files could not be downloaded, holding this report as its `report` attribute
+        """
+        if not self.ok:
+            raise GWLabDownloadError(self)
+
+
+class DownloadScheduler:
+    """Runs file downloads on a pool of worker threads, adjusting how many of them may download at once.
+
+    Files are downloaded largest first, so that a few big files don't hold up the end of a batch.
+    The number of concurrent downloads starts low and grows for as long as doing so increases the measured
+    throughput, and is cut back if the throughput falls or the server responds with a 429 or 5xx status,
+    in which case the download is retried after a delay. Downloads that fail with a connection error or that do
+    not receive the expected number of bytes are also retried, and a file whose download id has expired is
+    retried with a new id. Retries are delayed by an exponentially growing amount with random jitter, so that
+    failed downloads do not all retry at once.
+
+    A failed file does not stop the others from downloading, and :meth:`join` reports the outcome of every file.
+
+    Parameters
+    ----------
+    map_fn : function
+        Function used to download each file, called with the file id, path and size,
+        along with `progress_bar` and `session` keyword arguments. The `progress_bar` has `update` and `skip`
+        methods, which behave like those of the scheduler.
+    max_workers : int, optional
+        Maximum number of concurrent downloads, by default 20
+    bandwidth_limit : int, optional
+        Maximum combined download rate in bytes per second, by default None (unlimited)
+    session_pool : ~gwlab_viterbi_python.utils.session_pool.SessionPool, optional
+        Pool from which to obtain HTTP sessions, by default a new pool is created
+    progress_bar : tqdm.tqdm, optional
+        Progress bar to update as data is received, by default None
+    max_retries : int, optional
+        Number of times a file is retried before it is reported as failed, by default 5
+    tuning_interval : float, optional
+        Seconds between adjustments of the number of concurrent downloads, by default 1
+    backoff_factor : float, optional
+        Seconds before the first retry of a file, which doubles with each retry, by default 1
+    max_backoff : float, optional
+        Maximum number of seconds before a retry, by default 60
+    """
+
+    def __init__(self, map_fn, max_workers=20, bandwidth_limit=None, session_pool=None, progress_bar=None,
+                 max_retries=5, tuning_interval=1.0, backoff_factor=1.0, max_backoff=60.0):
+        self.map_fn = map_fn
+        self.max_workers = max_workers
+        self.session_pool = SessionPool(pool_size=max_workers) if session_pool is None else session_pool
+        self.progress_bar = progress_bar
+        self.max_retries = max_retries
+        self.tuning_interval = tuning_interval
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+        self.concurrency = max(1, max_workers // 4)
+        self._rate_limiter = _RateLimiter(bandwidth_limit) if bandwidth_limit else None
+        self._slow_start = True
+
+        self._condition = threading.Condition()
+        self._queue = []
+        self._counter = itertools.count()
+        self._active = 0
+        self._pending = 0
+        self._closed = False
+        self._cancelled = False
+        self._report = DownloadReport()
+        self._positions = {}
+
+        self._bytes = 0
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._last_throughput = 0
+
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(max_workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, index, file_id, file_path, file_size, refresh_file_id=None):
+        """Add a file to the download queue
+
+        Parameters
+        ----------
+        index : int
+            Position of the outcome of this download in the report returned by :meth:`join`
+        file_id : str
+            Download id of the file
+        file_path : ~pathlib.Path
+            Path of the file
+        file_size : int
+            Expected size of the file in bytes
+        refresh_file_id : function, optional
+            Function that returns a new download id for the file, called if the download id has expired,
+            by default None
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('Cannot submit downloads to a closed DownloadScheduler')
+            self._pending += 1
+            self._push((index, file_id, file_path, file_size, 0, refresh_file_id))
+
+    def join(self):
+        """Wait for all submitted downloads to finish. No more files may be submitted after this is called.
+
+        Returns
+        -------
+        DownloadReport
+            Outcome of each file, with the return values of `map_fn` for the files that were downloaded
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        for thread in self._threads:
+            thread.join()
+
+        return self._report
+
+    def cancel(self):
+        """Stop downloading, dropping the files that have not been started yet, and wait for the files that are being
+        downloaded to finish. No more files may be submitted after this is called. Files that are waiting to be
+        retried are dropped once their delay is over, rather than being retried.
+        """
+        with self._condition:
+            self._closed = True
+            self._cancelled = True
+            self._condition.notify_all()
+
+        for thread in self._threads:
+            thread.join()
+
+    def update(self, num_bytes):
+        """Record that data has been received. Download functions call this in place of updating the progress bar.
+
+        Parameters
+        ----------
+        num_bytes : int
+            Number of bytes received
+        """
+        self.skip(num_bytes)
+        self._receive(num_bytes)
+
+    def skip(self, num_bytes):
+        """Advance the progress bar for data that did not need to be downloaded, such as the part of a resumed file
+        that is already on disk. Unlike :meth:`update`, this does not count towards the bandwidth limit or the
+        measured throughput.
+
+        Parameters
+        ----------
+        num_bytes : int
+            Number of bytes skipped
+        """
+        if self.progress_bar is not None and num_bytes:
+            self.progress_bar.update(num_bytes)
+
+    def _advance(self, index, position):
+        with self._condition:
+            furthest = self._positions.get(index, 0)
+            self._positions[index] = max(furthest, position)
+        self.skip(max(0, position - furthest))
+
+    def _receive(self, num_bytes):
+        if self._rate_limiter is not None and num_bytes > 0:
+            self._rate_limiter.consume(num_bytes)
+
+        with self._condition:
+            self._bytes += num_bytes
+            self._tune()
+
+    def _push(self, task):
+        # The heap is ordered by file size, largest first, and then by submission order
+        heapq.heappush(self._queue, (-task[3], next(self._counter), task))
+        self._condition.notify()
+
+    def _tune(self):
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < self.tuning_interval:
+            return
+
+        throughput = (self._bytes - self._window_bytes) / elapsed
+        if throughput > 1.1 * self._last_throughput and self.concurrency < self.max_workers:
+            self.concurrency = min(self.max_workers, self.concurrency * 2 if self._slow_start else self.concurrency + 1)
+            self._condition.notify_all()
+        elif throughput < 0.9 * self._last_throughput and self.concurrency > 1:
+            self.concurrency -= 1
+            self._slow_start = False
+
+        self._last_throughput = throughput
+        self._window_start = now
+        self._window_bytes = self._bytes
+
+    def _back_off(self):
+        self.concurrency = max(1, self.concurrency // 2)
+        self._slow_start = False
+
+    def _next_task(self):
+        with self._condition:
+            while True:
+                if self._cancelled and self._queue:
+                    self._pending -= len(self._queue)
+                    self._queue.clear()
+                    self._condition.notify_all()
+                if self._queue and self._active < self.concurrency:
+                    self._active += 1
+                    return heapq.heappop(self._queue)[2]
+                if self._closed and not self._pending:
+                    return None
+                self._condition.wait()
+
+    def _is_expired(self, error, refresh_file_id):
+        return (
+            refresh_file_id is not None
+            and isinstance(error, requests.HTTPError)
+            and error.response is not None
+            and error.response.status_code in EXPIRED_STATUS_CODES
+        )
+
+    def _is_retryable(self, error):
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and error.response.status_code in RETRY_STATUS_CODES
+        return isinstance(error, RETRY_EXCEPTIONS)
+
+    def _worker(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+
+            index, file_id, file_path, file_size, attempt, refresh_file_id = task
+            try:
+                result = self.map_fn(
+                    file_id, file_path, file_size, progress_bar=_FileProgress(self, index),
+                    session=self.session_pool.get_session()
+                )
+            except Exception as e:
+                if attempt < self.max_retries and self._is_expired(e, refresh_file_id):
+                    self._refresh(task)
+                elif attempt < self.max_retries and self._is_retryable(e):
+                    self._retry(task, e)
+                else:
+                    self._finish(index, file_path, error=e)
+            else:
+                self._finish(index, file_path, result=result)
+
+    def _get_delay(self, attempt, error):
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+        if retry_after.isdigit():
+            return float(retry_after)
+
+        # Each delay is drawn from the upper half of an exponentially growing range
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def _retry(self, task, error):
+        with self._condition:
+            self._active -= 1
+            self._back_off()
+            self._condition.notify_all()
+
+        index, file_id, file_path, file_size, attempt, refresh_file_id = task
+        time.sleep(self._get_delay(attempt, error))
+
+        with self._condition:
+            self._push((index, file_id, file_path, file_size, attempt + 1, refresh_file_id))
+
+    def _refresh(self, task):
+        index, file_id, file_path, file_size, attempt, refresh_file_id = task
+        try:
+            file_id = refresh_file_id()
+        except Exception as e:
+            self._finish(index, file_path, error=e)
+            return
+
+        with self._condition:
+            self._active -= 1
+            self._push((index, file_id, file_path, file_size, attempt + 1, refresh_file_id))
+
+    def _finish(self, index, file_path, result=None, error=None):
+        with self._condition:
+            self._active -= 1
+            self._pending -= 1
+            self._positions.pop(index, None)
+            if error is None:
+                self._report._add_success(index, file_path, result)
+            else:
+                self._report._add_failure(index, file_path, error)
+            self._condition.notify_all()
@@ -0,0 +1,239 @@
+import hashlib
+import mmap
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+
+# Fraction of the byte budget to which the cache is reduced once it exceeds the budget
+_LOW_WATER_MARK = 0.9
+
+
+class FileCache:
+    """Directory in which downloaded files are kept, so that they can be reused instead of downloaded again.
+    Files are identified by their job ID and path, and are only considered valid if they have the expected size.
+    When the total size of the cached files exceeds the byte budget, the least recently used files are removed
+    until the cache is a tenth below its budget, so that a nearly full cache is not scanned for every new file.
+
+    The cache directory may be shared by several processes on the same machine.
+
+    Parameters
+    ----------
+    directory : str or ~pathlib.Path
+        Directory in which to store the cached files
+    max_bytes : int, optional
+        Maximum total size of the cached files, by default 10 GB
+    """
+
+    def __init__(self, directory, max_bytes=10 * 1024 ** 3):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._total_bytes = sum(size for _, size, _ in self._scan())
+
+    def _scan(self):
+        for path in self.directory.rglob('*'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if path.is_file() and not path.name.endswith('.tmp'):
+                yield path, stat.st_size, stat.st_mtime
+
+    def get_cache_path(self, file_ref):
+        """Get the location in the cache for a file, whether or not it is cached
+
+        Parameters
+        ----------
+        file_ref : ~gwdc_python.files.file_reference.FileReference
+            Reference to the file
+
+        Returns
+        -------
+        ~pathlib.Path
+            Path at which the file is cached
+        """
+        job_dir = hashlib.sha256(str(file_ref.job_id).encode()).hexdigest()
+        return self.directory / job_dir / file_ref.path
+
+    def get(self, file_ref):
+        """Get the path of a cached file, marking it as recently used
+
+        Parameters
+        ----------
+        file_ref : ~gwdc_python.files.file_reference.FileReference
+            Reference to the file
+
+        Returns
+        -------
+        ~pathlib.Path or None
+            Path of the cached file, or None if the file is not cached with the expected size
+        """
+        cache_path = self.get_cache_path(file_ref)
+        try:
+            if cache_path.stat().st_size != file_ref.file_size:
+                return None
+            os.utime(cache_path)
+        except FileNotFoundError:
+            return None
+        return cache_path
+
+    def read(self, file_ref, memory_budget=None):
+        """Read the contents of a cached file
+
+        Parameters
+        ----------
+        file_ref : ~gwdc_python.files.file_reference.FileReference
+            Reference to the file
+        memory_budget : ~gwlab_viterbi_python.utils.download_scheduler._MemoryBudget, optional
+            Budget from which to reserve the memory for the contents, by default None (unlimited). If the contents
+            do not fit within the budget, the cached file is memory-mapped instead of read into memory.
+
+        Returns
+        -------
+        bytearray, mmap.mmap or None
+            Contents of the file, as a read-only memory map if they did not fit within the memory budget,
+            or None if the file is not cached
+        """
+        cache_path = self.get(file_ref)
+        if cache_path is None:
+            return None
+
+        if memory_budget is not None and not memory_budget.try_reserve(file_ref.file_size):
+            return self._map(cache_path, file_ref.file_size)
+
+        content = bytearray(file_ref.file_size)
+        try:
+            with cache_path.open('rb') as f:
+                num_bytes = f.readinto(content)
+        except FileNotFoundError:
+            num_bytes = None
+
+        if num_bytes != file_ref.file_size:
+            if memory_budget is not None:
+                memory_budget.release(file_ref.file_size)
+            return None
+        return content
+
+    def _map(self, cache_path, file_size):
+        # The memory map keeps the contents available even if the cached file is later evicted or replaced
+        try:
+            with cache_path.open('rb') as f:
+                if os.fstat(f.fileno()).st_size != file_size:
+                    return None
+                if not file_size:
+                    # Empty files cannot be memory-mapped
+                    return bytearray()
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+
+    def copy_to(self, file_ref, output_path):
+        """Place a cached file at the output path, as a hardlink if possible and as a copy otherwise
+
+        Parameters
+        ----------
+        file_ref : ~gwdc_python.files.file_reference.FileReference
+            Reference to the file
+        output_path : ~pathlib.Path
+            Path at which to place the file
+
+        Returns
+        -------
+        bool
+            True if the file was cached and has been placed at the output path, False otherwise
+        """
+        cache_path = self.get(file_ref)
+        if cache_path is None:
+            return False
+
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self._link_or_copy(cache_path, output_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store_bytes(self, file_ref, content):
+        """Add the contents of a file to the cache
+
+        Parameters
+        ----------
+        file_ref : ~gwdc_python.files.file_reference.FileReference
+            Reference to the file
+        content : bytes-like
+            Contents of the file
+        """
+        cache_path = self.get_cache_path(file_ref)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = self._get_tmp_path(cache_path)
+        tmp_path.write_bytes(content)
+        tmp_path.replace(cache_path)
+        self._add_bytes(len(content))
+
+    def store_file(self, file_ref, file_path):
+        """Add a file that has been saved to disk to the cache, as a hardlink if possible and as a copy otherwise
+
+        Parameters
+        ----------
+        file_ref : ~gwdc_python.files.file_reference.FileReference
+            Reference to the file
+        file_path : ~pathlib.Path
+            Path of the saved file
+        """
+        cache_path = self.get_cache_path(file_ref)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._link_or_copy(Path(file_path), cache_path)
+        self._add_bytes(cache_path.stat().st_size)
+
+    def evict(self):
+        """Remove the least recently used files until the cache is a tenth below its byte budget"""
+        with self._lock:
+            entries = sorted(self._scan(), key=lambda entry: entry[2])
+            total_bytes = sum(size for _, size, _ in entries)
+
+            target_bytes = self.max_bytes * _LOW_WATER_MARK
+            for path, size, _ in entries:
+                if total_bytes <= target_bytes:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total_bytes -= size
+
+            self._total_bytes = total_bytes
+
+    def clear(self):
+        """Remove every file from the cache"""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._total_bytes = 0
+
+    def _add_bytes(self, num_bytes):
+        with self._lock:
+            self._total_bytes += num_bytes
+            over_budget = self._total_bytes > self.max_bytes
+
+        if over_budget:
+            self.evict()
+
+    def _get_tmp_path(self, path):
+        return path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+
+    def _link_or_copy(self, source, destination):
+        # The file is first placed at a temporary path and then renamed, so that other processes never see a
+        # partially written file
+        tmp_path = self._get_tmp_path(destination)
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+        tmp_path.replace(destination)
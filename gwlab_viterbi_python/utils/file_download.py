@@ -1,43 +1,321 @@
 import concurrent.futures
+import mmap
+import queue
+import tempfile
+import threading
 from functools import partial
+
 import requests
 from tqdm import tqdm
+from .download_scheduler import DownloadScheduler
+from .session_pool import SessionPool
+from ..exceptions import GWLabFileIntegrityError
 from ..settings import GWLAB_FILE_DOWNLOAD_ENDPOINT
 
 
-def _get_file_map_fn(file_id, file_path, progress_bar):
+def _request_file(file_id, session=None, offset=0):
     download_url = GWLAB_FILE_DOWNLOAD_ENDPOINT + str(file_id)
-    content = b''
+    session = requests if session is None else session
+    headers = {'Range': f'bytes={offset}-'} if offset else None
+
+    response = session.get(download_url, stream=True, headers=headers)
+    if not response.ok:
+        response.close()
+        response.raise_for_status()
+    return response
+
 
-    with requests.get(download_url, stream=True) as request:
-        for chunk in request.iter_content(chunk_size=1024 * 16, decode_unicode=True):
+def _iter_response_chunks(response, progress_bar=None):
+    for chunk in response.iter_content(chunk_size=1024 * 16):
+        if progress_bar is not None:
             progress_bar.update(len(chunk))
-            content += chunk
+        yield chunk
+
+
+def _skip_progress(progress_bar, num_bytes):
+    # Bytes that are already on disk advance the progress bar without counting as downloaded, if the progress bar
+    # supports it, as the download scheduler's does
+    if progress_bar is not None:
+        getattr(progress_bar, 'skip', progress_bar.update)(num_bytes)
+
+
+def _check_file_size(file_path, file_size, received_size):
+    # A file_size of None means that the size of the file is not known, so it cannot be checked
+    if file_size is not None and received_size != file_size:
+        raise GWLabFileIntegrityError(file_path, file_size, received_size)
+
+
+def _iter_file_chunks(file_id, file_path, file_size=None, progress_bar=None, session=None):
+    received_size = 0
+    with _request_file(file_id, session) as request:
+        for chunk in _iter_response_chunks(request, progress_bar):
+            received_size += len(chunk)
+            yield chunk
+
+    _check_file_size(file_path, file_size, received_size)
+
+
+def _get_part_path(file_path):
+    return file_path.with_name(file_path.name + '.part')
+
+
+def _is_file_complete(file_path, file_size):
+    return file_path.is_file() and file_path.stat().st_size == file_size
+
+
+def _spill_file(file_id, file_path, file_size=None, progress_bar=None, session=None):
+    # The file is written to an anonymous temporary file, which is memory-mapped once it is complete, so that its
+    # contents are paged in from disk as they are read rather than held in memory. The disk space is freed once
+    # the memory map is closed or garbage collected.
+    with tempfile.TemporaryFile() as f:
+        received_size = 0
+        with _request_file(file_id, session) as request:
+            for chunk in _iter_response_chunks(request, progress_bar):
+                received_size += len(chunk)
+                f.write(chunk)
+
+        _check_file_size(file_path, file_size, received_size)
+
+        if not received_size:
+            # Empty files cannot be memory-mapped
+            return (file_path, bytearray())
+
+        f.flush()
+        return (file_path, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def _get_file_map_fn(file_id, file_path, file_size=None, progress_bar=None, session=None, memory_budget=None):
+    # If a memory budget is given, files of unknown size, or that do not fit within the budget, are spilled to disk
+    if memory_budget is not None:
+        if file_size is None or not memory_budget.try_reserve(file_size):
+            return _spill_file(file_id, file_path, file_size, progress_bar, session)
+
+        try:
+            return _get_file_map_fn(file_id, file_path, file_size, progress_bar, session)
+        except Exception:
+            # The file will be downloaded again if it is retried, so its memory is given back in the meantime
+            memory_budget.release(file_size)
+            raise
+
+    # Chunks are copied into a buffer preallocated from the expected file size, rather than concatenated, so that
+    # each byte is only copied once. The number of bytes received is checked against the expected size as they
+    # are copied, so that truncated files are caught without another pass over the data.
+    content = bytearray(file_size or 0)
+    offset = 0
+
+    with _request_file(file_id, session) as request:
+        for chunk in _iter_response_chunks(request, progress_bar):
+            end = offset + len(chunk)
+            content[offset:end] = chunk
+            offset = end
+
+    _check_file_size(file_path, file_size, offset)
+
+    del content[offset:]
     return (file_path, content)
 
 
-def _save_file_map_fn(file_id, file_path, progress_bar):
-    download_url = GWLAB_FILE_DOWNLOAD_ENDPOINT + str(file_id)
+def _save_file_map_fn(file_id, file_path, file_size=None, progress_bar=None, session=None):
     file_path.parents[0].mkdir(parents=True, exist_ok=True)
 
-    with requests.get(download_url, stream=True) as request:
-        with file_path.open("wb+") as f:
-            for chunk in request.iter_content(chunk_size=1024 * 16):
-                progress_bar.update(len(chunk))
+    # An existing file may be a hardlink to a file in the file cache, so it is removed rather than overwritten,
+    # which would change the contents of every other link to it
+    try:
+        file_path.unlink()
+    except FileNotFoundError:
+        pass
+
+    received_size = 0
+    with file_path.open("wb+") as f:
+        with _request_file(file_id, session) as request:
+            for chunk in _iter_response_chunks(request, progress_bar):
+                received_size += len(chunk)
                 f.write(chunk)
 
+    try:
+        _check_file_size(file_path, file_size, received_size)
+    except GWLabFileIntegrityError:
+        file_path.unlink()
+        raise
+
+
+def _resume_file_map_fn(file_id, file_path, file_size=None, progress_bar=None, session=None):
+    # Data is written to a '.part' file next to the output, which is only renamed once the download is complete.
+    # If a previous download was interrupted, the remaining bytes are requested with an HTTP Range header.
+    file_path.parents[0].mkdir(parents=True, exist_ok=True)
+    part_path = _get_part_path(file_path)
+
+    offset = part_path.stat().st_size if part_path.is_file() else 0
+    if file_size is not None and offset > file_size:
+        offset = 0
+
+    if not file_size or offset < file_size:
+        with _request_file(file_id, session, offset) as request:
+            if offset and request.status_code != 206:
+                # The server has ignored the Range header and is sending the whole file
+                offset = 0
+
+            _skip_progress(progress_bar, offset)
+
+            with part_path.open("ab" if offset else "wb") as f:
+                for chunk in _iter_response_chunks(request, progress_bar):
+                    f.write(chunk)
+    else:
+        _skip_progress(progress_bar, offset)
+
+    received_size = part_path.stat().st_size
+    if file_size is not None and received_size > file_size:
+        # More data than expected cannot be resumed from, so the next attempt starts again from the beginning.
+        # A part file that is too short is kept, so that the next attempt can continue from where this one stopped.
+        part_path.unlink()
+    _check_file_size(file_path, file_size, received_size)
 
-def _download_files(map_fn, file_ids, file_paths, total_size):
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        progress = tqdm(total=total_size, leave=True, unit='B', unit_scale=True)
-        files = list(
-            executor.map(
-                partial(
-                    map_fn,
-                    progress_bar=progress
-                ),
-                file_ids, file_paths
-            )
-        )
+    part_path.replace(file_path)
+
+
+def _iter_files(file_ids, file_paths, file_sizes, session_pool=None):
+    session = (SessionPool(pool_size=1) if session_pool is None else session_pool).get_session()
+    progress = tqdm(total=sum(file_sizes), leave=True, unit='B', unit_scale=True)
+    for file_id, file_path, file_size in zip(file_ids, file_paths, file_sizes):
+        for chunk in _iter_file_chunks(file_id, file_path, file_size, progress, session):
+            yield (file_path, chunk)
+    progress.close()
+
+
+def _iter_in_background(iterable, max_queued=64):
+    # Items are produced on a separate thread and handed over through a bounded queue, so that reading from the
+    # network carries on while the consumer processes earlier items, without buffering more than max_queued items
+    items = queue.Queue(maxsize=max_queued)
+    stopped = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stopped.is_set():
+                    return
+                items.put((item, None))
+        except Exception as e:
+            items.put((done, e))
+        else:
+            items.put((done, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # If the consumer stops early, the queue is drained so that the producer is not left blocked
+        stopped.set()
+        while thread.is_alive():
+            try:
+                items.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def _iter_file_streams(file_ids, file_paths, file_sizes, session_pool=None):
+    # Yields an iterator over the chunks of each file in turn. Each file is read from the network on a background
+    # thread, so its iterator should be consumed before moving on to the next.
+    session = (SessionPool(pool_size=1) if session_pool is None else session_pool).get_session()
+    progress = tqdm(total=sum(file_sizes), leave=True, unit='B', unit_scale=True)
+    try:
+        for file_id, file_path, file_size in zip(file_ids, file_paths, file_sizes):
+            yield _iter_in_background(_iter_file_chunks(file_id, file_path, file_size, progress, session))
+    finally:
         progress.close()
-    return files
+
+
+def _refresh_file_id(get_file_ids, position):
+    return get_file_ids([position])[0]
+
+
+def _submit_file_batches(scheduler, file_batches, max_workers=20, start=0):
+    # Each batch holds a function that obtains the download ids for its files, or for the files at a list of
+    # positions within the batch, so that a single expired id can be replaced. These functions are called
+    # concurrently, and each batch of files is queued for download as soon as its ids are available.
+    # Files are numbered from start in the scheduler's report, and the batches whose ids could not be obtained
+    # are returned, to be added to the report with _add_id_errors.
+    id_errors = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for get_file_ids, file_paths, file_sizes in file_batches:
+            futures[executor.submit(get_file_ids)] = (start, get_file_ids, file_paths, file_sizes)
+            start += len(file_paths)
+
+        for future in concurrent.futures.as_completed(futures):
+            start, get_file_ids, file_paths, file_sizes = futures[future]
+            try:
+                file_ids = future.result()
+            except Exception as e:
+                id_errors.append((start, file_paths, e))
+                continue
+
+            for position, file_data in enumerate(zip(file_ids, file_paths, file_sizes)):
+                scheduler.submit(start + position, *file_data, partial(_refresh_file_id, get_file_ids, position))
+
+    return id_errors
+
+
+def _add_id_errors(report, id_errors):
+    for start, file_paths, error in id_errors:
+        for index, file_path in enumerate(file_paths, start):
+            report._add_failure(index, file_path, error)
+
+
+def _download_files(map_fn, file_batches, session_pool=None, max_workers=20, bandwidth_limit=None):
+    file_batches = list(file_batches)
+    total_size = sum(sum(file_sizes) for _, _, file_sizes in file_batches)
+
+    progress = tqdm(total=total_size, leave=True, unit='B', unit_scale=True)
+    scheduler = DownloadScheduler(
+        map_fn,
+        max_workers=max_workers,
+        bandwidth_limit=bandwidth_limit,
+        session_pool=session_pool,
+        progress_bar=progress
+    )
+
+    id_errors = _submit_file_batches(scheduler, file_batches, max_workers)
+
+    try:
+        report = scheduler.join()
+    finally:
+        progress.close()
+
+    _add_id_errors(report, id_errors)
+
+    return report
+
+
+async def _async_iter_file_chunks(http_client, file_id, progress_bar=None):
+    download_url = GWLAB_FILE_DOWNLOAD_ENDPOINT + str(file_id)
+
+    async with http_client.stream('GET', download_url) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes(chunk_size=1024 * 16):
+            if progress_bar is not None:
+                progress_bar.update(len(chunk))
+            yield chunk
+
+
+async def _async_get_file(http_client, file_id, file_path, file_size=None, progress_bar=None):
+    content = bytearray(file_size or 0)
+    offset = 0
+
+    async for chunk in _async_iter_file_chunks(http_client, file_id, progress_bar):
+        end = offset + len(chunk)
+        content[offset:end] = chunk
+        offset = end
+
+    _check_file_size(file_path, file_size, offset)
+
+    del content[offset:]
+    return (file_path, content)
@@ -0,0 +1,62 @@
+from ..exceptions import GWLabSubmissionError
+
+
+class SubmissionReport:
+    """Outcome of submitting many jobs, recording the ID of each job that was created, or the error for each job
+    that could not be created"""
+
+    def __init__(self):
+        self._outcomes = {}
+        self._jobs = None
+
+    def __len__(self):
+        return len(self._outcomes)
+
+    def _add_success(self, index, job_name, job_id):
+        self._outcomes[index] = (job_name, job_id, None)
+
+    def _add_failure(self, index, job_name, error):
+        self._outcomes[index] = (job_name, None, error)
+
+    def _set_jobs(self, jobs):
+        self._jobs = jobs
+
+    def _sorted_outcomes(self):
+        return [self._outcomes[index] for index in sorted(self._outcomes)]
+
+    @property
+    def job_ids(self):
+        """list: IDs of the jobs that were created, in the order their specs were given"""
+        return [job_id for _, job_id, error in self._sorted_outcomes() if error is None]
+
+    @property
+    def jobs(self):
+        """list or None: ViterbiJob instances for the jobs that were created, in the order their specs were given,
+        or None if the jobs were not fetched"""
+        return self._jobs
+
+    @property
+    def succeeded(self):
+        """list: Names of the jobs that were created"""
+        return [job_name for job_name, _, error in self._sorted_outcomes() if error is None]
+
+    @property
+    def failed(self):
+        """list: Tuples of the name and error for each of the jobs that could not be created"""
+        return [(job_name, error) for job_name, _, error in self._sorted_outcomes() if error is not None]
+
+    @property
+    def ok(self):
+        """bool: True if every job was created, False otherwise"""
+        return not self.failed
+
+    def raise_for_failures(self):
+        """Raise an error if any of the jobs could not be created
+
+        Raises
+        ------
+        ~gwlab_viterbi_python.exceptions.GWLabSubmissionError
+            If any of the jobs could not be created, holding this report as its `report` attribute
+        """
+        if not self.ok:
+            raise GWLabSubmissionError(self)
@@ -0,0 +1,107 @@
+import mmap
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class LazyFile:
+    """Handle to a downloaded file on disk, which is only opened and memory-mapped when its contents are first
+    accessed. The contents are then paged in from disk as they are read, rather than copied into memory,
+    so that only the parts of a large file that are used take up any memory.
+
+    LazyFile instances can be used as context managers, which close the memory map on exit.
+
+    Parameters
+    ----------
+    path : str or ~pathlib.Path
+        Path of the file on disk
+    keep_alive : object, optional
+        Object to keep referenced for as long as this file, such as the :class:`tempfile.TemporaryDirectory`
+        containing it, by default None
+    """
+
+    def __init__(self, path, keep_alive=None):
+        self.path = Path(path)
+        self._keep_alive = keep_alive
+        self._mmap = None
+
+    def __repr__(self):
+        return f"LazyFile('{self.path}')"
+
+    def __len__(self):
+        return self.path.stat().st_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def is_open(self):
+        """bool: True if the file has been memory-mapped, False otherwise"""
+        return self._mmap is not None
+
+    @property
+    def mmap(self):
+        """mmap.mmap: Read-only memory map of the file, which is created the first time it is accessed.
+        Empty files cannot be memory-mapped, so an empty bytes object is used for them instead."""
+        if self._mmap is None:
+            with self.path.open('rb') as f:
+                # The memory map holds its own handle to the file, so the file itself can be closed straight away
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if len(self) else b''
+        return self._mmap
+
+    def memoryview(self):
+        """Get a view of the contents of the file, without copying them
+
+        Returns
+        -------
+        memoryview
+            View of the memory-mapped file. The file cannot be closed while any views are still in use.
+        """
+        return memoryview(self.mmap)
+
+    def as_array(self, dtype='u1', offset=0, count=-1):
+        """Get a NumPy array backed by the contents of the file, without copying them.
+        Requires the optional `numpy` dependency.
+
+        Parameters
+        ----------
+        dtype : numpy.dtype or str, optional
+            Data type of the array elements, by default unsigned bytes
+        offset : int, optional
+            Position in the file, in bytes, at which the array starts, by default 0
+        count : int, optional
+            Number of elements in the array, by default -1, which reads to the end of the file
+
+        Returns
+        -------
+        numpy.ndarray
+            Read-only array viewing the memory-mapped file. The file cannot be closed while the array is in use.
+        """
+        if np is None:
+            raise ImportError(
+                "Viewing files as arrays requires numpy, which can be installed with "
+                "'pip install gwlab-viterbi-python[numpy]'"
+            )
+        return np.frombuffer(self.mmap, dtype=dtype, count=count, offset=offset)
+
+    def read(self):
+        """Read the whole file into memory
+
+        Returns
+        -------
+        bytes
+            Contents of the file
+        """
+        return bytes(self.mmap)
+
+    def close(self):
+        """Close the memory map, if the file has been opened. It is opened again if its contents are accessed."""
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._mmap = None
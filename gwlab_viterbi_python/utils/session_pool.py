@@ -0,0 +1,56 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class _TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout to requests that do not give their own"""
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=self.timeout if timeout is None else timeout, **kwargs)
+
+
+class SessionPool:
+    """Provides one keep-alive :class:`requests.Session` per thread, all of which share a single connection pool.
+    This lets download threads reuse open connections to the file download server, rather than paying for a fresh
+    TCP and TLS handshake for every file.
+
+    Parameters
+    ----------
+    pool_size : int, optional
+        Maximum number of connections kept open to each host, which should match the number of download threads,
+        by default 20
+    timeout : float or tuple, optional
+        Seconds to wait for a connection to be made and for data to arrive, either as a single number or as a
+        (connect, read) tuple, by default None (wait forever)
+    """
+
+    def __init__(self, pool_size=20, timeout=None):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._adapter = _TimeoutHTTPAdapter(timeout=timeout, pool_connections=1, pool_maxsize=pool_size)
+        self._local = threading.local()
+
+    def get_session(self):
+        """Get the session belonging to the calling thread, creating it if necessary
+
+        Returns
+        -------
+        requests.Session
+            Session that uses the shared connection pool
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+            self._local.session = session
+        return session
+
+    def close(self):
+        """Close all connections held by the pool"""
+        self._adapter.close()
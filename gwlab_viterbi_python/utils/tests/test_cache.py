@@ -0,0 +1,61 @@
+import pytest
+from gwlab_viterbi_python.utils.cache import TTLCache
+
+
+@pytest.fixture
+def mock_time(mocker):
+    return mocker.patch('gwlab_viterbi_python.utils.cache.time.monotonic', return_value=0)
+
+
+def test_cache_get_set(mock_time):
+    cache = TTLCache(max_size=2, ttl=10)
+    assert cache.get('key') is None
+    assert cache.get('key', 'default') == 'default'
+
+    cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+    assert 'key' in cache
+    assert len(cache) == 1
+
+
+def test_cache_ttl(mock_time):
+    cache = TTLCache(ttl=10)
+    cache.set('key', 'value')
+    cache.set('short', 'value', ttl=1)
+    cache.set('forever', 'value', ttl=None)
+
+    mock_time.return_value = 5
+    assert 'key' in cache
+    assert 'short' not in cache
+    assert 'forever' in cache
+
+    mock_time.return_value = 1e9
+    assert 'key' not in cache
+    assert 'forever' in cache
+    assert len(cache) == 1
+
+
+def test_cache_lru(mock_time):
+    cache = TTLCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+
+    cache.set('c', 3)
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+
+
+def test_cache_invalidate(mock_time):
+    cache = TTLCache()
+    cache.set('a', 1)
+    cache.set('b', 2)
+
+    cache.invalidate('a')
+    cache.invalidate('missing')
+    assert 'a' not in cache
+    assert 'b' in cache
+
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,214 @@
+import warnings
+
+import pytest
+from gwdc_python.files import FileReference
+
+from gwlab_viterbi_python.inputs import SearchParametersInput
+from gwlab_viterbi_python.utils.candidates import (
+    CANDIDATES_FIELDS,
+    get_candidates_dtype,
+    parse_candidates,
+    load_candidates,
+    iter_candidates,
+    CandidatesSelector,
+    _CandidatesAggregator,
+    _concatenate_candidates
+)
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def candidates_content():
+    return b'0.5 1 -10.5 2.5e1\n0.75\t2 -9.25 30\n\n1.0 3 nan -inf  \n'
+
+
+def test_candidates_dtype():
+    assert get_candidates_dtype().names == CANDIDATES_FIELDS
+
+
+@pytest.mark.parametrize('convert', [bytes, bytearray, lambda content: content.decode()])
+def test_parse_candidates(candidates_content, convert):
+    candidates = parse_candidates(convert(candidates_content))
+
+    assert candidates.dtype == get_candidates_dtype()
+    assert candidates.shape == (3,)
+    np.testing.assert_array_equal(candidates['a0'], [0.5, 0.75, 1.0])
+    np.testing.assert_array_equal(candidates['phase'], [1, 2, 3])
+    np.testing.assert_array_equal(candidates['log_likelihood'], [-10.5, -9.25, np.nan])
+    np.testing.assert_array_equal(candidates['score'], [25, 30, -np.inf])
+
+
+@pytest.mark.parametrize('content', [b'', b'\n', b' \n\t\n'])
+def test_parse_candidates_empty(content):
+    assert parse_candidates(content).shape == (0,)
+
+
+def test_parse_candidates_incomplete_row():
+    with pytest.raises(ValueError):
+        parse_candidates(b'1 2 3 4\n5 6 7\n')
+
+
+def test_parse_candidates_invalid_value(tmp_path):
+    content = b'# a0 phase\n1 2 3 4\n'
+    with pytest.raises(ValueError):
+        parse_candidates(content)
+
+    file_path = tmp_path / 'results_a0_phase_loglikes_scores.dat'
+    file_path.write_bytes(content)
+    with pytest.raises(ValueError):
+        load_candidates(file_path)
+
+
+@pytest.mark.parametrize('parse', ['fromstring', 'fromfile'])
+def test_parse_candidates_invalid_value_warning(tmp_path, mocker, parse):
+    # Older versions of NumPy warn about values they cannot parse, and return the values before them
+    def parse_with_warning(*args, **kwargs):
+        warnings.warn('string or file could not be read to its end due to unmatched data', DeprecationWarning)
+        return np.array([1.0, 2.0, 3.0, 4.0])
+
+    mocker.patch.object(np, parse, side_effect=parse_with_warning)
+    file_path = tmp_path / 'results_a0_phase_loglikes_scores.dat'
+    file_path.write_bytes(b'1 2 3 4\n5 6 7 x\n')
+
+    with pytest.raises(ValueError):
+        load_candidates(file_path)
+
+
+def test_load_candidates(tmp_path, candidates_content):
+    file_path = tmp_path / 'results_a0_phase_loglikes_scores.dat'
+    file_path.write_bytes(candidates_content)
+
+    candidates = load_candidates(file_path)
+    expected = parse_candidates(candidates_content)
+    for field in CANDIDATES_FIELDS:
+        np.testing.assert_array_equal(candidates[field], expected[field])
+
+
+@pytest.mark.parametrize('content', [b'', b'\n\n'])
+def test_load_candidates_empty(tmp_path, content):
+    file_path = tmp_path / 'results_a0_phase_loglikes_scores.dat'
+    file_path.write_bytes(content)
+
+    assert load_candidates(file_path).shape == (0,)
+
+
+def test_concatenate_candidates():
+    assert _concatenate_candidates([]).dtype == get_candidates_dtype()
+
+    candidates = _concatenate_candidates([parse_candidates(b'1 2 3 4'), parse_candidates(b'5 6 7 8')])
+    np.testing.assert_array_equal(candidates['a0'], [1, 5])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+@pytest.mark.parametrize('batch_size', [1, 16, 1024])
+def test_iter_candidates(candidates_content, chunk_size, batch_size):
+    chunks = [candidates_content[i:i + chunk_size] for i in range(0, len(candidates_content), chunk_size)]
+
+    candidates = _concatenate_candidates(list(iter_candidates(chunks, batch_size=batch_size)))
+    expected = parse_candidates(candidates_content)
+    for field in CANDIDATES_FIELDS:
+        np.testing.assert_array_equal(candidates[field], expected[field])
+
+
+def test_iter_candidates_no_trailing_newline():
+    candidates = list(iter_candidates([b'1 2 3 4\n5 6', b' 7 8'], batch_size=1))
+    assert [len(c) for c in candidates] == [1, 1]
+    assert candidates[1]['score'] == 8
+
+
+@pytest.fixture
+def candidates_batches():
+    values = np.arange(40, dtype=np.float64)
+    np.random.default_rng(0).shuffle(values)
+    return [
+        parse_candidates(' '.join(f'0 0 {value} {-value}' for value in batch))
+        for batch in np.split(values, 4)
+    ]
+
+
+def test_candidates_selector_threshold(candidates_batches):
+    selector = CandidatesSelector(threshold=30)
+    for batch in candidates_batches:
+        selector.add(batch)
+
+    np.testing.assert_array_equal(np.sort(selector.result()['log_likelihood']), np.arange(30, 40))
+
+
+def test_candidates_selector_string_threshold(candidates_batches):
+    # SearchParametersInput.search_l_l_threshold is a string, and can be used directly as the threshold
+    search_params = SearchParametersInput(search_l_l_threshold='36.5')
+    selector = CandidatesSelector(threshold=search_params.search_l_l_threshold)
+    for batch in candidates_batches:
+        selector.add(batch)
+
+    assert selector.threshold == 36.5
+    np.testing.assert_array_equal(np.sort(selector.result()['log_likelihood']), [37, 38, 39])
+
+
+def test_candidates_selector_top_k(candidates_batches):
+    selector = CandidatesSelector(top_k=5, field='score')
+    for batch in candidates_batches:
+        selector.add(batch)
+        assert sum(len(selected) for selected in selector._selected) <= 5
+
+    np.testing.assert_array_equal(selector.result()['score'], [0, -1, -2, -3, -4])
+
+
+def test_candidates_selector_threshold_and_top_k(candidates_batches):
+    selector = CandidatesSelector(threshold=37, top_k=5)
+    for batch in candidates_batches:
+        selector.add(batch)
+
+    np.testing.assert_array_equal(selector.result()['log_likelihood'], [39, 38, 37])
+
+
+def test_candidates_selector_empty():
+    assert CandidatesSelector(top_k=5).result().shape == (0,)
+
+
+@pytest.fixture
+def mock_file_chunks(mocker):
+    file_contents = {
+        'file_1': b'1 0 10 -1\n2 0 40 -2\n',
+        'file_2': b'3 0 20 -3\n',
+        'file_3': b'4 0 30 -4\n5 0 5 -5\n',
+    }
+    return mocker.patch(
+        'gwlab_viterbi_python.utils.candidates._iter_file_chunks',
+        side_effect=lambda file_id, file_path, file_size, progress_bar, session: iter([file_contents[file_id]])
+    )
+
+
+def make_file_ref(job_id):
+    return FileReference(path='results_a0_phase_loglikes_scores.dat', file_size=1, download_token='token',
+                         job_id=job_id)
+
+
+def test_candidates_aggregator(mock_file_chunks):
+    aggregator = _CandidatesAggregator(['job_1', 'job_long_2'], threshold=10)
+    aggregator.map_fn('file_3', make_file_ref('job_long_2'))
+    aggregator.map_fn('file_1', make_file_ref('job_1'))
+    aggregator.map_fn('file_2', make_file_ref('job_1'))
+
+    candidates = aggregator.result()
+    assert candidates.dtype.names == CANDIDATES_FIELDS + ('job_id',)
+    np.testing.assert_array_equal(candidates['a0'], [1, 2, 3, 4])
+    np.testing.assert_array_equal(candidates['job_id'], ['job_1', 'job_1', 'job_1', 'job_long_2'])
+
+
+def test_candidates_aggregator_top_k(mock_file_chunks):
+    aggregator = _CandidatesAggregator(['job_1', 'job_2'], top_k=3)
+    aggregator.map_fn('file_1', make_file_ref('job_1'))
+    aggregator.map_fn('file_2', make_file_ref('job_1'))
+    aggregator.map_fn('file_3', make_file_ref('job_2'))
+
+    candidates = aggregator.result()
+    np.testing.assert_array_equal(candidates['log_likelihood'], [40, 30, 20])
+    np.testing.assert_array_equal(candidates['job_id'], ['job_1', 'job_2', 'job_1'])
+
+
+def test_candidates_aggregator_empty():
+    candidates = _CandidatesAggregator([]).result()
+    assert candidates.shape == (0,)
+    assert candidates.dtype.names == CANDIDATES_FIELDS + ('job_id',)
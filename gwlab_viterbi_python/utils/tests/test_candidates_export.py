@@ -0,0 +1,90 @@
+import pytest
+from dataclasses import asdict
+
+from gwlab_viterbi_python import DataParametersInput, SearchParametersInput
+from gwlab_viterbi_python.utils.candidates import parse_candidates
+from gwlab_viterbi_python.utils.candidates_export import export_candidates, load_exported_candidates
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def candidates():
+    candidates = parse_candidates(b'1 2 3 4\n5 6 7 8\n9 10 11 12\n')
+    tagged = np.empty(len(candidates), dtype=candidates.dtype.descr + [('job_id', 'U8')])
+    for field in candidates.dtype.names:
+        tagged[field] = candidates[field]
+    tagged['job_id'] = ['id1', 'id1', 'id2']
+    return tagged
+
+
+def check_round_trip(file_path, candidates, compress):
+    data_params = DataParametersInput(start_frequency_band='200.0')
+    search_params = SearchParametersInput(search_l_l_threshold='100')
+
+    export_candidates(file_path, candidates, data_params, search_params, compress=compress)
+    loaded, metadata = load_exported_candidates(file_path)
+
+    assert loaded.dtype.names == candidates.dtype.names
+    for field in candidates.dtype.names:
+        np.testing.assert_array_equal(loaded[field], candidates[field])
+
+    assert metadata == {
+        'data_parameters': asdict(data_params),
+        'search_parameters': asdict(search_params),
+    }
+
+
+@pytest.mark.parametrize('compress', [True, False])
+def test_export_candidates_npz(tmp_path, candidates, compress):
+    check_round_trip(tmp_path / 'candidates.npz', candidates, compress)
+
+
+@pytest.mark.parametrize('suffix', ['.feather', '.arrow', '.parquet'])
+@pytest.mark.parametrize('compress', [True, False, None])
+def test_export_candidates_arrow(tmp_path, candidates, suffix, compress):
+    pytest.importorskip('pyarrow')
+    check_round_trip(tmp_path / f'candidates{suffix}', candidates, compress)
+
+
+@pytest.mark.parametrize('suffix', ['.feather', '.arrow'])
+def test_load_exported_candidates_columns(tmp_path, candidates, suffix):
+    pytest.importorskip('pyarrow')
+    file_path = tmp_path / f'candidates{suffix}'
+    candidates = np.tile(candidates, 100)
+
+    # Arrow files are uncompressed by default, so that their columns can be viewed without copying
+    export_candidates(file_path, candidates, compress=True)
+    assert candidates['a0'].tobytes() not in file_path.read_bytes()
+    export_candidates(file_path, candidates)
+    assert candidates['a0'].tobytes() in file_path.read_bytes()
+
+    columns, _ = load_exported_candidates(file_path, structured=False)
+    assert list(columns) == list(candidates.dtype.names)
+    for field in candidates.dtype.names:
+        np.testing.assert_array_equal(columns[field], candidates[field])
+    assert not columns['a0'].flags.writeable
+
+
+def test_load_exported_candidates_columns_npz(tmp_path, candidates):
+    export_candidates(tmp_path / 'candidates.npz', candidates)
+    columns, _ = load_exported_candidates(tmp_path / 'candidates.npz', structured=False)
+
+    assert sorted(columns) == sorted(candidates.dtype.names)
+    np.testing.assert_array_equal(columns['job_id'], candidates['job_id'])
+
+
+def test_export_candidates_no_metadata(tmp_path):
+    export_candidates(tmp_path / 'candidates.npz', parse_candidates(b''))
+    loaded, metadata = load_exported_candidates(tmp_path / 'candidates.npz')
+
+    assert loaded.shape == (0,)
+    assert metadata == {'data_parameters': None, 'search_parameters': None}
+
+
+def test_export_candidates_bad_suffix(tmp_path, candidates):
+    with pytest.raises(ValueError):
+        export_candidates(tmp_path / 'candidates.csv', candidates)
+
+    with pytest.raises(ValueError):
+        load_exported_candidates(tmp_path / 'candidates.csv')
@@ -0,0 +1,302 @@
+import threading
+import time
+import pytest
+import requests
+from gwlab_viterbi_python.exceptions import GWLabDownloadError, GWLabFileIntegrityError
+from gwlab_viterbi_python.settings import GWLAB_FILE_DOWNLOAD_ENDPOINT
+from gwlab_viterbi_python.utils.download_scheduler import DownloadScheduler, _MemoryBudget, _RateLimiter
+from gwlab_viterbi_python.utils.file_download import _resume_file_map_fn
+
+
+def http_error(status_code, headers={}):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers)
+    return requests.HTTPError(response=response)
+
+
+@pytest.fixture
+def mock_sleep(mocker):
+    return mocker.patch('gwlab_viterbi_python.utils.download_scheduler.time.sleep')
+
+
+@pytest.fixture
+def mock_uniform(mocker):
+    # Removes the jitter, so that each retry waits for the full backoff
+    return mocker.patch(
+        'gwlab_viterbi_python.utils.download_scheduler.random.uniform',
+        side_effect=lambda low, high: high
+    )
+
+
+def test_scheduler_largest_first(mocker):
+    order = []
+
+    def map_fn(file_id, file_path, file_size, progress_bar, session):
+        order.append(file_id)
+        return file_path
+
+    scheduler = DownloadScheduler(map_fn, max_workers=1, session_pool=mocker.Mock())
+    with scheduler._condition:
+        # Hold the lock so that the worker can't start until every file is queued
+        for index, size in enumerate([10, 1000, 1, 100]):
+            scheduler._pending += 1
+            scheduler._push((index, f'id_{size}', f'path_{index}', size, 0, None))
+
+    assert scheduler.join().results == ['path_0', 'path_1', 'path_2', 'path_3']
+    assert order == ['id_1000', 'id_100', 'id_10', 'id_1']
+
+
+def test_scheduler_retry(mocker, mock_sleep, mock_uniform):
+    attempts = []
+
+    def map_fn(file_id, file_path, file_size, progress_bar, session):
+        attempts.append(file_id)
+        if len(attempts) == 1:
+            raise http_error(429, {'Retry-After': '3'})
+        if len(attempts) == 2:
+            raise http_error(503)
+        return file_path
+
+    scheduler = DownloadScheduler(map_fn, max_workers=8, session_pool=mocker.Mock())
+    assert scheduler.concurrency == 2
+    scheduler.submit(0, 'id', 'path', 1)
+
+    assert scheduler.join().results == ['path']
+    assert attempts == ['id', 'id', 'id']
+    assert mock_sleep.call_args_list == [mocker.call(3.0), mocker.call(2.0)]
+    mock_uniform.assert_called_once_with(1.0, 2.0)
+    assert scheduler.concurrency == 1
+
+
+def test_scheduler_retry_timeout(mocker, mock_sleep):
+    map_fn = mocker.Mock(side_effect=[requests.ReadTimeout(), requests.ConnectTimeout(), 'result'])
+
+    scheduler = DownloadScheduler(map_fn, max_workers=1, session_pool=mocker.Mock())
+    scheduler.submit(0, 'id', 'path', 1)
+
+    assert scheduler.join().results == ['result']
+    assert map_fn.call_count == 3
+
+
+def test_scheduler_retry_limit(mocker, mock_sleep):
+    map_fn = mocker.Mock(side_effect=http_error(500))
+
+    scheduler = DownloadScheduler(map_fn, max_workers=1, session_pool=mocker.Mock(), max_retries=2)
+    scheduler.submit(0, 'id', 'path', 1)
+
+    report = scheduler.join()
+    assert not report.ok
+    assert report.failed == [('path', map_fn.side_effect)]
+    assert map_fn.call_count == 3
+
+
+def test_scheduler_backoff(mocker, mock_sleep, mock_uniform):
+    map_fn = mocker.Mock(side_effect=requests.ConnectionError())
+
+    scheduler = DownloadScheduler(
+        map_fn, max_workers=1, session_pool=mocker.Mock(), max_retries=4, backoff_factor=2, max_backoff=10
+    )
+    scheduler.submit(0, 'id', 'path', 1)
+
+    assert len(scheduler.join().failed) == 1
+    assert mock_sleep.call_args_list == [mocker.call(2.0), mocker.call(4.0), mocker.call(8.0), mocker.call(10.0)]
+
+
+def test_scheduler_refresh_expired_id(mocker, mock_sleep):
+    def map_fn(file_id, file_path, file_size, progress_bar, session):
+        if file_id == 'expired_id':
+            raise http_error(404)
+        return file_id
+
+    refresh_file_id = mocker.Mock(return_value='new_id')
+
+    scheduler = DownloadScheduler(map_fn, max_workers=1, session_pool=mocker.Mock())
+    scheduler.submit(0, 'expired_id', 'path', 1, refresh_file_id)
+
+    assert scheduler.join().results == ['new_id']
+    refresh_file_id.assert_called_once()
+    mock_sleep.assert_not_called()
+
+    # Without a way to refresh the id, the file fails straight away
+    scheduler = DownloadScheduler(map_fn, max_workers=1, session_pool=mocker.Mock())
+    scheduler.submit(0, 'expired_id', 'path', 1)
+
+    assert [file_path for file_path, _ in scheduler.join().failed] == ['path']
+
+
+def test_scheduler_retry_incomplete_file(mocker, mock_sleep, mock_uniform):
+    map_fn = mocker.Mock(side_effect=[GWLabFileIntegrityError('path', 10, 5), 'path'])
+
+    scheduler = DownloadScheduler(map_fn, max_workers=1, session_pool=mocker.Mock())
+    scheduler.submit(0, 'id', 'path', 10)
+
+    assert scheduler.join().results == ['path']
+    assert map_fn.call_count == 2
+    mock_sleep.assert_called_once_with(1.0)
+
+    map_fn = mocker.Mock(side_effect=GWLabFileIntegrityError('path', 10, 5))
+
+    scheduler = DownloadScheduler(map_fn, max_workers=1, session_pool=mocker.Mock(), max_retries=2)
+    scheduler.submit(0, 'id', 'path', 10)
+
+    report = scheduler.join()
+    assert isinstance(report.failed[0][1], GWLabFileIntegrityError)
+    assert map_fn.call_count == 3
+
+
+def test_scheduler_error(mocker):
+    def map_fn(file_id, file_path, file_size, progress_bar, session):
+        if file_id == 'bad_id':
+            raise requests.HTTPError(response=None)
+        return file_path
+
+    map_fn = mocker.Mock(side_effect=map_fn)
+
+    scheduler = DownloadScheduler(map_fn, max_workers=4, session_pool=mocker.Mock())
+    scheduler.submit(0, 'id_1', 'path_1', 1)
+    scheduler.submit(1, 'bad_id', 'path_2', 1)
+    scheduler.submit(2, 'id_3', 'path_3', 1)
+
+    report = scheduler.join()
+    assert map_fn.call_count == 3
+    assert report.results == ['path_1', 'path_3']
+    assert report.succeeded == ['path_1', 'path_3']
+    assert [file_path for file_path, _ in report.failed] == ['path_2']
+    assert len(report) == 3
+
+    with pytest.raises(GWLabDownloadError, match="1 of 3 files failed to download"):
+        report.raise_for_failures()
+
+    with pytest.raises(RuntimeError):
+        scheduler.submit(3, 'id_4', 'path_4', 1)
+
+
+def test_scheduler_cancel(mocker):
+    started = threading.Event()
+    release = threading.Event()
+
+    def map_fn(file_id, file_path, file_size, progress_bar, session):
+        started.set()
+        release.wait()
+        return file_path
+
+    map_fn = mocker.Mock(side_effect=map_fn)
+
+    scheduler = DownloadScheduler(map_fn, max_workers=2, session_pool=mocker.Mock())
+    scheduler.concurrency = 1
+    for index in range(3):
+        scheduler.submit(index, f'id_{index}', f'path_{index}', 1)
+    started.wait()
+
+    canceller = threading.Thread(target=scheduler.cancel)
+    canceller.start()
+    while not scheduler._cancelled:
+        time.sleep(0.01)
+    release.set()
+    canceller.join()
+
+    # The file that was being downloaded is finished, but the queued files are never started
+    assert map_fn.call_count == 1
+    assert not any(thread.is_alive() for thread in scheduler._threads)
+
+    with pytest.raises(RuntimeError):
+        scheduler.submit(3, 'id_3', 'path_3', 1)
+
+
+def test_scheduler_tuning(mocker):
+    mock_time = mocker.patch('gwlab_viterbi_python.utils.download_scheduler.time.monotonic', return_value=0)
+    scheduler = DownloadScheduler(mocker.Mock(), max_workers=16, session_pool=mocker.Mock(), tuning_interval=1)
+    assert scheduler.concurrency == 4
+
+    # Throughput increases, so concurrency doubles until it stops increasing
+    for second, concurrency in [(1, 8), (2, 16)]:
+        mock_time.return_value = second
+        scheduler.update(1000 * second)
+        assert scheduler.concurrency == concurrency
+
+    # Throughput decreases, so concurrency is lowered one at a time
+    for second, concurrency in [(3, 15), (4, 14)]:
+        mock_time.return_value = second
+        scheduler.update(100 // second)
+        assert scheduler.concurrency == concurrency
+
+    # Throughput increases again, but concurrency is now only raised one at a time
+    mock_time.return_value = 5
+    scheduler.update(1000)
+    assert scheduler.concurrency == 15
+
+    scheduler.join()
+
+
+def test_scheduler_progress_bar(mocker):
+    mock_progress = mocker.Mock()
+    scheduler = DownloadScheduler(mocker.Mock(), max_workers=1, session_pool=mocker.Mock(), progress_bar=mock_progress)
+    scheduler.update(10)
+    mock_progress.update.assert_called_once_with(10)
+    scheduler.join()
+
+
+def test_scheduler_progress_bar_retry(mocker, mock_sleep):
+    mock_progress = mocker.Mock()
+    attempts = []
+
+    def map_fn(file_id, file_path, file_size, progress_bar, session):
+        attempts.append(file_id)
+        if len(attempts) == 1:
+            progress_bar.update(5)
+            raise requests.ConnectionError()
+        # The retry resumes from the 5 bytes received by the first attempt
+        progress_bar.skip(5)
+        progress_bar.update(12)
+        return file_path
+
+    scheduler = DownloadScheduler(map_fn, max_workers=1, session_pool=mocker.Mock(), progress_bar=mock_progress)
+    scheduler.submit(0, 'id', 'path', 17)
+
+    assert scheduler.join().results == ['path']
+    assert sum(call.args[0] for call in mock_progress.update.call_args_list) == 17
+
+
+def test_scheduler_resume_bandwidth_limit(tmp_path, requests_mock, mocker):
+    mock_consume = mocker.patch.object(_RateLimiter, 'consume')
+    mock_progress = mocker.Mock()
+    test_content = b'Test file content' * 100
+    file_path = tmp_path / 'test_path'
+    (tmp_path / 'test_path.part').write_bytes(test_content[:-10])
+    requests_mock.get(GWLAB_FILE_DOWNLOAD_ENDPOINT + 'id', content=test_content[-10:], status_code=206)
+
+    scheduler = DownloadScheduler(_resume_file_map_fn, max_workers=1, bandwidth_limit=100, progress_bar=mock_progress)
+    scheduler.submit(0, 'id', file_path, len(test_content))
+
+    assert scheduler.join().ok
+    assert file_path.read_bytes() == test_content
+    # Only the bytes that were downloaded count towards the bandwidth limit and throughput
+    assert sum(call.args[0] for call in mock_consume.call_args_list) == 10
+    assert scheduler._bytes == 10
+    assert sum(call.args[0] for call in mock_progress.update.call_args_list) == len(test_content)
+
+
+def test_rate_limiter(mocker, mock_sleep):
+    mocker.patch('gwlab_viterbi_python.utils.download_scheduler.time.monotonic', return_value=0)
+    limiter = _RateLimiter(rate=100)
+
+    limiter.consume(50)
+    mock_sleep.assert_called_with(0.5)
+    limiter.consume(100)
+    mock_sleep.assert_called_with(1.5)
+
+
+def test_memory_budget():
+    budget = _MemoryBudget(100, max_workers=2)
+
+    # Files larger than the share of each worker are never given memory
+    assert not budget.try_reserve(51)
+    assert budget.try_reserve(50)
+    assert budget.try_reserve(40)
+    assert not budget.try_reserve(20)
+    assert budget.in_use == 90
+
+    budget.release(40)
+    assert budget.try_reserve(20)
+    assert budget.in_use == 70
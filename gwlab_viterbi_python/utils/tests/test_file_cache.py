@@ -0,0 +1,128 @@
+import mmap
+import os
+
+import pytest
+from gwdc_python.files import FileReference
+
+from gwlab_viterbi_python.utils.file_cache import FileCache
+from gwlab_viterbi_python.utils.download_scheduler import _MemoryBudget
+
+
+def make_ref(path, file_size, job_id='id1'):
+    return FileReference(path=path, file_size=file_size, download_token='token', job_id=job_id)
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return tmp_path / 'cache'
+
+
+def test_file_cache_store_bytes(cache_dir):
+    cache = FileCache(cache_dir)
+    ref = make_ref('dir/file.txt', 4)
+
+    assert cache.get(ref) is None
+    assert cache.read(ref) is None
+
+    cache.store_bytes(ref, b'test')
+    assert cache.get(ref) == cache.get_cache_path(ref)
+    assert cache.read(ref) == bytearray(b'test')
+
+    # Files are identified by both job id and path
+    assert cache.read(make_ref('dir/file.txt', 4, job_id='id2')) is None
+
+
+def test_file_cache_read_memory_budget(cache_dir):
+    cache = FileCache(cache_dir)
+    refs = [make_ref('file_1.txt', 4), make_ref('file_2.txt', 4), make_ref('file_3.txt', 0)]
+    for ref in refs:
+        cache.store_bytes(ref, b'test'[:ref.file_size])
+
+    memory_budget = _MemoryBudget(6)
+    content_1 = cache.read(refs[0], memory_budget)
+    assert isinstance(content_1, bytearray)
+    assert memory_budget.in_use == 4
+
+    # Files that do not fit within the budget are memory-mapped, and remain readable after being evicted
+    content_2 = cache.read(refs[1], memory_budget)
+    assert isinstance(content_2, mmap.mmap)
+    assert memory_budget.in_use == 4
+    cache.clear()
+    assert content_2[:] == b'test'
+
+    # Nothing is reserved for files that are not cached
+    assert cache.read(refs[0], memory_budget) is None
+    assert memory_budget.in_use == 4
+
+
+def test_file_cache_size_mismatch(cache_dir):
+    cache = FileCache(cache_dir)
+    cache.store_bytes(make_ref('file.txt', 4), b'test')
+
+    assert cache.get(make_ref('file.txt', 5)) is None
+    assert cache.read(make_ref('file.txt', 3)) is None
+
+
+def test_file_cache_store_and_copy_file(cache_dir, tmp_path):
+    cache = FileCache(cache_dir)
+    ref = make_ref('file.txt', 4)
+
+    file_path = tmp_path / 'file.txt'
+    file_path.write_bytes(b'test')
+    cache.store_file(ref, file_path)
+    assert cache.read(ref) == bytearray(b'test')
+
+    output_path = tmp_path / 'output' / 'file.txt'
+    assert cache.copy_to(ref, output_path)
+    assert output_path.read_bytes() == b'test'
+
+    assert not cache.copy_to(make_ref('other.txt', 4), tmp_path / 'output' / 'other.txt')
+    assert not (tmp_path / 'output' / 'other.txt').exists()
+
+
+def test_file_cache_eviction(cache_dir):
+    cache = FileCache(cache_dir, max_bytes=14)
+    refs = [make_ref(f'file{i}.txt', 4) for i in range(3)]
+
+    for i, ref in enumerate(refs):
+        cache.store_bytes(ref, b'test')
+        os.utime(cache.get_cache_path(ref), (i, i))
+
+    # The first file is used, so the second file is now the least recently used
+    assert cache.get(refs[0]) is not None
+    cache.store_bytes(make_ref('file3.txt', 4), b'test')
+
+    assert cache.get(refs[0]) is not None
+    assert cache.get(refs[1]) is None
+    assert cache.get(refs[2]) is not None
+    assert cache.get(make_ref('file3.txt', 4)) is not None
+
+
+def test_file_cache_eviction_low_water_mark(cache_dir, mocker):
+    cache = FileCache(cache_dir, max_bytes=40)
+    for i in range(10):
+        cache.store_bytes(make_ref(f'file{i}.txt', 4), b'test')
+
+    # Storing another file takes the cache over its budget, so files are removed until it is a tenth below it
+    mock_scan = mocker.spy(cache, '_scan')
+    cache.store_bytes(make_ref('file10.txt', 4), b'test')
+    assert mock_scan.call_count == 1
+    assert cache._total_bytes == 36
+
+    # The next file fits within the budget again, so the cache is not scanned
+    cache.store_bytes(make_ref('file11.txt', 4), b'test')
+    assert mock_scan.call_count == 1
+    assert cache._total_bytes == 40
+
+
+def test_file_cache_existing_directory(cache_dir):
+    FileCache(cache_dir).store_bytes(make_ref('file.txt', 4), b'test')
+
+    cache = FileCache(cache_dir, max_bytes=10)
+    assert cache.read(make_ref('file.txt', 4)) == bytearray(b'test')
+
+    cache.store_bytes(make_ref('other.txt', 8), b'testtest')
+    assert cache.get(make_ref('file.txt', 4)) is None
+
+    cache.clear()
+    assert cache.get(make_ref('other.txt', 8)) is None
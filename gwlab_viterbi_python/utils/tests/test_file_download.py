@@ -1,10 +1,20 @@
 from gwlab_viterbi_python.utils.file_download import (
     _download_files,
     _get_file_map_fn,
-    _save_file_map_fn
+    _save_file_map_fn,
+    _resume_file_map_fn,
+    _iter_files,
+    _iter_file_streams,
+    _iter_in_background
 )
+from gwlab_viterbi_python.utils.download_scheduler import _MemoryBudget
+from gwlab_viterbi_python.exceptions import GWLabFileIntegrityError
 from gwlab_viterbi_python.settings import GWLAB_FILE_DOWNLOAD_ENDPOINT
+import mmap
+import os
 import pytest
+import requests
+import threading
 from tempfile import TemporaryFile, TemporaryDirectory
 from pathlib import Path
 
@@ -29,6 +39,11 @@ def test_file_paths():
     ]
 
 
+@pytest.fixture
+def test_file_sizes():
+    return [1, 10, 100, 1000]
+
+
 @pytest.fixture
 def setup_file_download(requests_mock):
     def mock_file_download(test_id, test_path, test_content):
@@ -40,17 +55,97 @@ def setup_file_download(requests_mock):
     return mock_file_download
 
 
-def test_download_files(mocker, test_file_ids, test_file_paths):
-    mock_map_fn = mocker.Mock()
+def test_download_files(mocker, test_file_ids, test_file_paths, test_file_sizes):
+    mock_map_fn = mocker.Mock(side_effect=lambda file_id, *args, **kwargs: file_id)
     mock_progress = mocker.patch('gwlab_viterbi_python.utils.file_download.tqdm')
+    mock_session_pool = mocker.Mock()
+
+    file_batches = [
+        (lambda: test_file_ids[:1], test_file_paths[:1], test_file_sizes[:1]),
+        (lambda: test_file_ids[1:], test_file_paths[1:], test_file_sizes[1:]),
+    ]
 
-    _download_files(mock_map_fn, test_file_ids, test_file_paths, 100)
+    report = _download_files(mock_map_fn, file_batches, mock_session_pool)
     mock_calls = [
-        mocker.call(test_id, test_path, progress_bar=mock_progress())
-        for test_id, test_path in zip(test_file_ids, test_file_paths)
+        mocker.call(
+            test_id,
+            test_path,
+            test_size,
+            progress_bar=mocker.ANY,
+            session=mock_session_pool.get_session()
+        )
+        for test_id, test_path, test_size in zip(test_file_ids, test_file_paths, test_file_sizes)
+    ]
+
+    mock_map_fn.assert_has_calls(mock_calls, any_order=True)
+    assert report.results == test_file_ids
+    assert report.ok
+    mock_progress.assert_called_once_with(total=sum(test_file_sizes), leave=True, unit='B', unit_scale=True)
+    mock_progress().close.assert_called_once()
+
+
+def test_download_files_overlap(mocker, test_file_ids, test_file_paths, test_file_sizes):
+    mocker.patch('gwlab_viterbi_python.utils.file_download.tqdm')
+    first_file_downloaded = threading.Event()
+
+    def map_fn(file_id, *args, **kwargs):
+        first_file_downloaded.set()
+        return file_id
+
+    def get_slow_file_ids():
+        # The second batch only gets its ids once the first batch has started downloading
+        assert first_file_downloaded.wait(timeout=5)
+        return test_file_ids[1:]
+
+    file_batches = [
+        (get_slow_file_ids, test_file_paths[1:], test_file_sizes[1:]),
+        (lambda: test_file_ids[:1], test_file_paths[:1], test_file_sizes[:1]),
     ]
 
-    mock_map_fn.assert_has_calls(mock_calls)
+    report = _download_files(map_fn, file_batches, mocker.Mock())
+    assert report.results == test_file_ids[1:] + test_file_ids[:1]
+
+
+def test_download_files_id_error(mocker, test_file_ids, test_file_paths, test_file_sizes):
+    mocker.patch('gwlab_viterbi_python.utils.file_download.tqdm')
+    mock_map_fn = mocker.Mock()
+
+    def get_file_ids():
+        raise ValueError('Bad token')
+
+    file_batches = [
+        (get_file_ids, test_file_paths[:1], test_file_sizes[:1]),
+        (lambda: test_file_ids[1:], test_file_paths[1:], test_file_sizes[1:]),
+    ]
+
+    report = _download_files(mock_map_fn, file_batches, mocker.Mock())
+
+    assert mock_map_fn.call_count == 3
+    assert report.succeeded == test_file_paths[1:]
+    assert [file_path for file_path, _ in report.failed] == test_file_paths[:1]
+    assert isinstance(report.failed[0][1], ValueError)
+
+
+def test_download_files_refresh_id(mocker, test_file_ids, test_file_paths, test_file_sizes):
+    mocker.patch('gwlab_viterbi_python.utils.file_download.tqdm')
+    expired_id = 'expired_id'
+
+    def map_fn(file_id, *args, **kwargs):
+        if file_id == expired_id:
+            response = requests.Response()
+            response.status_code = 403
+            raise requests.HTTPError(response=response)
+        return file_id
+
+    def get_file_ids(positions=None):
+        if positions is None:
+            return [expired_id] + test_file_ids[1:]
+        return [test_file_ids[position] for position in positions]
+
+    file_batches = [(get_file_ids, test_file_paths, test_file_sizes)]
+
+    report = _download_files(map_fn, file_batches, mocker.Mock())
+    assert report.results == test_file_ids
 
 
 def test_get_file_map_fn(setup_file_download, mocker):
@@ -67,6 +162,144 @@ def test_get_file_map_fn(setup_file_download, mocker):
     assert file_data == test_content
 
 
+@pytest.mark.parametrize('file_size', [None, 17])
+def test_get_file_map_fn_file_size(setup_file_download, mocker, file_size):
+    test_id = 'test_id'
+    test_path = 'test_path'
+    test_content = b'Test file content'
+    setup_file_download(test_id, test_path, test_content)
+    _, file_data = _get_file_map_fn(
+        file_id=test_id,
+        file_path=test_path,
+        file_size=file_size,
+        progress_bar=mocker.Mock(),
+    )
+
+    assert file_data == test_content
+
+
+@pytest.mark.parametrize('file_size, limit, in_memory', [(17, 100, True), (17, 10, False), (None, 100, False)])
+def test_get_file_map_fn_memory_budget(setup_file_download, mocker, file_size, limit, in_memory):
+    test_content = b'Test file content'
+    setup_file_download('test_id', 'test_path', test_content)
+    memory_budget = _MemoryBudget(limit)
+
+    _, file_data = _get_file_map_fn(
+        file_id='test_id',
+        file_path='test_path',
+        file_size=file_size,
+        progress_bar=mocker.Mock(),
+        memory_budget=memory_budget,
+    )
+
+    assert file_data[:] == test_content
+    assert isinstance(file_data, bytearray if in_memory else mmap.mmap)
+    assert memory_budget.in_use == (17 if in_memory else 0)
+
+
+def test_get_file_map_fn_memory_budget_release(setup_file_download, mocker):
+    setup_file_download('test_id', 'test_path', b'Test file content')
+    memory_budget = _MemoryBudget(100)
+
+    with pytest.raises(GWLabFileIntegrityError):
+        _get_file_map_fn('test_id', 'test_path', 20, progress_bar=mocker.Mock(), memory_budget=memory_budget)
+
+    assert memory_budget.in_use == 0
+
+
+@pytest.mark.parametrize('file_size', [0, 5, 100])
+def test_get_file_map_fn_wrong_size(setup_file_download, mocker, file_size):
+    setup_file_download('test_id', 'test_path', b'Test file content')
+
+    with pytest.raises(GWLabFileIntegrityError) as exc_info:
+        _get_file_map_fn(
+            file_id='test_id',
+            file_path='test_path',
+            file_size=file_size,
+            progress_bar=mocker.Mock(),
+        )
+
+    assert exc_info.value.expected_size == file_size
+    assert exc_info.value.received_size == 17
+
+
+def test_iter_files(setup_file_download, mocker):
+    mocker.patch('gwlab_viterbi_python.utils.file_download.tqdm')
+    test_content = b'Test file content' * 2048
+    setup_file_download('test_id_1', 'test_path_1', test_content)
+    setup_file_download('test_id_2', 'test_path_2', test_content[::-1])
+
+    file_sizes = [len(test_content)] * 2
+    chunks = list(_iter_files(['test_id_1', 'test_id_2'], ['test_path_1', 'test_path_2'], file_sizes))
+
+    assert len(chunks) > 2
+    assert b''.join(chunk for path, chunk in chunks if path == 'test_path_1') == test_content
+    assert b''.join(chunk for path, chunk in chunks if path == 'test_path_2') == test_content[::-1]
+
+
+def test_iter_files_truncated(setup_file_download, mocker):
+    mocker.patch('gwlab_viterbi_python.utils.file_download.tqdm')
+    setup_file_download('test_id', 'test_path', b'Test file content')
+
+    chunks = _iter_files(['test_id'], ['test_path'], [100])
+    with pytest.raises(GWLabFileIntegrityError) as exc_info:
+        list(chunks)
+    assert exc_info.value.file_path == 'test_path'
+
+
+def test_iter_file_streams(setup_file_download, mocker):
+    mocker.patch('gwlab_viterbi_python.utils.file_download.tqdm')
+    test_content = b'Test file content' * 2048
+    setup_file_download('test_id_1', 'test_path_1', test_content)
+    setup_file_download('test_id_2', 'test_path_2', test_content[::-1])
+
+    streams = _iter_file_streams(['test_id_1', 'test_id_2'], ['test_path_1', 'test_path_2'], [len(test_content)] * 2)
+
+    assert b''.join(next(streams)) == test_content
+    assert b''.join(next(streams)) == test_content[::-1]
+    with pytest.raises(StopIteration):
+        next(streams)
+
+
+def test_iter_in_background():
+    producer_threads = set()
+
+    def produce():
+        for i in range(100):
+            producer_threads.add(threading.current_thread())
+            yield i
+
+    assert list(_iter_in_background(produce(), max_queued=4)) == list(range(100))
+    assert producer_threads and threading.current_thread() not in producer_threads
+
+
+def test_iter_in_background_error():
+    def produce():
+        yield 1
+        raise ValueError('Download failed')
+
+    items = _iter_in_background(produce())
+    assert next(items) == 1
+    with pytest.raises(ValueError):
+        next(items)
+
+
+def test_iter_in_background_stop_early():
+    produced = []
+
+    def produce():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    items = _iter_in_background(produce(), max_queued=2)
+    assert next(items) == 0
+    items.close()
+
+    # The producer stops shortly after the consumer, rather than reading everything
+    assert len(produced) < 1000
+
+
 def test_save_file_map_fn(setup_file_download, mocker):
     with TemporaryDirectory() as tmp_dir:
         test_id = 'test_id'
@@ -82,3 +315,147 @@ def test_save_file_map_fn(setup_file_download, mocker):
         with open(test_path, 'rb') as f:
             file_data = f.read()
             assert file_data == test_content
+
+
+def test_save_file_map_fn_wrong_size(setup_file_download, mocker):
+    with TemporaryDirectory() as tmp_dir:
+        test_path = Path(tmp_dir) / 'test_path'
+        setup_file_download('test_id', test_path, b'Test file content')
+
+        with pytest.raises(GWLabFileIntegrityError):
+            _save_file_map_fn(file_id='test_id', file_path=test_path, file_size=100, progress_bar=mocker.Mock())
+
+        assert not test_path.exists()
+
+
+def test_save_file_map_fn_hardlinked_file(setup_file_download, mocker):
+    with TemporaryDirectory() as tmp_dir:
+        test_path = Path(tmp_dir) / 'test_path'
+        linked_path = Path(tmp_dir) / 'linked_path'
+        linked_path.write_bytes(b'GOOD')
+        os.link(linked_path, test_path)
+        setup_file_download('test_id', test_path, b'BA')
+
+        # Replacing a file, such as one linked from the file cache, does not change the other links to it
+        with pytest.raises(GWLabFileIntegrityError):
+            _save_file_map_fn(file_id='test_id', file_path=test_path, file_size=4, progress_bar=mocker.Mock())
+
+        assert linked_path.read_bytes() == b'GOOD'
+
+
+def test_resume_file_map_fn_truncated(requests_mock, mocker):
+    with TemporaryDirectory() as tmp_dir:
+        test_path = Path(tmp_dir) / 'test_path'
+        test_content = b'Test file content'
+        requests_mock.get(GWLAB_FILE_DOWNLOAD_ENDPOINT + 'test_id', content=test_content[:5])
+
+        with pytest.raises(GWLabFileIntegrityError):
+            _resume_file_map_fn(
+                file_id='test_id',
+                file_path=test_path,
+                file_size=len(test_content),
+                progress_bar=mocker.Mock(),
+            )
+
+        # The truncated file is kept so that the next attempt can continue from it
+        assert not test_path.exists()
+        assert (Path(tmp_dir) / 'test_path.part').read_bytes() == test_content[:5]
+
+        requests_mock.get(GWLAB_FILE_DOWNLOAD_ENDPOINT + 'test_id', content=test_content * 2)
+
+        with pytest.raises(GWLabFileIntegrityError):
+            _resume_file_map_fn(
+                file_id='test_id',
+                file_path=test_path,
+                file_size=len(test_content),
+                progress_bar=mocker.Mock(),
+            )
+
+        # A file that is too long cannot be continued from, so it is removed
+        assert not (Path(tmp_dir) / 'test_path.part').exists()
+
+
+def test_resume_file_map_fn_new_file(setup_file_download, mocker):
+    with TemporaryDirectory() as tmp_dir:
+        test_id = 'test_id'
+        test_path = Path(tmp_dir) / 'test_path'
+        test_content = b'Test file content'
+        setup_file_download(test_id, test_path, test_content)
+        _resume_file_map_fn(
+            file_id=test_id,
+            file_path=test_path,
+            file_size=len(test_content),
+            progress_bar=mocker.Mock(),
+        )
+
+        assert test_path.read_bytes() == test_content
+        assert not (Path(tmp_dir) / 'test_path.part').exists()
+
+
+def test_resume_file_map_fn_partial_file(requests_mock, mocker):
+    with TemporaryDirectory() as tmp_dir:
+        test_id = 'test_id'
+        test_path = Path(tmp_dir) / 'test_path'
+        test_content = b'Test file content'
+        (Path(tmp_dir) / 'test_path.part').write_bytes(test_content[:5])
+
+        mock_get = requests_mock.get(
+            GWLAB_FILE_DOWNLOAD_ENDPOINT + test_id,
+            content=test_content[5:],
+            status_code=206,
+            request_headers={'Range': 'bytes=5-'},
+        )
+        mock_progress = mocker.Mock()
+
+        _resume_file_map_fn(
+            file_id=test_id,
+            file_path=test_path,
+            file_size=len(test_content),
+            progress_bar=mock_progress,
+        )
+
+        assert mock_get.call_count == 1
+        assert test_path.read_bytes() == test_content
+        assert not (Path(tmp_dir) / 'test_path.part').exists()
+        # The bytes already on disk are skipped rather than counted as downloaded
+        mock_progress.skip.assert_called_once_with(5)
+        assert sum(call.args[0] for call in mock_progress.update.call_args_list) == len(test_content) - 5
+
+
+def test_resume_file_map_fn_range_ignored(requests_mock, mocker):
+    with TemporaryDirectory() as tmp_dir:
+        test_id = 'test_id'
+        test_path = Path(tmp_dir) / 'test_path'
+        test_content = b'Test file content'
+        (Path(tmp_dir) / 'test_path.part').write_bytes(b'Wrong')
+
+        requests_mock.get(GWLAB_FILE_DOWNLOAD_ENDPOINT + test_id, content=test_content, status_code=200)
+
+        _resume_file_map_fn(
+            file_id=test_id,
+            file_path=test_path,
+            file_size=len(test_content),
+            progress_bar=mocker.Mock(),
+        )
+
+        assert test_path.read_bytes() == test_content
+
+
+def test_resume_file_map_fn_complete_part_file(requests_mock, mocker):
+    with TemporaryDirectory() as tmp_dir:
+        test_id = 'test_id'
+        test_path = Path(tmp_dir) / 'test_path'
+        test_content = b'Test file content'
+        (Path(tmp_dir) / 'test_path.part').write_bytes(test_content)
+
+        mock_get = requests_mock.get(GWLAB_FILE_DOWNLOAD_ENDPOINT + test_id, content=test_content)
+
+        _resume_file_map_fn(
+            file_id=test_id,
+            file_path=test_path,
+            file_size=len(test_content),
+            progress_bar=mocker.Mock(),
+        )
+
+        assert mock_get.call_count == 0
+        assert test_path.read_bytes() == test_content
@@ -0,0 +1,31 @@
+import pytest
+
+from gwlab_viterbi_python.exceptions import GWLabSubmissionError
+from gwlab_viterbi_python.utils.job_submission import SubmissionReport
+
+
+def test_submission_report():
+    report = SubmissionReport()
+    error = ValueError('Invalid job')
+    report._add_success(2, 'job_2', 'id_2')
+    report._add_failure(1, 'job_1', error)
+    report._add_success(0, 'job_0', 'id_0')
+
+    assert len(report) == 3
+    assert report.job_ids == ['id_0', 'id_2']
+    assert report.succeeded == ['job_0', 'job_2']
+    assert report.failed == [('job_1', error)]
+    assert report.jobs is None
+    assert not report.ok
+
+    with pytest.raises(GWLabSubmissionError, match="1 of 3 jobs failed to submit") as exc_info:
+        report.raise_for_failures()
+    assert exc_info.value.report is report
+
+
+def test_submission_report_ok():
+    report = SubmissionReport()
+    report._add_success(0, 'job_0', 'id_0')
+
+    assert report.ok
+    report.raise_for_failures()
@@ -0,0 +1,56 @@
+import mmap
+
+import numpy as np
+import pytest
+
+from gwlab_viterbi_python.utils.lazy_file import LazyFile
+
+
+@pytest.fixture
+def test_file(tmp_path):
+    path = tmp_path / 'test_file.dat'
+    path.write_bytes(np.arange(4, dtype=np.float64).tobytes())
+    return path
+
+
+def test_lazy_file_opens_on_access(test_file):
+    lazy_file = LazyFile(test_file)
+
+    assert not lazy_file.is_open
+    assert len(lazy_file) == 32
+    assert not lazy_file.is_open
+
+    assert isinstance(lazy_file.mmap, mmap.mmap)
+    assert lazy_file.is_open
+    assert lazy_file.read() == test_file.read_bytes()
+
+    lazy_file.close()
+    assert not lazy_file.is_open
+    # The file is opened again when it is next accessed
+    assert lazy_file.memoryview()[:8] == test_file.read_bytes()[:8]
+
+
+def test_lazy_file_as_array(test_file):
+    with LazyFile(test_file) as lazy_file:
+        array = lazy_file.as_array(dtype=np.float64)
+        assert array.tolist() == [0, 1, 2, 3]
+        assert not array.flags.writeable
+
+        assert lazy_file.as_array(dtype=np.float64, offset=16, count=1).tolist() == [2]
+        del array
+
+
+def test_lazy_file_empty(tmp_path):
+    path = tmp_path / 'empty.dat'
+    path.write_bytes(b'')
+
+    lazy_file = LazyFile(path)
+    assert len(lazy_file) == 0
+    assert lazy_file.read() == b''
+    assert len(lazy_file.memoryview()) == 0
+    lazy_file.close()
+
+
+def test_lazy_file_keep_alive(test_file, mocker):
+    keep_alive = mocker.Mock()
+    assert LazyFile(test_file, keep_alive=keep_alive)._keep_alive is keep_alive
@@ -0,0 +1,48 @@
+import threading
+from gwlab_viterbi_python.utils.session_pool import SessionPool
+
+
+def test_session_pool_same_thread():
+    pool = SessionPool(pool_size=4)
+    assert pool.get_session() is pool.get_session()
+
+
+def test_session_pool_threads_share_adapter():
+    pool = SessionPool(pool_size=4)
+    sessions = []
+
+    def get_session():
+        sessions.append(pool.get_session())
+
+    threads = [threading.Thread(target=get_session) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(session) for session in sessions}) == 4
+    for session in sessions:
+        assert session.get_adapter('https://gwlab.org.au') is pool._adapter
+        assert session.get_adapter('http://gwlab.org.au') is pool._adapter
+
+    assert pool._adapter._pool_maxsize == 4
+
+
+def test_session_pool_download(requests_mock):
+    requests_mock.get('https://test.endpoint/file', content=b'Test file content')
+    pool = SessionPool()
+    assert pool.get_session().get('https://test.endpoint/file').content == b'Test file content'
+    pool.close()
+
+
+def test_session_pool_timeout(mocker):
+    mock_send = mocker.patch('requests.adapters.HTTPAdapter.send')
+    adapter = SessionPool(timeout=(5, 30)).get_session().get_adapter('https://test.endpoint/file')
+    request = mocker.Mock()
+
+    adapter.send(request)
+    mock_send.assert_called_with(request, timeout=(5, 30))
+
+    # A timeout given with the request takes precedence
+    adapter.send(request, timeout=1, stream=True)
+    mock_send.assert_called_with(request, timeout=1, stream=True)
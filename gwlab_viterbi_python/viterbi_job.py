@@ -1,4 +1,6 @@
 from .utils import file_filters
+from .utils.candidates import parse_candidates, _concatenate_candidates
+from .utils.candidates_export import export_candidates
 
 from gwdc_python.jobs import JobBase
 from gwdc_python.logger import create_logger
@@ -34,6 +36,76 @@ class ViterbiJob(JobBase):
         'candidates': file_filters.candidates_filter
     }
 
+    FINISHED_STATUSES = ('Completed', 'Error', 'Cancelled', 'Deleted', 'Wall Time Exceeded', 'Out of Memory')
+    """Names of the job statuses after which a job will not change"""
+
     def __init__(self, client, job_id, name, description, user, job_status, **kwargs):
         super().__init__(client, job_id, name, description, user, job_status)
         self.other = kwargs
+
+    @property
+    def is_finished(self):
+        """True if the job has reached a status after which it will not change, False otherwise"""
+        return self.status.status in self.FINISHED_STATUSES
+
+    def get_candidates(self):
+        """Download and parse the candidates files of this job. Requires the optional `numpy` dependency.
+
+        Returns
+        -------
+        numpy.ndarray
+            Structured array with 'a0', 'phase', 'log_likelihood' and 'score' fields, containing the candidates
+            from all of the candidates files of the job
+        """
+        return _concatenate_candidates([parse_candidates(content) for _, content in self.get_candidates_files()])
+
+    def filter_candidates(self, threshold=None, top_k=None, field='log_likelihood'):
+        """Stream the candidates files of this job, keeping only the candidates that pass a threshold and/or are
+        among the best `top_k`, without holding whole files in memory. Requires the optional `numpy` dependency.
+
+        Parameters
+        ----------
+        threshold : float or str, optional
+            Only keep candidates whose `field` is greater than or equal to this value, by default None (no threshold)
+        top_k : int, optional
+            Only keep the `top_k` candidates with the largest `field`, by default None (no limit)
+        field : str, optional
+            Name of the field to which the threshold and top k selection are applied, by default 'log_likelihood'
+
+        Returns
+        -------
+        numpy.ndarray
+            Structured array with 'a0', 'phase', 'log_likelihood' and 'score' fields, containing the selected
+            candidates
+        """
+        return self.client.filter_candidates(
+            self.get_candidates_file_list(), threshold=threshold, top_k=top_k, field=field
+        )
+
+    def export_candidates(self, file_path, data_params=None, search_params=None, threshold=None, top_k=None,
+                          field='log_likelihood', compress=None):
+        """Save the candidates of this job to a binary columnar file with
+        :func:`~gwlab_viterbi_python.utils.candidates_export.export_candidates`, so that they can be loaded again
+        with :func:`~gwlab_viterbi_python.utils.candidates_export.load_exported_candidates`.
+
+        Parameters
+        ----------
+        file_path : str or ~pathlib.Path
+            Path of the file to write, with a '.npz', '.feather', '.arrow' or '.parquet' suffix
+        data_params : DataParametersInput, optional
+            Data parameters used by the job, to be saved with the candidates, by default None
+        search_params : SearchParametersInput, optional
+            Search parameters used by the job, to be saved with the candidates, by default None
+        threshold : float or str, optional
+            Only keep candidates whose `field` is greater than or equal to this value, by default None (no threshold)
+        top_k : int, optional
+            Only keep the `top_k` candidates with the largest `field`, by default None (no limit)
+        field : str, optional
+            Name of the field to which the threshold and top k selection are applied, by default 'log_likelihood'
+        compress : bool, optional
+            Compress the data, by default None, which compresses '.npz' and '.parquet' files, but not '.feather'
+            or '.arrow' files, so that they can be memory-mapped without copying
+        """
+        candidates = self.filter_candidates(threshold=threshold, top_k=top_k, field=field)
+        export_candidates(file_path, candidates, data_params=data_params, search_params=search_params,
+                          compress=compress)